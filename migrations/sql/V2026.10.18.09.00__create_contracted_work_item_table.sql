@@ -0,0 +1,100 @@
+-- Relational projection of the contracted work items stored in application.json, merged with their
+-- review data from application.review_json. Kept in sync by a trigger on application.
+CREATE TABLE IF NOT EXISTS contracted_work_item
+(
+    work_id varchar PRIMARY KEY,
+    application_guid uuid NOT NULL REFERENCES application(guid) ON DELETE CASCADE,
+    application_id integer NOT NULL,
+    contracted_work_type varchar NOT NULL,
+    well_authorization_number varchar,
+    contracted_work_status_code varchar,
+    contracted_work_total numeric(14, 2) NOT NULL,
+    estimated_shared_cost numeric(14, 2) NOT NULL
+);
+
+ALTER TABLE contracted_work_item OWNER TO dsrp;
+
+CREATE INDEX ON contracted_work_item (application_guid);
+CREATE INDEX ON contracted_work_item (contracted_work_status_code, application_id);
+CREATE INDEX ON contracted_work_item (well_authorization_number);
+CREATE INDEX ON contracted_work_item (contracted_work_type);
+
+
+CREATE OR REPLACE FUNCTION sync_contracted_work_items(_application_guid uuid)
+  RETURNS void AS
+$BODY$
+BEGIN
+	DELETE FROM contracted_work_item WHERE application_guid = _application_guid;
+
+	INSERT INTO contracted_work_item (
+		work_id,
+		application_guid,
+		application_id,
+		contracted_work_type,
+		well_authorization_number,
+		contracted_work_status_code,
+		contracted_work_total,
+		estimated_shared_cost
+	)
+	SELECT
+		merged.work_data->>'work_id',
+		application.guid,
+		application.id,
+		contracted_work.key,
+		well_site.value #>> '{details,well_authorization_number}',
+		merged.work_data->>'contracted_work_status_code',
+		totals.contracted_work_total,
+		LEAST(ROUND(totals.contracted_work_total / 2.0, 2), 100000)
+	FROM application
+	CROSS JOIN LATERAL jsonb_array_elements(application.json -> 'well_sites') WITH ORDINALITY AS well_site(value, idx)
+	CROSS JOIN LATERAL jsonb_each(well_site.value -> 'contracted_work') AS contracted_work(key, value)
+	-- Same as Application.well_sites_with_review_data: the review data of the well site is laid over the work item
+	CROSS JOIN LATERAL (
+		SELECT contracted_work.value || COALESCE(jsonb_object_agg(review_field.key, review_field.value), '{}'::jsonb) AS work_data
+		FROM jsonb_each(
+			CASE WHEN jsonb_typeof(application.review_json -> 'well_sites' -> (well_site.idx - 1)::int) = 'object'
+			THEN application.review_json -> 'well_sites' -> (well_site.idx - 1)::int
+			ELSE '{}'::jsonb END) AS review(key, value)
+		CROSS JOIN LATERAL jsonb_each(
+			CASE WHEN jsonb_typeof(review.value #> ARRAY['contracted_work', contracted_work.key]) = 'object'
+			THEN review.value #> ARRAY['contracted_work', contracted_work.key]
+			ELSE '{}'::jsonb END) AS review_field(key, value)
+	) AS merged
+	-- Same fields as WELL_SITE_CONTRACTED_WORK in the API
+	CROSS JOIN LATERAL (
+		SELECT ROUND(COALESCE(SUM(NULLIF(merged.work_data->>field, '')::numeric), 0), 2) AS contracted_work_total
+		FROM unnest(CASE contracted_work.key
+			WHEN 'abandonment' THEN ARRAY['well_file_review', 'abandonment_plan', 'mob_demob_site', 'camp_lodging', 'permanent_plugging_wellbore', 'cut_and_cap', 'removal_of_facilities']
+			WHEN 'preliminary_site_investigation' THEN ARRAY['historical_well_file', 'site_visit', 'report_writing_submission', 'psi_review', 'mob_demob_site', 'camp_lodging', 'intrusive_sampling', 'submission_of_samples', 'completion_of_notifications', 'analysis_results']
+			WHEN 'detailed_site_investigation' THEN ARRAY['psi_review_dsi_scope', 'mob_demob_site', 'camp_lodging', 'complete_sampling', 'analysis_lab_results', 'development_remediation_plan', 'technical_report_writing']
+			WHEN 'remediation' THEN ARRAY['mob_demob_site', 'camp_lodging', 'excavation', 'contaminated_soil', 'confirmatory_sampling', 'backfilling_excavation', 'risk_assessment', 'site_closure']
+			WHEN 'reclamation' THEN ARRAY['mob_demob_site', 'camp_lodging', 'surface_recontouring', 'topsoil_replacement', 'revegetation_monitoring', 'technical_report_writing']
+			ELSE ARRAY[]::text[]
+		END) AS field
+	) AS totals
+	WHERE application.guid = _application_guid
+	-- Work IDs are injected by the application_insert trigger right after the insert
+	AND merged.work_data->>'work_id' IS NOT NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION sync_contracted_work_items_on_application_change()
+  RETURNS trigger AS
+$BODY$
+BEGIN
+	PERFORM sync_contracted_work_items(NEW.guid);
+	RETURN NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+
+CREATE TRIGGER contracted_work_item_sync
+  AFTER INSERT OR UPDATE OF json, review_json
+  ON application
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_contracted_work_items_on_application_change();
+
+
+-- Backfill the existing applications
+SELECT sync_contracted_work_items(guid) FROM application;
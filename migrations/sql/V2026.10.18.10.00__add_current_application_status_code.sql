@@ -0,0 +1,49 @@
+-- Current status of each application, maintained from its latest application_status_change.
+ALTER TABLE application ADD COLUMN IF NOT EXISTS application_status_code varchar DEFAULT 'NOT_STARTED';
+
+UPDATE application SET application_status_code = COALESCE((
+	SELECT application_status_code
+	FROM application_status_change
+	WHERE application_status_change.application_guid = application.guid
+	ORDER BY change_date DESC
+	LIMIT 1
+), 'NOT_STARTED');
+
+ALTER TABLE application ALTER COLUMN application_status_code SET NOT NULL;
+ALTER TABLE application ADD FOREIGN KEY (application_status_code) REFERENCES application_status(application_status_code) DEFERRABLE INITIALLY DEFERRED;
+
+CREATE INDEX ON application (application_status_code);
+CREATE INDEX ON application_status_change (application_guid, change_date DESC);
+
+
+CREATE OR REPLACE FUNCTION sync_application_status_code()
+  RETURNS trigger AS
+$BODY$
+DECLARE
+	_application_guid uuid;
+BEGIN
+	IF TG_OP = 'DELETE' THEN
+		_application_guid := OLD.application_guid;
+	ELSE
+		_application_guid := NEW.application_guid;
+	END IF;
+
+	UPDATE application SET application_status_code = COALESCE((
+		SELECT application_status_code
+		FROM application_status_change
+		WHERE application_status_change.application_guid = _application_guid
+		ORDER BY change_date DESC
+		LIMIT 1
+	), 'NOT_STARTED')
+	WHERE guid = _application_guid;
+
+	RETURN NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+
+CREATE TRIGGER application_status_change_sync
+  AFTER INSERT OR UPDATE OR DELETE
+  ON application_status_change
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_application_status_code();
@@ -0,0 +1,4 @@
+-- Indexes for the cursor pagination of the application list, which orders on (sort field, id).
+CREATE INDEX ON application (submission_date, id);
+CREATE INDEX ON application (application_status_code, id);
+CREATE INDEX ON application (application_phase_code, id);
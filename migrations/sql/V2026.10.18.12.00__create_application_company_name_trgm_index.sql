@@ -0,0 +1,4 @@
+-- Trigram index for the case-insensitive company name search (ILIKE '%...%') and its similarity ranking.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX ON application USING GIN ((json->'company_details'->'company_name'->>'label') gin_trgm_ops);
@@ -0,0 +1,20 @@
+-- Outbound emails, queued in the transaction that triggers them and delivered by the email outbox worker.
+CREATE TABLE IF NOT EXISTS email_outbox (
+	email_outbox_id serial PRIMARY KEY,
+	to_email varchar NOT NULL,
+	subject varchar NOT NULL,
+	message text NOT NULL,
+	status varchar NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'SENT', 'FAILED')),
+	attempts integer NOT NULL DEFAULT 0,
+	next_attempt_timestamp timestamp NOT NULL DEFAULT now(),
+	last_error varchar,
+	sent_timestamp timestamp,
+	create_user varchar NOT NULL,
+	create_timestamp timestamp NOT NULL DEFAULT now(),
+	update_user varchar NOT NULL,
+	update_timestamp timestamp NOT NULL DEFAULT now()
+);
+
+ALTER TABLE email_outbox OWNER TO dsrp;
+
+CREATE INDEX ON email_outbox (next_attempt_timestamp) WHERE status = 'PENDING';
@@ -0,0 +1,34 @@
+-- PRF generation jobs. The invoice number and content are reserved when the job is queued, the worker then
+-- renders, uploads and records the PRF one stage at a time so a retry resumes at the stage that failed.
+CREATE TABLE IF NOT EXISTS payment_document_job (
+	job_guid uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+	application_guid uuid NOT NULL,
+	payment_document_code varchar NOT NULL,
+	work_ids varchar[],
+	idempotency_key varchar UNIQUE,
+	invoice_number varchar NOT NULL,
+	content jsonb NOT NULL,
+	requested_by_email varchar,
+	status varchar NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'SUCCEEDED', 'FAILED')),
+	stage varchar NOT NULL DEFAULT 'RENDER' CHECK (stage IN ('RENDER', 'UPLOAD', 'RECORD')),
+	attempts integer NOT NULL DEFAULT 0,
+	next_attempt_timestamp timestamp NOT NULL DEFAULT now(),
+	last_error varchar,
+	rendered_document bytea,
+	document_name varchar,
+	object_store_path varchar,
+	document_guid uuid,
+	create_user varchar NOT NULL,
+	create_timestamp timestamp NOT NULL DEFAULT now(),
+	update_user varchar NOT NULL,
+	update_timestamp timestamp NOT NULL DEFAULT now(),
+
+	FOREIGN KEY (application_guid) REFERENCES application(guid) DEFERRABLE INITIALLY DEFERRED,
+	FOREIGN KEY (payment_document_code) REFERENCES payment_document_type(payment_document_code) DEFERRABLE INITIALLY DEFERRED,
+	FOREIGN KEY (document_guid) REFERENCES payment_document(document_guid) DEFERRABLE INITIALLY DEFERRED
+);
+
+ALTER TABLE payment_document_job OWNER TO dsrp;
+
+CREATE INDEX ON payment_document_job (next_attempt_timestamp) WHERE status = 'PENDING';
+CREATE INDEX ON payment_document_job (application_guid, payment_document_code) WHERE status = 'PENDING';
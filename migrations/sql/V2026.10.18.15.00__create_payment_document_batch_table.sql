@@ -0,0 +1,19 @@
+-- Month-end PRF batches. Their jobs are emailed to finance together, in one zip, once all of them have finished.
+CREATE TABLE IF NOT EXISTS payment_document_batch (
+	batch_guid uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+	payment_document_code varchar NOT NULL,
+	requested_by_email varchar,
+	status varchar NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'COMPLETED')),
+	create_user varchar NOT NULL,
+	create_timestamp timestamp NOT NULL DEFAULT now(),
+	update_user varchar NOT NULL,
+	update_timestamp timestamp NOT NULL DEFAULT now(),
+
+	FOREIGN KEY (payment_document_code) REFERENCES payment_document_type(payment_document_code) DEFERRABLE INITIALLY DEFERRED
+);
+
+ALTER TABLE payment_document_batch OWNER TO dsrp;
+
+ALTER TABLE payment_document_job ADD COLUMN batch_guid uuid REFERENCES payment_document_batch(batch_guid) DEFERRABLE INITIALLY DEFERRED;
+
+CREATE INDEX ON payment_document_job (batch_guid) WHERE batch_guid IS NOT NULL;
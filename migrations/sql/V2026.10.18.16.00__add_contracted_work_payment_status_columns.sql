@@ -0,0 +1,146 @@
+-- Current interim and final payment status, submission dates, PRF flags and review deadlines of each contracted
+-- work payment, maintained from its status changes and payment documents so they can be filtered and sorted in SQL.
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS interim_payment_status_code varchar NOT NULL DEFAULT 'INFORMATION_REQUIRED';
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS final_payment_status_code varchar NOT NULL DEFAULT 'INFORMATION_REQUIRED';
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS interim_payment_status_change_id integer;
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS final_payment_status_change_id integer;
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS interim_payment_submission_date timestamp;
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS final_payment_submission_date timestamp;
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS has_interim_prfs boolean NOT NULL DEFAULT false;
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS has_final_prfs boolean NOT NULL DEFAULT false;
+-- 9999-12-30 means no payment information was submitted and 9999-12-31 that a PRF was issued, see REVIEW_DEADLINE_*
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS interim_review_deadline timestamp NOT NULL DEFAULT '9999-12-30 23:59:59.999999';
+ALTER TABLE contracted_work_payment ADD COLUMN IF NOT EXISTS final_review_deadline timestamp NOT NULL DEFAULT '9999-12-30 23:59:59.999999';
+
+ALTER TABLE contracted_work_payment ADD FOREIGN KEY (interim_payment_status_code) REFERENCES contracted_work_payment_status(contracted_work_payment_status_code) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE contracted_work_payment ADD FOREIGN KEY (final_payment_status_code) REFERENCES contracted_work_payment_status(contracted_work_payment_status_code) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE contracted_work_payment ADD FOREIGN KEY (interim_payment_status_change_id) REFERENCES contracted_work_payment_status_change(contracted_work_payment_status_change_id) DEFERRABLE INITIALLY DEFERRED;
+ALTER TABLE contracted_work_payment ADD FOREIGN KEY (final_payment_status_change_id) REFERENCES contracted_work_payment_status_change(contracted_work_payment_status_change_id) DEFERRABLE INITIALLY DEFERRED;
+
+
+CREATE OR REPLACE FUNCTION refresh_contracted_work_payment_status(_contracted_work_payment_id integer)
+  RETURNS void AS
+$BODY$
+BEGIN
+	UPDATE contracted_work_payment cwp SET
+		interim_payment_status_change_id = latest.interim_id,
+		final_payment_status_change_id = latest.final_id,
+		interim_payment_status_code = COALESCE(latest.interim_code, 'INFORMATION_REQUIRED'),
+		final_payment_status_code = COALESCE(latest.final_code, 'INFORMATION_REQUIRED'),
+		interim_payment_submission_date = submitted.interim_date,
+		final_payment_submission_date = submitted.final_date,
+		has_interim_prfs = prfs.has_interim,
+		has_final_prfs = prfs.has_final,
+		interim_review_deadline = CASE
+			WHEN submitted.interim_date IS NULL THEN '9999-12-30 23:59:59.999999'::timestamp
+			WHEN prfs.has_interim THEN '9999-12-31 23:59:59.999999'::timestamp
+			ELSE submitted.interim_date + interval '90 days'
+		END,
+		final_review_deadline = CASE
+			WHEN submitted.final_date IS NULL THEN '9999-12-30 23:59:59.999999'::timestamp
+			WHEN prfs.has_final THEN '9999-12-31 23:59:59.999999'::timestamp
+			ELSE submitted.final_date + interval '90 days'
+		END
+	FROM (
+		SELECT
+			(SELECT contracted_work_payment_status_change_id FROM contracted_work_payment_status_change
+			 WHERE contracted_work_payment_id = _contracted_work_payment_id AND contracted_work_payment_code = 'INTERIM'
+			 ORDER BY change_timestamp DESC, contracted_work_payment_status_change_id DESC LIMIT 1) AS interim_id,
+			(SELECT contracted_work_payment_status_code FROM contracted_work_payment_status_change
+			 WHERE contracted_work_payment_id = _contracted_work_payment_id AND contracted_work_payment_code = 'INTERIM'
+			 ORDER BY change_timestamp DESC, contracted_work_payment_status_change_id DESC LIMIT 1) AS interim_code,
+			(SELECT contracted_work_payment_status_change_id FROM contracted_work_payment_status_change
+			 WHERE contracted_work_payment_id = _contracted_work_payment_id AND contracted_work_payment_code = 'FINAL'
+			 ORDER BY change_timestamp DESC, contracted_work_payment_status_change_id DESC LIMIT 1) AS final_id,
+			(SELECT contracted_work_payment_status_code FROM contracted_work_payment_status_change
+			 WHERE contracted_work_payment_id = _contracted_work_payment_id AND contracted_work_payment_code = 'FINAL'
+			 ORDER BY change_timestamp DESC, contracted_work_payment_status_change_id DESC LIMIT 1) AS final_code
+	) latest, (
+		SELECT
+			min(change_timestamp) FILTER (WHERE contracted_work_payment_code = 'INTERIM') AS interim_date,
+			min(change_timestamp) FILTER (WHERE contracted_work_payment_code = 'FINAL') AS final_date
+		FROM contracted_work_payment_status_change
+		WHERE contracted_work_payment_id = _contracted_work_payment_id
+	) submitted, (
+		SELECT
+			COALESCE(bool_or(pd.payment_document_code = 'INTERIM_PRF'), false) AS has_interim,
+			COALESCE(bool_or(pd.payment_document_code = 'FINAL_PRF'), false) AS has_final
+		FROM payment_document_contracted_work_payment_xref xref
+		JOIN contracted_work_payment p ON p.work_id = xref.work_id
+		JOIN payment_document pd ON pd.document_guid = xref.document_guid
+		WHERE p.contracted_work_payment_id = _contracted_work_payment_id AND pd.active_ind
+	) prfs
+	WHERE cwp.contracted_work_payment_id = _contracted_work_payment_id;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION sync_contracted_work_payment_status_from_status_change()
+  RETURNS trigger AS
+$BODY$
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		PERFORM refresh_contracted_work_payment_status(OLD.contracted_work_payment_id);
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		PERFORM refresh_contracted_work_payment_status(NEW.contracted_work_payment_id);
+	END IF;
+	RETURN NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+CREATE TRIGGER contracted_work_payment_status_change_sync
+  AFTER INSERT OR UPDATE OR DELETE
+  ON contracted_work_payment_status_change
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_contracted_work_payment_status_from_status_change();
+
+
+CREATE OR REPLACE FUNCTION sync_contracted_work_payment_status_from_xref()
+  RETURNS trigger AS
+$BODY$
+DECLARE
+	_contracted_work_payment_id integer;
+BEGIN
+	SELECT contracted_work_payment_id INTO _contracted_work_payment_id
+	FROM contracted_work_payment
+	WHERE work_id = CASE WHEN TG_OP = 'DELETE' THEN OLD.work_id ELSE NEW.work_id END;
+
+	PERFORM refresh_contracted_work_payment_status(_contracted_work_payment_id);
+	RETURN NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payment_document_contracted_work_payment_xref_sync
+  AFTER INSERT OR DELETE
+  ON payment_document_contracted_work_payment_xref
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_contracted_work_payment_status_from_xref();
+
+
+-- Soft-deleting a PRF lets its payments be reviewed again
+CREATE OR REPLACE FUNCTION sync_contracted_work_payment_status_from_payment_document()
+  RETURNS trigger AS
+$BODY$
+BEGIN
+	PERFORM refresh_contracted_work_payment_status(p.contracted_work_payment_id)
+	FROM payment_document_contracted_work_payment_xref xref
+	JOIN contracted_work_payment p ON p.work_id = xref.work_id
+	WHERE xref.document_guid = NEW.document_guid;
+	RETURN NULL;
+END;
+$BODY$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payment_document_sync
+  AFTER UPDATE OF active_ind, payment_document_code
+  ON payment_document
+  FOR EACH ROW
+  EXECUTE PROCEDURE sync_contracted_work_payment_status_from_payment_document();
+
+
+SELECT refresh_contracted_work_payment_status(contracted_work_payment_id) FROM contracted_work_payment;
+
+CREATE INDEX ON contracted_work_payment_status_change (contracted_work_payment_id, contracted_work_payment_code, change_timestamp DESC);
+CREATE INDEX ON contracted_work_payment (interim_payment_status_code);
+CREATE INDEX ON contracted_work_payment (final_payment_status_code);
+CREATE INDEX ON contracted_work_payment (LEAST(interim_review_deadline, final_review_deadline), GREATEST(interim_review_deadline, final_review_deadline));
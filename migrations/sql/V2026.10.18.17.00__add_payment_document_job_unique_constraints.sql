@@ -0,0 +1,6 @@
+-- No two PRFs or queued PRFs share an invoice number, the number of a failed job is given out again
+CREATE UNIQUE INDEX ON payment_document_job (invoice_number) WHERE status <> 'FAILED';
+
+-- Idempotency keys are scoped to the application they were sent for
+ALTER TABLE payment_document_job DROP CONSTRAINT IF EXISTS payment_document_job_idempotency_key_key;
+ALTER TABLE payment_document_job ADD UNIQUE (application_guid, idempotency_key);
@@ -27,6 +27,8 @@ from app.config import Config
 from app.extensions import db, jwt, api, cache
 
 import app.api.utils.setup_marshmallow
+from app.api.utils import sql_profiler
+from app.api.services.ogc_data_service import OGCDataUnavailable
 
 
 def create_app(test_config=None):
@@ -50,8 +52,23 @@ def create_app(test_config=None):
         from sqlalchemy.orm import configure_mappers
         configure_mappers()
 
-        from app.api.services.ogc_data_service import OGCDataService
-        OGCDataService.refreshAllData()
+        # Only reads what is already cached, fetching live data is left to the background refresher
+        from app.api.services.ogc_data_service import OGCDataService, OGCDataRefresher
+        OGCDataService.warmUp()
+
+        from app.api.services.document_generator_service import DocumentTemplateRegistry
+        DocumentTemplateRegistry.warm_up(app.root_path)
+
+    if app.config['OGC_DATA_REFRESHER_ENABLED']:
+        OGCDataRefresher.start(app)
+
+    if app.config['EMAIL_OUTBOX_WORKER_ENABLED'] and Config.SMTP_ENABLED:
+        from app.api.services.email_service import EmailOutboxWorker
+        EmailOutboxWorker.start(app)
+
+    if app.config['PRF_JOB_WORKER_ENABLED']:
+        from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
+        PaymentDocumentJobWorker.start(app)
 
     return app
 
@@ -70,6 +87,7 @@ def register_extensions(app):
 
     cache.init_app(app)
     db.init_app(app)
+    sql_profiler.init_app(app)
 
     CORS(app)
 
@@ -97,6 +115,33 @@ def register_routes(app):
         def get(self):
             return {'status': 'pass'}
 
+    # Readiness endpoint, fails until the OGC datasets are loaded
+    @api.route('/ready')
+    class Readiness(Resource):
+        def get(self):
+            from app.api.services.ogc_data_service import OGCDataService
+            ready, datasets, missing = OGCDataService.getReadiness()
+            if ready:
+                return {'status': 'pass', 'datasets': datasets}
+            return {'status': 'fail', 'datasets': datasets, 'missing': missing}, 503
+
+    @api.route('/health/ogc-data')
+    class OGCDataHealthcheck(Resource):
+        def get(self):
+            from app.api.services.ogc_data_service import OGCDataService
+            return {'status': 'pass', 'datasets': OGCDataService.getRefreshMetrics()}
+
+    @api.route('/health/object-store')
+    class ObjectStoreHealthcheck(Resource):
+        def get(self):
+            from app.api.services.object_store_storage_service import ObjectStoreStorageService
+            return {'status': 'pass', 'client': ObjectStoreStorageService.get_stats()}
+
+    @api.route('/health/sql')
+    class SQLProfileHealthcheck(Resource):
+        def get(self):
+            return {'status': 'pass', 'endpoints': sql_profiler.get_endpoint_metrics()}
+
     @api.errorhandler(AuthError)
     def jwt_oidc_auth_error_handler(error):
         app.logger.error(str(error))
@@ -145,6 +190,14 @@ def register_routes(app):
 
     _add_sqlalchemy_error_handlers(SQLAlchemyError)
 
+    @api.errorhandler(OGCDataUnavailable)
+    def ogc_data_unavailable_error_handler(error):
+        app.logger.warning(str(error))
+        return {
+            'status': error.code,
+            'message': str(error),
+        }, error.code, {'Retry-After': str(error.retry_after)}
+
     @api.errorhandler(Exception)
     def default_error_handler(error):
         app.logger.error(str(error))
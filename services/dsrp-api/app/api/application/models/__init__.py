@@ -6,5 +6,7 @@ from .application_status import *
 from .application_status_change import *
 from .application_history import *
 from .payment_document import *
+from .payment_document_job import *
+from .payment_document_batch import *
 from .payment_document_contracted_work_payment_xref import *
 from .payment_document_type import *
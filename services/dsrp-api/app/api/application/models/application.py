@@ -1,8 +1,10 @@
+import copy
+
 from datetime import datetime
 from flask import current_app
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, load_only, selectinload
 from sqlalchemy.schema import FetchedValue
 from sqlalchemy import select, desc, func, and_
 from marshmallow import fields
@@ -11,17 +13,49 @@ from flask_restplus import marshal
 from app.config import Config
 from app.extensions import db
 from app.api.utils.models_mixins import Base, AuditMixin
+from app.api.utils.helpers import escape_like
 from app.api.constants import WELL_SITE_CONTRACTED_WORK, APPLICATION_JSON, COMPANY_NAME_JSON_KEYS
 from .application_status import ApplicationStatus
 from .application_status_change import ApplicationStatusChange
-from app.api.application.constants import SITE_CONDITIONS, CONTRACTED_WORK, INDIGENOUS_APPLICANT_AFFILIATION, INDIGENOUS_SUBCONTRACTOR_AFFILIATION
-from app.api.permit_holder.resources.permit_holder import PermitHolderResource
+from app.api.services.ogc_data_service import OGCDataService
 from app.api.application.response_models import APPLICATION
 from app.api.contracted_work.response_models import CONTRACTED_WORK_PAYMENT
 from app.api.application.models.application_history import ApplicationHistory
 from app.api.application.models.payment_document import PaymentDocument
 from app.api.contracted_work.models.contracted_work_payment import ContractedWorkPayment
+from app.api.contracted_work.models.contracted_work_item import ContractedWorkItem
 from app.api.services.email_service import EmailService
+from app.api.services.email_template_service import render_email_template
+
+
+def merge_well_sites_with_review_data(application_json, review_json):
+    """Returns a copy of the application's well sites merged with their review data and totals."""
+
+    well_sites = copy.deepcopy(application_json.get('well_sites'))
+
+    # Merge well sites with their corresponding review data.
+    if review_json:
+        ws_reviews = review_json.get('well_sites')
+        for i, ws_review in enumerate(ws_reviews):
+            if not ws_review:
+                continue
+            for wan, review_data in ws_review.items():
+                for k, v in review_data.items():
+                    if k != 'contracted_work':
+                        continue
+                    for cw_type, cw_data in v.items():
+                        well_sites[i]['contracted_work'][cw_type].update(cw_data)
+
+    # Calculate the sum for each contracted work item
+    for i, well_site in enumerate(well_sites):
+        for cw_type, cw_data in well_site.get('contracted_work', {}).items():
+            cw_total = 0
+            for k, v in cw_data.items():
+                if k in WELL_SITE_CONTRACTED_WORK[cw_type]:
+                    cw_total += v
+            well_sites[i]['contracted_work'][cw_type]['contracted_work_total'] = round(cw_total, 2)
+
+    return well_sites
 
 
 class Application(Base, AuditMixin):
@@ -31,6 +65,7 @@ class Application(Base, AuditMixin):
         id = fields.Integer(dump_only=True)
         guid = fields.String(dump_only=True)
         submission_date = fields.String(dump_only=True)
+        application_status_code = fields.String(dump_only=True)
         status_changes = fields.Raw(dump_only=True) ##DO NOT INGEST ON POST
 
     id = db.Column(db.Integer, primary_key=True, server_default=FetchedValue())
@@ -43,6 +78,12 @@ class Application(Base, AuditMixin):
     edit_note = db.Column(db.String)
     application_phase_code = db.Column(
         db.String, db.ForeignKey('application_phase_type.application_phase_code'), nullable=False)
+    # Current status, kept in sync with the latest status change by the application_status_change_sync trigger.
+    application_status_code = db.Column(
+        db.String,
+        db.ForeignKey('application_status.application_status_code'),
+        nullable=False,
+        server_default=FetchedValue())
 
     documents = db.relationship('ApplicationDocument', lazy='select')
     payment_documents = db.relationship(
@@ -65,6 +106,22 @@ class Application(Base, AuditMixin):
     def get_all(cls):
         return cls.query.all()
 
+    @classmethod
+    def list_query(cls):
+        """Loads the documents of the APPLICATION response model with one statement per relationship per page."""
+        return cls.query.options(
+            selectinload(cls.documents).lazyload('*'),
+            selectinload(cls.payment_documents).lazyload('*'))
+
+    @classmethod
+    def find_summary_by_guid(cls, guid):
+        """Returns only the APPLICATION_SUMMARY fields, extracting the names in SQL instead of loading the JSONB documents."""
+        return db.session.query(cls.id, cls.guid, cls.application_status_code,
+                                cls.submission_date,
+                                cls.company_name.label('company_name'),
+                                cls.applicant_name.label('applicant_name')).filter(
+                                    cls.guid == guid).one_or_none()
+
     @classmethod
     def find_by_guid(cls, guid):
         return cls.query.filter_by(guid=guid).one_or_none()
@@ -113,60 +170,49 @@ class Application(Base, AuditMixin):
     def company_name(self):
         return Application.json['company_details']['company_name']['label'].astext
 
+    @classmethod
+    def company_name_contains(cls, company_name):
+        """Case-insensitive search on the company name, served by its trigram index."""
+        return cls.company_name.ilike(f'%{escape_like(company_name)}%', escape='\\')
+
+    @classmethod
+    def company_name_similarity(cls, company_name):
+        return func.word_similarity(company_name, cls.company_name)
+
     @hybrid_property
     def agreement_number(self):
         return str(self.id).zfill(4)
 
     @hybrid_property
     def well_sites_with_review_data(self):
-        """Merges well sites with their corresponding review data and provides extra information."""
-
-        well_sites = self.json.get('well_sites')
-
-        # Merge well sites with their corresponding review data.
-        if self.review_json:
-            ws_reviews = self.review_json.get('well_sites')
-            for i, ws_review in enumerate(ws_reviews):
-                if not ws_review:
-                    continue
-                for wan, review_data in ws_review.items():
-                    for k, v in review_data.items():
-                        if k != 'contracted_work':
-                            continue
-                        for cw_type, cw_data in v.items():
-                            well_sites[i]['contracted_work'][cw_type].update(cw_data)
-
-        # Calculate the sum for each contracted work item
-        for i, well_site in enumerate(well_sites):
-            for cw_type, cw_data in well_site.get('contracted_work', {}).items():
-                cw_total = 0
-                for k, v in cw_data.items():
-                    if k in WELL_SITE_CONTRACTED_WORK[cw_type]:
-                        cw_total += v
-                well_sites[i]['contracted_work'][cw_type]['contracted_work_total'] = round(
-                    cw_total, 2)
+        """
+        Merges well sites with their corresponding review data and provides extra information.
+        The merged view is built on a copy of the well sites and memoized until json or review_json
+        changes, callers must not modify it.
+        """
 
+        well_sites = getattr(self, '_well_sites_with_review_data', None)
+        if well_sites is None:
+            well_sites = merge_well_sites_with_review_data(self.json, self.review_json)
+            self._well_sites_with_review_data = well_sites
         return well_sites
 
+    def invalidate_well_sites_with_review_data(self):
+        self._well_sites_with_review_data = None
+
     @hybrid_method
     def contracted_work(self, status, include_payment):
         contracted_work = []
         contracted_work_payments = None
         if include_payment:
             contracted_work_payments = marshal(
-                ContractedWorkPayment.find_by_application_guid(self.guid), CONTRACTED_WORK_PAYMENT)
+                ContractedWorkPayment.marshal_query().filter_by(application_guid=self.guid).all(),
+                CONTRACTED_WORK_PAYMENT)
         for ws in self.well_sites_with_review_data:
             for cw_type, cw_data in ws.get('contracted_work', {}).items():
                 if cw_data.get('contracted_work_status_code', None) != status:
                     continue
-                cw_item = {}
-                cw_item['application_id'] = self.id
-                cw_item['application_guid'] = str(self.guid)
-                cw_item['company_name'] = self.company_name
-                cw_item['contracted_work_type'] = cw_type
-                cw_item['well_authorization_number'] = ws['details']['well_authorization_number']
-                cw_item['estimated_shared_cost'] = self.calc_est_shared_cost(cw_data)
-                cw_item.update(cw_data)
+                cw_item = self.contracted_work_item(ws, cw_type, cw_data)
                 if include_payment:
                     cw_payment = next((cwp for cwp in contracted_work_payments
                                        if cwp['work_id'] == cw_item['work_id']), None)
@@ -175,44 +221,95 @@ class Application(Base, AuditMixin):
 
         return contracted_work
 
+    def contracted_work_item(self, well_site, cw_type, cw_data):
+        cw_item = {}
+        cw_item['application_id'] = self.id
+        cw_item['application_guid'] = str(self.guid)
+        cw_item['company_name'] = self.company_name
+        cw_item['contracted_work_type'] = cw_type
+        cw_item['well_authorization_number'] = well_site['details']['well_authorization_number']
+        cw_item['estimated_shared_cost'] = self.calc_est_shared_cost(cw_data)
+        cw_item.update(cw_data)
+        return cw_item
+
+    @classmethod
+    def approved_contracted_work_query(cls,
+                                       application_id=None,
+                                       application_guid=None,
+                                       company_name=None,
+                                       work_id=None,
+                                       well_authorization_number=None,
+                                       contracted_work_type=None):
+        """Returns a query on the contracted_work_item projection for the approved contracted work on all approved applications."""
+
+        query = ContractedWorkItem.query.join(ContractedWorkItem.application).filter(
+            Application.application_status_code == 'FIRST_PAY_APPROVED',
+            ContractedWorkItem.contracted_work_status_code == 'APPROVED')
+
+        if application_id is not None:
+            query = query.filter(ContractedWorkItem.application_id == application_id)
+        if application_guid is not None:
+            query = query.filter(ContractedWorkItem.application_guid == application_guid)
+        if company_name is not None:
+            query = query.filter(Application.company_name == company_name)
+        if work_id:
+            query = query.filter(ContractedWorkItem.work_id == work_id)
+        if well_authorization_number:
+            query = query.filter(
+                ContractedWorkItem.well_authorization_number == well_authorization_number)
+        if contracted_work_type:
+            query = query.filter(ContractedWorkItem.contracted_work_type.in_(contracted_work_type))
+
+        return query
+
+    @classmethod
+    def approved_contracted_work_records(cls, contracted_work_items, contracted_work_payments=None):
+        """Builds the contracted work records for the given contracted_work_item rows, in the same order."""
+
+        if not contracted_work_items:
+            return []
+
+        application_guids = {item.application_guid for item in contracted_work_items}
+        applications = {
+            application.guid: application
+            for application in Application.query.options(
+                load_only('id', 'guid', 'json', 'review_json')).filter(
+                    Application.guid.in_(application_guids))
+        }
+
+        if contracted_work_payments is None:
+            work_ids = [item.work_id for item in contracted_work_items]
+            contracted_work_payments = {
+                cwp.work_id: marshal(cwp, CONTRACTED_WORK_PAYMENT)
+                for cwp in ContractedWorkPayment.marshal_query().filter(
+                    ContractedWorkPayment.work_id.in_(work_ids))
+            }
+
+        work_items = {}
+        for application in applications.values():
+            for ws in application.well_sites_with_review_data:
+                for cw_type, cw_data in ws.get('contracted_work', {}).items():
+                    work_items[cw_data.get('work_id')] = (application, ws, cw_type, cw_data)
+
+        records = []
+        for item in contracted_work_items:
+            application, ws, cw_type, cw_data = work_items[item.work_id]
+            cw_item = application.contracted_work_item(ws, cw_type, cw_data)
+            cw_item['contracted_work_payment'] = contracted_work_payments.get(item.work_id, None)
+            records.append(cw_item)
+
+        return records
+
     @classmethod
     def all_approved_contracted_work(self,
                                      application_id=None,
                                      application_guid=None,
                                      company_name=None):
-        contracted_work_payments = []
-        approved_applications = []
-
-        if application_id or application_guid or company_name:
-            if application_id and not application_guid:
-                application = Application.query.filter_by(id=application_id).one_or_none()
-                application_guid = application.guid if application else None
-            approved_applications = Application.query.filter(
-                and_(Application.application_status_code == 'FIRST_PAY_APPROVED',
-                     Application.id == application_id if application_id != None else True,
-                     Application.guid == application_guid if application_guid != None else True,
-                     Application.company_name == company_name
-                     if company_name != None else True)).order_by(Application.id).all()
-            approved_application_guids = [x.guid for x in approved_applications]
-            contracted_work_payments = ContractedWorkPayment.query.filter(
-                Application.guid.in_(approved_application_guids)).all()
-        else:
-            approved_applications = Application.query.filter_by(
-                application_status_code='FIRST_PAY_APPROVED').order_by(Application.id).all()
-            contracted_work_payments = ContractedWorkPayment.query.all()
-
-        contracted_work_payments_lookup = {}
-        for cwp in contracted_work_payments:
-            contracted_work_payments_lookup[cwp.work_id] = marshal(cwp, CONTRACTED_WORK_PAYMENT)
-
-        approved_applications_approved_contracted_work = []
-        for application in approved_applications:
-            for approved_work in application.contracted_work('APPROVED', False):
-                approved_work['contracted_work_payment'] = contracted_work_payments_lookup.get(
-                    approved_work['work_id'], None)
-                approved_applications_approved_contracted_work.append(approved_work)
-
-        return approved_applications_approved_contracted_work
+        contracted_work_items = Application.approved_contracted_work_query(
+            application_id, application_guid, company_name).order_by(
+                ContractedWorkItem.application_id,
+                func.split_part(ContractedWorkItem.work_id, '.', 2).cast(db.Integer)).all()
+        return Application.approved_contracted_work_records(contracted_work_items)
 
     def find_contracted_work_by_id(self, work_id):
         for ws in self.well_sites_with_review_data:
@@ -255,7 +352,7 @@ class Application(Base, AuditMixin):
     def shared_cost_agreement_template_json(self):
         """Generates the JSON used to generate this application's Shared Cost Agreement document."""
 
-        result = self.json
+        result = dict(self.json)
 
         # Create general document info
         result['agreement_no'] = self.agreement_number
@@ -303,6 +400,11 @@ class Application(Base, AuditMixin):
     def applicant_name(self):
         return f"{self.json['company_contact']['first_name']} {self.json['company_contact']['last_name']}"
 
+    @applicant_name.expression
+    def applicant_name(self):
+        return func.concat(Application.json['company_contact']['first_name'].astext, ' ',
+                           Application.json['company_contact']['last_name'].astext)
+
     @hybrid_property
     def applicant_email(self):
         return self.json.get('company_contact', {}).get('email')
@@ -314,224 +416,29 @@ class Application(Base, AuditMixin):
 
         return ph1 if not ph1_ext else f'{ph1} ext.{ph1_ext}'
 
-    @hybrid_property
-    def application_status_code(self):
-        if self.status_changes:
-            return self.status_changes[0].application_status_code
-        else:
-            return 'NOT_STARTED'
-
-    @application_status_code.expression
-    def application_status_code(self):
-        return func.coalesce(
-            select([ApplicationStatusChange.application_status_code
-                    ]).where(ApplicationStatusChange.application_guid == self.guid).order_by(
-                        desc(ApplicationStatusChange.change_date)).limit(1).as_scalar(),
-            'NOT_STARTED')
-
     def send_confirmation_email(self):
-        html_content = f"""
-            <p>
-                We have successfully received your application in the British Columbia Dormant Sites Reclamation Program.
-                Please keep your reference number safe as you will need it to carry your application forward in this process.
-                You can view the contents of your application below.
-                <br />
-                <br />
-                <a href='{Config.URL}/view-application-status/{self.guid}'>Click here to view the status of your application.</a>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-            </p>
-            {self.get_application_html()}
-            """
-        with EmailService() as es:
+        html_content = render_email_template(
+            'application_confirmation.html',
+            application=self,
+            permit_holder_name=self.permit_holder_name)
+        with EmailService(commit=True) as es:
             es.send_email_to_applicant(self, 'Application Confirmation', html_content)
 
     def get_application_html(self):
-        def create_company_details(company_details):
-            indigenous_content = ''
-            if self.application_phase_code == 'INITIAL':
-                indigenous_participation_ind = company_details.get('indigenous_participation_ind',
-                                                                   False) == True
-                indigenous_content = f"""
-                <h2>Indigenous Participation</h2>
-                <p>{"Yes" if indigenous_participation_ind else "No"}</p>
-                {f'<p>{company_details["indigenous_participation_description"]}</p>' if indigenous_participation_ind else ""}
-                """
-            elif self.application_phase_code == 'NOMINATION':
-                indigenous_affiliation = company_details.get('indigenous_affiliation')
-                indigenous_communities = company_details.get('indigenous_communities', [])
-                has_indigenous_affiliation = indigenous_affiliation and indigenous_communities and indigenous_affiliation != 'NONE' and indigenous_affiliation in INDIGENOUS_APPLICANT_AFFILIATION
-                indigenous_affiliation_label = INDIGENOUS_APPLICANT_AFFILIATION[
-                    indigenous_affiliation] if has_indigenous_affiliation else INDIGENOUS_APPLICANT_AFFILIATION[
-                        "NONE"]
-
-                indigenous_content = f"""
-                <h2>Indigenous Affiliation</h2>
-                <p>{indigenous_affiliation_label}</p>
-                """
-
-                if has_indigenous_affiliation:
-
-                    def create_indigenous_community(community):
-                        return f'<li>{community}</li>'
-
-                    indigenous_content += f"""
-                    <h3>Indigenous Peoples</h3>
-                    <ul>
-                    {''.join([create_indigenous_community(community) for community in indigenous_communities])}
-                    </ul>
-                    """
-
-            return f"""
-            <h1>Company Details</h1>
-
-            <h2>Company Name</h2>
-            <p>{company_details["company_name"]["label"]}</p>
-
-            <h2>Company Address</h2>
-            <p>
-            {company_details["city"]} {company_details["province"]} Canada
-            <br />
-            {company_details["address_line_1"]}
-            <br />
-            {f'{company_details["address_line_2"]}<br />' if company_details.get("address_line_2") else ""}
-            {company_details["postal_code"]}
-            </p>
-
-            <h2>Business Number</h2>
-            <p>{company_details["business_number"]}</p>
-
-            {indigenous_content}
-            """
-
-        def create_company_contact(company_contact):
-            return f"""
-            <h1>Company Contact</h1>
-
-            <p>{company_contact["first_name"]} {company_contact["last_name"]}</p>
-            <p>{company_contact["email"]}</p>
-            <p>
-            Phone: {company_contact["phone_number_1"]}<br />     
-            {f'Ext.: {company_contact["phone_ext_1"]}<br />' if company_contact.get("phone_ext_1") else ""} 
-            {f'Phone 2.: {company_contact["phone_number_2"]}<br />' if company_contact.get("phone_number_2") else ""}
-            {f'Ext. 2: {company_contact["phone_ext_2"]}<br />' if company_contact.get("phone_ext_2") else ""}
-            {f'Fax: {company_contact["fax"]}<br />' if company_contact.get("fax") else ""}
-            </p>
-            """
-
-        def create_contract_details(contract_details):
-            try:
-                permit_holder = PermitHolderResource.get(
-                    self, operator_id=contract_details["operator_id"])["records"][0]
-            except:
-                current_app.logger.warning(
-                    'Failed to find the permit holder. Displaying operator ID instead.')
-
-            return f"""
-            <h1>Contract Details</h1>
-
-            <h2>Permit Holder</h2>
-            <p>{permit_holder["organization_name"] if permit_holder else f'Operator ID: {contract_details["operator_id"]}'}</p>
-            """
-
-        def create_well_sites(well_sites):
-            def create_well_site(well_site, index):
-                def create_site_condition(condition, site_conditions):
-                    return f"<li><b>{condition['label']}</b>: {'Yes' if condition['name'] in site_conditions and site_conditions[condition['name']] == True else 'No'}</li>"
-
-                def create_contracted_work_section(section, contracted_work):
-                    def create_indigenous_subcontractors(section, contracted_work):
-                        if self.application_phase_code == 'INITIAL':
-                            return ''
-
-                        def create_indigenous_subcontractor(number, subcontractor):
-                            return f"""
-                            Subcontractor {number}:<br />
-                            <p>
-                            Subcontractor Name: {subcontractor['indigenous_subcontractor_name']}<br />
-                            Indigenous Affiliation: {INDIGENOUS_SUBCONTRACTOR_AFFILIATION[subcontractor['indigenous_affiliation']]}<br />
-                            Indigenous Peoples:<br />
-                            <ul>
-                            {''.join([f'<li>{community}</li>' for community in subcontractor['indigenous_communities']])}
-                            </ul>
-                            </p>
-                            """
-
-                        indigenous_subcontractors = contracted_work.get(
-                            section['section_name'], {}).get('indigenous_subcontractors', [])
-                        indigenous_subcontractors_content = 'N/A' if not indigenous_subcontractors else ''.join(
-                            [
-                                create_indigenous_subcontractor(i + 1, subcontractor)
-                                for i, subcontractor in enumerate(indigenous_subcontractors)
-                            ])
-                        return f"""
-                        <p><u>Indigenous Subcontractors</u></p>
-                        {indigenous_subcontractors_content}
-                        """
-
-                    def create_sub_section(sub_section, section, contracted_work):
-                        def create_amount_field(amount_field, section, contracted_work):
-                            return f"""
-                                <tr>
-                                <td style="padding-left: 10px;">{amount_field["label"]}:</td>
-                                <td style="padding-left: 10px;">{'$0.00' if not (section["section_name"] in contracted_work and (amount_field["name"] in contracted_work[section["section_name"]])) else f'${contracted_work[section["section_name"]][amount_field["name"]] or "0.00"}'}</td>
-                                </tr>
-                            """
-
-                        return f"""
-                        <p><u>{sub_section["sub_section_header"]}</u></p>
-                        <table class="contracted_work_amount">
-                        {''.join([create_amount_field(amount_field, section, contracted_work) for amount_field in sub_section["amount_fields"]])}
-                        </table>
-                        """
-
-                    return f"""             
-                    <h4>{section["section_header"]}</h4>
-                    <p>Planned Start Date: {contracted_work[section["section_name"]]["planned_start_date"] if contracted_work.get(section["section_name"]) and contracted_work.get(section["section_name"]).get("planned_start_date") else "N/A"}</p>
-                    <p>Planned End Date: {contracted_work[section["section_name"]]["planned_end_date"] if contracted_work.get(section["section_name"]) and contracted_work.get(section["section_name"]).get("planned_end_date") else "N/A"}</p>
-                    {''.join([create_sub_section(sub_section, section, contracted_work) for sub_section in section["sub_sections"]])}
-                    <br />
-                    {create_indigenous_subcontractors(section, contracted_work)}
-                    """
-
-                def create_site_condition(site_conditions):
-                    site_conditions_section = "" if self.application_phase_code == 'NOMINATION' else f"""
-                    h3>Site Conditions</h3>
-                    {''.join()}
-                    <ul>
-                    {''.join([create_site_condition(condition, well_site["site_conditions"]) for condition in SITE_CONDITIONS])}
-                    </ul>
-                    """
-
-                return f"""
-                <h2>Well Site {index + 1}</h2>
-
-                <h3>Well Authorization Number</h3>
-                <p>{well_site["details"]["well_authorization_number"]}</p>
-
-                {create_site_condition(well_site)}
-
-                <h3>Contracted Work</h3>
-                {''.join([create_contracted_work_section(section, well_site["contracted_work"]) for section in CONTRACTED_WORK])}
-                <hr />
-                """
-
-            return f"""
-            <h1>Well Sites</h1>
-            {''.join([create_well_site(well_site, index) for index, well_site in enumerate(well_sites)])}
-            """
-
-        html = f"""
-        {create_company_details(self.json["company_details"])}     
-        {create_company_contact(self.json["company_contact"])}
-        {create_contract_details(self.json["contract_details"])}
-        {create_well_sites(self.json["well_sites"])}
-        """
-
-        return html
+        return render_email_template(
+            'application.html', application=self, permit_holder_name=self.permit_holder_name)
+
+    @property
+    def permit_holder_name(self):
+        operator_id = self.json.get('contract_details', {}).get('operator_id')
+        try:
+            permit_holders = OGCDataService.getPermitHoldersDataset().filter(
+                operator_id=[int(operator_id)])
+            return permit_holders['organization_name'].iloc[0]
+        except Exception:
+            current_app.logger.warning(
+                'Failed to find the permit holder. Displaying operator ID instead.')
+            return None
 
     def save_application_history(self):
         application_json = marshal(self, APPLICATION)
@@ -568,3 +475,32 @@ class Application(Base, AuditMixin):
             "planned_end_date": work_item["planned_end_date"]
         }
         self.process_well_sites_work_items(json, self.update_work_item_action, **args)
+
+
+@db.event.listens_for(Application.json, 'set')
+@db.event.listens_for(Application.review_json, 'set')
+def _invalidate_well_sites_with_review_data_on_set(target, value, oldvalue, initiator):
+    target.invalidate_well_sites_with_review_data()
+
+
+# flag_modified() is how in-place edits of the JSONB documents are marked
+@db.event.listens_for(Application.json, 'modified')
+@db.event.listens_for(Application.review_json, 'modified')
+def _invalidate_well_sites_with_review_data_on_modified(target, initiator):
+    target.invalidate_well_sites_with_review_data()
+
+
+# loading, refreshing and expiring replace the documents without firing the attribute events
+@db.event.listens_for(Application, 'load')
+def _invalidate_well_sites_with_review_data_on_load(target, context):
+    target.invalidate_well_sites_with_review_data()
+
+
+@db.event.listens_for(Application, 'refresh')
+def _invalidate_well_sites_with_review_data_on_refresh(target, context, attrs):
+    target.invalidate_well_sites_with_review_data()
+
+
+@db.event.listens_for(Application, 'expire')
+def _invalidate_well_sites_with_review_data_on_expire(target, attrs):
+    target.invalidate_well_sites_with_review_data()
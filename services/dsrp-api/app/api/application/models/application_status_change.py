@@ -1,4 +1,4 @@
-import io, os, cgi
+import io, os
 
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
@@ -9,6 +9,7 @@ from app.config import Config
 from app.extensions import db
 from app.api.utils.models_mixins import Base, AuditMixin
 from app.api.services.email_service import EmailService
+from app.api.services.email_template_service import render_email_template
 from app.api.application.models.application_status import ApplicationStatus
 from app.api.application.models.payment_document import PaymentDocument
 from app.api.services.document_generator_service import DocumentGeneratorService, get_template_file_path
@@ -32,6 +33,7 @@ class ApplicationStatusChange(Base, AuditMixin):
     def __init__(self, application, **kwargs):
         super(ApplicationStatusChange, self).__init__(**kwargs)
         self.application = application
+        self.application.application_status_code = self.application_status_code
         self.application_status = ApplicationStatus.find_by_application_status_code(
             self.application_status_code)
         self.determine_application_status_change_action()
@@ -45,30 +47,19 @@ class ApplicationStatusChange(Base, AuditMixin):
             action_first_pay_approved(self.application)
 
     def send_status_change_email(self):
-        html_content = f"""
-            <p>
-                The status of your application has been changed to <b>{self.application_status.description}</b> with the following note:
-				<br />
-                <br />
-                <span style='margin-left: 10px'>{self.note}</span>
-				<br />
-                <br />
-                <a href='{Config.URL}/view-application-status/{self.application.guid}'>Click here to view the status of your application.</a>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-            </p>"""
+        html_content = render_email_template(
+            'application_status_change.html',
+            application=self.application,
+            status_description=self.application_status.description,
+            note=self.note)
 
         attachment = None
         filename = None
         if self.application_status.application_status_code == 'WAIT_FOR_DOCS':
-            doc = DocumentGeneratorService.generate_document_and_stream_response(
+            doc = DocumentGeneratorService.generate_document(
                 get_template_file_path('shared-cost-agreement'),
                 self.application.shared_cost_agreement_template_json, 'pdf')
-            value, params = cgi.parse_header(doc.headers['content-disposition'])
-            filename = params['filename']
+            filename = doc.file_name
             attachment = io.BytesIO(doc.content)
 
         with EmailService() as es:
@@ -1,6 +1,7 @@
 import io
 import json
 
+from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.schema import FetchedValue
 from datetime import datetime
@@ -20,6 +21,11 @@ from app.api.services.email_service import EmailService
 from app.config import Config
 
 
+def invoice_sequence(invoice_number):
+    """The sequence number ending an invoice number of the form {agreement_number}-{payment_phase}-{sequence}."""
+    return db.cast(func.substring(invoice_number, r'-(\d+)$'), db.Integer)
+
+
 class PaymentDocument(AuditMixin, Base):
     """
     Local ledger of PRF files in S3 object store and their business relationship
@@ -30,24 +36,6 @@ class PaymentDocument(AuditMixin, Base):
     def __init__(self, application, work_ids=None, **kwargs):
         super(PaymentDocument, self).__init__(**kwargs)
 
-        def create_invoice_number(application):
-            all_application_payment_documents = PaymentDocument.query.filter_by(
-                application_guid=application.guid).all()
-            amount_generated = sum(doc.payment_document_code == self.payment_document_code
-                                   for doc in all_application_payment_documents)
-            payment_phase = None
-            if self.payment_document_code == 'FIRST_PRF':
-                payment_phase = 1
-            elif self.payment_document_code == 'INTERIM_PRF':
-                payment_phase = 2
-            elif self.payment_document_code == 'FINAL_PRF':
-                payment_phase = 3
-            else:
-                raise Exception('Unknown payment document code')
-            agreement_number = application.agreement_number
-            invoice_number = f'{agreement_number}-{payment_phase}-{amount_generated + 1}'
-            return invoice_number
-
         def create_payment_details():
             def create_payment_detail(unique_id, amount):
                 return {
@@ -146,23 +134,14 @@ class PaymentDocument(AuditMixin, Base):
                 'total_payment': total_payment
             }
 
-        def upload_prf(prf_file):
-            document_name = f'{self.invoice_number}_{self.payment_document_code.lower()}.xlsx'
-            file_path = f'{self.application.guid}/{self.payment_document_code.lower()}/{document_name}'
-            try:
-                self.object_store_path = ObjectStoreStorageService().upload_fileobj(
-                    prf_file, file_path)
-                self.document_name = document_name
-                self.upload_date = datetime.utcnow()
-            except Exception as e:
-                raise Exception(f'Failed to upload the PRF: {e}')
-
-        self.invoice_number = create_invoice_number(application)
+        if self.invoice_number is None:
+            self.invoice_number = self.create_invoice_number(application,
+                                                             self.payment_document_code)
         self.application = application
         self.payment_document_type = PaymentDocumentType.find_by_payment_document_code(
             self.payment_document_code)
 
-        if self.payment_document_code != 'FIRST_PRF':
+        if self.payment_document_code != 'FIRST_PRF' and not self.contracted_work_payments:
             if work_ids is None:
                 raise Exception(f'Work IDs must be provided!')
 
@@ -172,21 +151,9 @@ class PaymentDocument(AuditMixin, Base):
                     raise Exception(f'Work ID has no payment information!')
                 self.contracted_work_payments.append(contracted_work_payment)
 
-        self.content = create_content()
-
-        # Generate the PRF
-        resp = DocumentGeneratorService.generate_document_and_stream_response(
-            get_template_file_path('payment-request-form'), self.content, 'xlsx')
-
-        # Upload the PRF
-        upload_prf(io.BytesIO(resp.content))
-
-        # Email the PRF
-        try:
-            with EmailService() as es:
-                es.send_payment_document(self, io.BytesIO(resp.content))
-        except Exception as e:
-            raise Exception(f'Failed to email the PRF: {e}')
+        # Content reserved by a PRF job is kept as it was when the job was queued
+        if self.content is None:
+            self.content = create_content()
 
     class _ModelSchema(Base._ModelSchema):
         document_guid = fields.String(dump_only=True)
@@ -211,6 +178,66 @@ class PaymentDocument(AuditMixin, Base):
         lazy='selectin',
         secondary='payment_document_contracted_work_payment_xref')
 
+    @classmethod
+    def create_invoice_number(cls, application, payment_document_code):
+        """
+        Numbers PRFs per application and phase after the highest number taken by a PRF or a PRF job that has not
+        failed, so only the number of a failed job is given out again.
+        """
+        from app.api.application.models.payment_document_job import PaymentDocumentJob
+
+        amount_generated = max(
+            db.session.query(func.max(invoice_sequence(cls.invoice_number))).filter(
+                cls.application_guid == application.guid,
+                cls.payment_document_code == payment_document_code).scalar() or 0,
+            db.session.query(func.max(invoice_sequence(PaymentDocumentJob.invoice_number))).filter(
+                PaymentDocumentJob.application_guid == application.guid,
+                PaymentDocumentJob.payment_document_code == payment_document_code,
+                PaymentDocumentJob.status != 'FAILED').scalar() or 0)
+        payment_phase = None
+        if payment_document_code == 'FIRST_PRF':
+            payment_phase = 1
+        elif payment_document_code == 'INTERIM_PRF':
+            payment_phase = 2
+        elif payment_document_code == 'FINAL_PRF':
+            payment_phase = 3
+        else:
+            raise Exception('Unknown payment document code')
+        agreement_number = application.agreement_number
+        invoice_number = f'{agreement_number}-{payment_phase}-{amount_generated + 1}'
+        return invoice_number
+
+    @property
+    def object_store_file_path(self):
+        return f'{self.application.guid}/{self.payment_document_code.lower()}/{self.file_name}'
+
+    @property
+    def file_name(self):
+        return f'{self.invoice_number}_{self.payment_document_code.lower()}.xlsx'
+
+    def render(self):
+        """Generates the PRF spreadsheet from the content, uncached as every PRF has its own invoice number."""
+        return DocumentGeneratorService.generate_document(
+            get_template_file_path('payment-request-form'), self.content, 'xlsx',
+            cache=False).content
+
+    def upload(self, prf_content):
+        """Uploads the PRF, its object store path only depends on the invoice number so a retry overwrites it."""
+        try:
+            self.object_store_path = ObjectStoreStorageService().upload_fileobj(
+                io.BytesIO(prf_content), self.object_store_file_path)
+            self.document_name = self.file_name
+            self.upload_date = datetime.utcnow()
+        except Exception as e:
+            raise Exception(f'Failed to upload the PRF: {e}')
+
+    def send_email(self, prf_content, requested_by_email=None):
+        """Queues the PRF email to finance in the current transaction."""
+        try:
+            EmailService().send_payment_document(self, io.BytesIO(prf_content), requested_by_email)
+        except Exception as e:
+            raise Exception(f'Failed to email the PRF: {e}')
+
     @classmethod
     def find_by_guid(cls, application_guid, document_guid):
         return cls.query.filter_by(
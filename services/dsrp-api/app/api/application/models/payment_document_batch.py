@@ -0,0 +1,90 @@
+import io
+import zipfile
+
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import undefer
+from sqlalchemy.schema import FetchedValue
+
+from app.extensions import db
+from app.api.utils.models_mixins import Base, AuditMixin
+from app.api.utils.include.user_info import User
+from app.api.application.models.payment_document_job import PaymentDocumentJob
+from app.api.services.email_service import EmailService
+
+
+class PaymentDocumentBatch(Base, AuditMixin):
+    """
+    PRFs queued together, e.g., at month-end. Its jobs skip their own finance email, the batch sends one
+    email with all of the PRFs once every job has succeeded or failed.
+    """
+
+    __tablename__ = 'payment_document_batch'
+
+    batch_guid = db.Column(UUID(as_uuid=True), primary_key=True, server_default=FetchedValue())
+    payment_document_code = db.Column(
+        db.String, db.ForeignKey('payment_document_type.payment_document_code'), nullable=False)
+    requested_by_email = db.Column(db.String)
+    status = db.Column(db.String, nullable=False, default='PENDING')
+
+    jobs = db.relationship(
+        'PaymentDocumentJob', lazy='select', order_by='PaymentDocumentJob.create_timestamp')
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.batch_guid} {self.status}>'
+
+    @classmethod
+    def find_by_guid(cls, batch_guid):
+        return cls.query.filter_by(batch_guid=batch_guid).one_or_none()
+
+    @classmethod
+    def create(cls, payment_document_code, items):
+        """
+        Queues a job per item of (application, work_ids, contracted_work_payments) in the current transaction.
+        Each item is queued in its own savepoint, returns the batch and the error of each item that failed.
+        """
+
+        batch = cls(
+            payment_document_code=payment_document_code, requested_by_email=User().get_user_email())
+        db.session.add(batch)
+        db.session.flush()
+
+        errors = {}
+        for index, (application, work_ids, contracted_work_payments) in enumerate(items):
+            try:
+                with db.session.begin_nested():
+                    job = PaymentDocumentJob.enqueue(
+                        application,
+                        payment_document_code,
+                        work_ids,
+                        batch_guid=batch.batch_guid,
+                        contracted_work_payments=contracted_work_payments)
+                if job.batch_guid != batch.batch_guid:
+                    raise Exception(f'This PRF is already queued in job {job.job_guid}')
+            except Exception as e:
+                errors[index] = str(e)
+
+        return batch, errors
+
+    def has_pending_jobs(self):
+        return PaymentDocumentJob.query.filter_by(
+            batch_guid=self.batch_guid, status='PENDING').count() > 0
+
+    def complete(self):
+        """Emails the PRFs of the succeeded jobs to finance in one zip, once no job is pending."""
+
+        if self.status != 'PENDING' or self.has_pending_jobs():
+            return
+
+        jobs = PaymentDocumentJob.query.options(undefer('rendered_document')).filter_by(
+            batch_guid=self.batch_guid, status='SUCCEEDED').order_by(
+                PaymentDocumentJob.invoice_number).all()
+        if jobs:
+            zip_file = io.BytesIO()
+            with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for job in jobs:
+                    zf.writestr(job.document_name, job.rendered_document)
+            EmailService().send_payment_document_batch(self, jobs, zip_file)
+
+        for job in jobs:
+            job.rendered_document = None
+        self.status = 'COMPLETED'
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
+from sqlalchemy.schema import FetchedValue
+
+from app.extensions import db
+from app.api.utils.models_mixins import Base, AuditMixin
+from app.api.utils.include.user_info import User
+from app.api.application.models.payment_document import PaymentDocument
+
+
+class PaymentDocumentJob(Base, AuditMixin):
+    """
+    Queued PRF generation. The invoice number and content are reserved when the job is queued, the
+    PaymentDocumentJobWorker then runs the RENDER, UPLOAD and RECORD stages, each in its own transaction.
+    """
+
+    __tablename__ = 'payment_document_job'
+
+    STAGES = ['RENDER', 'UPLOAD', 'RECORD']
+
+    job_guid = db.Column(UUID(as_uuid=True), primary_key=True, server_default=FetchedValue())
+    application_guid = db.Column(
+        UUID(as_uuid=True), db.ForeignKey('application.guid'), nullable=False)
+    payment_document_code = db.Column(
+        db.String, db.ForeignKey('payment_document_type.payment_document_code'), nullable=False)
+    work_ids = db.Column(ARRAY(db.String))
+    idempotency_key = db.Column(db.String)
+    invoice_number = db.Column(db.String, nullable=False)
+    content = db.Column(JSONB, nullable=False)
+    requested_by_email = db.Column(db.String)
+    status = db.Column(db.String, nullable=False, default='PENDING')
+    stage = db.Column(db.String, nullable=False, default='RENDER')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String)
+    rendered_document = db.deferred(db.Column(db.LargeBinary))
+    document_name = db.Column(db.String)
+    object_store_path = db.Column(db.String)
+    document_guid = db.Column(UUID(as_uuid=True), db.ForeignKey('payment_document.document_guid'))
+    batch_guid = db.Column(UUID(as_uuid=True), db.ForeignKey('payment_document_batch.batch_guid'))
+
+    application = db.relationship('Application', lazy='select')
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.job_guid} {self.status} {self.stage}>'
+
+    @classmethod
+    def find_by_guid(cls, application_guid, job_guid):
+        return cls.query.filter_by(application_guid=application_guid, job_guid=job_guid).one_or_none()
+
+    @classmethod
+    def find_pending(cls, application_guid, payment_document_code, work_ids):
+        return cls.query.filter_by(
+            application_guid=application_guid,
+            payment_document_code=payment_document_code,
+            status='PENDING').filter(cls.work_ids == work_ids).first()
+
+    @classmethod
+    def enqueue(cls,
+                application,
+                payment_document_code,
+                work_ids=None,
+                idempotency_key=None,
+                batch_guid=None,
+                contracted_work_payments=None):
+        """
+        Queues a PRF in the current transaction, returning the existing job instead when the idempotency key
+        was used before for the application or the same PRF is already queued. The invoice number and content are computed here,
+        so invalid requests still fail synchronously. Already loaded contracted work payments can be passed.
+        """
+
+        if idempotency_key:
+            job = cls.query.filter_by(
+                application_guid=application.guid, idempotency_key=idempotency_key).one_or_none()
+            if job:
+                return job
+
+        work_ids = sorted(work_ids) if work_ids else None
+
+        cls.lock_invoice_numbering(application.guid)
+
+        job = cls.find_pending(application.guid, payment_document_code, work_ids)
+        if job:
+            return job
+
+        invoice_number = PaymentDocument.create_invoice_number(application, payment_document_code)
+        doc = PaymentDocument(
+            application=application,
+            payment_document_code=payment_document_code,
+            work_ids=work_ids,
+            invoice_number=invoice_number,
+            contracted_work_payments=contracted_work_payments or [])
+
+        job = cls(
+            application=application,
+            payment_document_code=payment_document_code,
+            work_ids=work_ids,
+            idempotency_key=idempotency_key,
+            batch_guid=batch_guid,
+            invoice_number=doc.invoice_number,
+            content=doc.content,
+            requested_by_email=User().get_user_email())
+        db.session.add(job)
+        return job
+
+    @staticmethod
+    def lock_invoice_numbering(application_guid):
+        """Serializes queueing and recording the PRFs of an application until the transaction ends."""
+        db.session.execute(
+            db.select([func.pg_advisory_xact_lock(func.hashtext(str(application_guid)))]))
+
+    @classmethod
+    def claim_due(cls):
+        """Locks the next due job, skipping the ones other workers are running."""
+        return cls.query.filter(cls.status == 'PENDING',
+                                cls.next_attempt_timestamp <= datetime.utcnow()).order_by(
+                                    cls.next_attempt_timestamp).with_for_update(
+                                        skip_locked=True).first()
+
+    def build_payment_document(self):
+        return PaymentDocument(
+            application=self.application,
+            payment_document_code=self.payment_document_code,
+            work_ids=self.work_ids,
+            invoice_number=self.invoice_number,
+            content=self.content,
+            document_name=self.document_name,
+            object_store_path=self.object_store_path,
+            create_user=self.create_user,
+            update_user=self.create_user)
+
+    def complete_stage(self):
+        """Moves on to the next stage, with its own retries."""
+        index = self.STAGES.index(self.stage)
+        self.attempts = 0
+        self.last_error = None
+        self.next_attempt_timestamp = datetime.utcnow()
+        if index + 1 < len(self.STAGES):
+            self.stage = self.STAGES[index + 1]
+        else:
+            self.status = 'SUCCEEDED'
+            # Batches email their PRFs together once all of their jobs have finished
+            if not self.batch_guid:
+                self.rendered_document = None
+
+    def mark_failed(self, error, max_attempts, backoff_seconds):
+        """Schedules a retry of the current stage with exponential backoff, or gives up after max_attempts."""
+        self.attempts += 1
+        self.last_error = str(error)[:1000]
+        if self.attempts >= max_attempts:
+            self.status = 'FAILED'
+        else:
+            self.next_attempt_timestamp = datetime.utcnow() + timedelta(
+                seconds=backoff_seconds * 2**(self.attempts - 1))
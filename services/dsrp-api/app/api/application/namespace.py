@@ -5,7 +5,7 @@ from app.api.application.resources.application_document import ApplicationDocume
 from app.api.application.resources.application_status import ApplicationStatusListResource
 from app.api.application.resources.application_summary import ApplicationSummaryResource
 from app.api.application.resources.gen_application_docs import GenerateApplicationDocumentResource
-from app.api.application.resources.payment_document import PaymentDocumentResource, PaymentDocumentListResource
+from app.api.application.resources.payment_document import PaymentDocumentResource, PaymentDocumentListResource, PaymentDocumentJobResource, PaymentDocumentBatchListResource, PaymentDocumentBatchResource
 from app.api.application.resources.application_approved_contracted_work import ApplicationApprovedContractedWorkResource, ApplicationApprovedContractedWorkListResource
 from app.api.contracted_work.resources.contracted_work_payment import ContractedWorkPaymentInterim, ContractedWorkPaymentFinal, ContractedWorkPaymentInterimReport, AdminContractedWorkPaymentStatusChange, AdminContractedWorkPaymentAudit
 
@@ -27,6 +27,10 @@ api.add_resource(ApplicationDocumentListResource, '/<string:application_guid>/do
 api.add_resource(PaymentDocumentResource,
                  '/<string:application_guid>/payment-doc/<string:document_guid>')
 api.add_resource(PaymentDocumentListResource, '/<string:application_guid>/payment-doc')
+api.add_resource(PaymentDocumentJobResource,
+                 '/<string:application_guid>/payment-doc-job/<string:job_guid>')
+api.add_resource(PaymentDocumentBatchListResource, '/payment-doc-batch')
+api.add_resource(PaymentDocumentBatchResource, '/payment-doc-batch/<string:batch_guid>')
 
 # Contracted Work
 api.add_resource(ApplicationApprovedContractedWorkResource,
@@ -1,4 +1,7 @@
-from flask_restplus import Resource
+import json
+
+from hashlib import sha1
+from flask_restplus import Resource, marshal, inputs
 from flask import request
 from sqlalchemy_filters import apply_pagination, apply_sort
 from sqlalchemy import desc, asc, func, or_, and_
@@ -11,53 +14,74 @@ from deepdiff import DeepDiff
 from app.extensions import api
 from app.api.utils.access_decorators import requires_role_view_all, requires_role_admin
 from app.api.utils.resources_mixins import UserMixin
-from app.api.application.response_models import APPLICATION, APPLICATION_LIST
+from app.api.application.response_models import APPLICATION, APPLICATION_LIST, APPLICATION_CURSOR_LIST
 from app.api.application.models.application import Application
 from app.api.application.models.application_status_change import ApplicationStatusChange
 from app.api.constants import DEFAULT_PAGE_NUMBER, DEFAULT_PAGE_SIZE, DISABLE_APP_SUBMIT_SETTING
 from app.api.dsrp_settings.models.dsrp_settings import DSRPSettings
+from app.api.utils.helpers import apply_keyset_pagination, approximate_query_count, estimate_table_count, ensure_valid_page_size
 
 CURRENT_APPLICATION_PHASE_CODE = 'NOMINATION'
+KEYSET_SORT_FIELDS = ('submission_date', 'id', 'application_status_code', 'application_phase_code')
 
 
 class ApplicationListResource(Resource, UserMixin):
-    @api.doc(description='Get all applications. Default order: submission_date asc')
-    @api.marshal_with(APPLICATION_LIST, code=200)
+    @api.doc(
+        description=
+        'Get all applications. Default order: submission_date asc. Pass a cursor (empty for the first page) to use cursor pagination instead of page numbers. Searches by company_name can be ranked with sort_field=relevance.',
+        params={
+            'cursor': 'Opaque cursor returned as next_cursor by the previous page',
+            'include_count': 'Return an approximate total with cursor pagination'
+        })
+    @api.response(200, 'Success', APPLICATION_LIST)
     @requires_role_view_all
     def get(self):
-        records, pagination_details = self._apply_filters_and_pagination(
-            page_number=request.args.get('page', DEFAULT_PAGE_NUMBER, type=int),
-            page_size=request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int),
-            sort_field=request.args.get('sort_field', 'submission_date', type=str),
-            sort_dir=request.args.get('sort_dir', 'asc', type=str),
+        filters = dict(
             application_status_code=request.args.getlist('application_status_code', type=str),
             id=request.args.get('id', type=int),
             guid=request.args.get('guid', type=str),
             company_name=request.args.get('company_name', type=str),
             application_phase_code=request.args.getlist('application_phase_code', type=str))
+        page_size = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+        sort_field = request.args.get('sort_field', 'submission_date', type=str)
+        sort_dir = request.args.get('sort_dir', 'asc', type=str)
+
+        if 'cursor' in request.args:
+            return marshal(
+                self._apply_filters_and_keyset_pagination(
+                    cursor=request.args.get('cursor', type=str),
+                    page_size=page_size,
+                    sort_field=sort_field,
+                    sort_dir=sort_dir,
+                    include_count=request.args.get('include_count', False, type=inputs.boolean),
+                    **filters), APPLICATION_CURSOR_LIST)
+
+        records, pagination_details = self._apply_filters_and_pagination(
+            page_number=request.args.get('page', DEFAULT_PAGE_NUMBER, type=int),
+            page_size=page_size,
+            sort_field=sort_field,
+            sort_dir=sort_dir,
+            **filters)
 
         data = records.all()
 
-        return {
-            'records': data,
-            'current_page': pagination_details.page_number,
-            'total_pages': pagination_details.num_pages,
-            'items_per_page': pagination_details.page_size,
-            'total': pagination_details.total_results
-        }
+        return marshal(
+            {
+                'records': data,
+                'current_page': pagination_details.page_number,
+                'total_pages': pagination_details.num_pages,
+                'items_per_page': pagination_details.page_size,
+                'total': pagination_details.total_results
+            }, APPLICATION_LIST)
 
-    def _apply_filters_and_pagination(self,
-                                      page_number=DEFAULT_PAGE_NUMBER,
-                                      page_size=DEFAULT_PAGE_SIZE,
-                                      sort_field=None,
-                                      sort_dir=None,
-                                      id=None,
-                                      guid=None,
-                                      company_name=None,
-                                      application_status_code=[],
-                                      application_phase_code=[]):
+    def _apply_filters(self,
+                       id=None,
+                       guid=None,
+                       company_name=None,
+                       application_status_code=[],
+                       application_phase_code=[]):
 
-        base_query = Application.query
+        base_query = Application.list_query()
 
         filters = []
 
@@ -76,13 +100,24 @@ class ApplicationListResource(Resource, UserMixin):
                 Application.application_phase_code.in_(application_phase_code))
 
         if company_name:
-            filters.append(
-                Application.json['company_details']['company_name']['label'].astext.contains(
-                    company_name.upper()))
+            filters.append(Application.company_name_contains(company_name))
+
+        return base_query.filter(*filters)
+
+    def _apply_filters_and_pagination(self,
+                                      page_number=DEFAULT_PAGE_NUMBER,
+                                      page_size=DEFAULT_PAGE_SIZE,
+                                      sort_field=None,
+                                      sort_dir=None,
+                                      **filters):
 
-        base_query = base_query.filter(*filters)
+        base_query = self._apply_filters(**filters)
 
-        if sort_field and sort_dir:
+        if sort_field == 'relevance' and filters.get('company_name'):
+            base_query = base_query.order_by(
+                desc(Application.company_name_similarity(filters['company_name'])),
+                asc(Application.id))
+        elif sort_field and sort_dir:
             sort_criteria = [{
                 'model': 'Application',
                 'field': sort_field,
@@ -92,6 +127,44 @@ class ApplicationListResource(Resource, UserMixin):
 
         return apply_pagination(base_query, page_number, page_size)
 
+    @staticmethod
+    def _approximate_count_cache_key(filters):
+        filter_key = json.dumps(filters, sort_keys=True)
+        return f'dsrp:application_count:{sha1(filter_key.encode()).hexdigest()}'
+
+    def _apply_filters_and_keyset_pagination(self,
+                                             cursor=None,
+                                             page_size=DEFAULT_PAGE_SIZE,
+                                             sort_field='submission_date',
+                                             sort_dir='asc',
+                                             include_count=False,
+                                             **filters):
+        if sort_field not in KEYSET_SORT_FIELDS:
+            raise BadRequest(
+                f'Cursor pagination can only be sorted by: {", ".join(KEYSET_SORT_FIELDS)}')
+        if sort_dir not in ('asc', 'desc'):
+            raise BadRequest('sort_dir must be asc or desc')
+
+        page_size = ensure_valid_page_size(page_size)
+        base_query = self._apply_filters(**filters)
+        records, next_cursor = apply_keyset_pagination(base_query, Application, sort_field,
+                                                       sort_dir, cursor, page_size)
+
+        approximate_total = None
+        if include_count:
+            if not any(filters.values()):
+                approximate_total = estimate_table_count(Application.__tablename__)
+            if approximate_total is None:
+                approximate_total = approximate_query_count(
+                    base_query, self._approximate_count_cache_key(filters))
+
+        return {
+            'records': records,
+            'next_cursor': next_cursor,
+            'items_per_page': page_size,
+            'approximate_total': approximate_total
+        }
+
     @api.doc(description='Create an application')
     @api.expect(APPLICATION, validate=True)
     @api.marshal_with(APPLICATION, code=201)
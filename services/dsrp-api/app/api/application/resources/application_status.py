@@ -7,6 +7,7 @@ from app.api.utils.resources_mixins import UserMixin
 from app.api.application.models.application import Application
 from app.api.application.models.application_status_change import ApplicationStatusChange
 from app.api.utils.access_decorators import requires_role_admin
+from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
 
 
 class ApplicationStatusListResource(Resource, UserMixin):
@@ -22,5 +23,6 @@ class ApplicationStatusListResource(Resource, UserMixin):
             application_status_code=request.json['application_status_code'],
             note=request.json['note'])
         app_status_change.save()
+        PaymentDocumentJobWorker.wake()
 
         return '', 204
@@ -13,7 +13,7 @@ class ApplicationSummaryResource(Resource, UserMixin):
     @api.marshal_with(APPLICATION_SUMMARY, code=200)
     @requires_otp_or_admin
     def get(self, application_guid):
-        application = Application.find_by_guid(application_guid)
+        application = Application.find_summary_by_guid(application_guid)
         if application is None:
             raise NotFound('No application was found matching the provided reference number')
 
@@ -8,11 +8,24 @@ from app.extensions import api, db, cache
 from app.api.utils.resources_mixins import UserMixin
 from app.api.application.models.application import Application
 from app.api.application.models.payment_document import PaymentDocument
+from app.api.application.models.payment_document_job import PaymentDocumentJob
+from app.api.application.models.payment_document_batch import PaymentDocumentBatch
+from app.api.contracted_work.models.contracted_work_payment import ContractedWorkPayment
+from app.api.company_payment_info.models import CompanyPaymentInfo
 from app.api.application.models.payment_document_contracted_work_payment_xref import PaymentDocumentContractedWorkPaymentXref
 from app.api.utils.access_decorators import requires_role_admin
 from app.api.constants import DOWNLOAD_TOKEN, TIMEOUT_5_MINUTES
 from app.api.documents.response_models import DOWNLOAD_TOKEN_MODEL
-from app.api.application.response_models import PAYMENT_DOCUMENT
+from app.api.application.response_models import PAYMENT_DOCUMENT_JOB, PAYMENT_DOCUMENT_BATCH
+from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
+
+
+def is_guid(value):
+    try:
+        uuid.UUID(value)
+        return True
+    except (TypeError, ValueError, AttributeError):
+        return False
 
 
 def validate_application_contracted_work(application, work_ids):
@@ -33,9 +46,98 @@ def validate_application_contracted_work(application, work_ids):
             raise BadRequest(f'Work ID {work_id} is not approved!')
 
 
+def validate_batch_items(items):
+    """
+    Validates the items of a PRF batch with one query per table. Returns the (application, work_ids,
+    contracted_work_payments) of the valid items and the error of each invalid item by its index.
+    """
+
+    errors = {}
+    application_guids = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = 'Each item must be an object with an application_guid and work_ids'
+            continue
+        work_ids = item.get('work_ids')
+        if not isinstance(work_ids, list) or not all(
+                isinstance(work_id, str) for work_id in work_ids):
+            errors[index] = 'Work IDs must be a list of strings'
+            continue
+        if len(set(work_ids)) != len(work_ids):
+            errors[index] = 'Work IDs must not be repeated'
+            continue
+        try:
+            application_guids.add(str(uuid.UUID(item.get('application_guid'))))
+        except (TypeError, ValueError, AttributeError):
+            errors[index] = 'Invalid application GUID'
+    all_work_ids = [
+        work_id for index, item in enumerate(items) if index not in errors
+        for work_id in item['work_ids']
+    ]
+
+    applications = {
+        str(application.guid): application
+        for application in Application.query.filter(Application.guid.in_(application_guids))
+    } if application_guids else {}
+    contracted_work_payments = {
+        payment.work_id: payment
+        for payment in ContractedWorkPayment.query.filter(
+            ContractedWorkPayment.work_id.in_(all_work_ids))
+    } if all_work_ids else {}
+    company_names = {application.company_name for application in applications.values()}
+    companies_with_payment_info = {
+        info.company_name
+        for info in CompanyPaymentInfo.query.filter(
+            CompanyPaymentInfo.company_name.in_(company_names))
+    } if company_names else set()
+
+    valid_items = []
+    seen_work_ids = set()
+    for index, item in enumerate(items):
+        if index in errors:
+            continue
+        try:
+            application = applications.get(str(uuid.UUID(item['application_guid'])))
+            work_ids = item.get('work_ids')
+            validate_application_contracted_work(application, work_ids)
+
+            if application.company_name not in companies_with_payment_info:
+                raise BadRequest(
+                    f'Essential company payment info for {application.company_name} is missing')
+            for work_id in work_ids:
+                if work_id not in contracted_work_payments:
+                    raise BadRequest(f'Work ID {work_id} has no payment information!')
+                if work_id in seen_work_ids:
+                    raise BadRequest(f'Work ID {work_id} is in more than one item of this batch')
+            seen_work_ids.update(work_ids)
+
+        except (NotFound, BadRequest) as e:
+            errors[index] = e.description
+            continue
+
+        valid_items.append((index, (application, work_ids,
+                                    [contracted_work_payments[work_id] for work_id in work_ids])))
+
+    return valid_items, errors
+
+
+def batch_result(batch, items):
+    return {
+        'batch_guid': batch.batch_guid,
+        'payment_document_code': batch.payment_document_code,
+        'status': batch.status,
+        'create_user': batch.create_user,
+        'create_timestamp': batch.create_timestamp,
+        'items': items
+    }
+
+
 class PaymentDocumentListResource(Resource, UserMixin):
-    @api.doc(description='Create an interim or final PRF')
-    @api.marshal_with(PAYMENT_DOCUMENT, code=201)
+    @api.doc(
+        description=
+        'Queue an interim or final PRF. Poll the returned job for its progress, a repeated Idempotency-Key header returns the same job.'
+    )
+    @api.marshal_with(PAYMENT_DOCUMENT_JOB, code=202)
     @requires_role_admin
     def post(self, application_guid):
         application = Application.find_by_guid(application_guid)
@@ -48,16 +150,32 @@ class PaymentDocumentListResource(Resource, UserMixin):
                 'First PRFs are created when an application\'s status is set to approved.')
 
         try:
-            doc = PaymentDocument(
-                application=application,
-                payment_document_code=payment_document_code,
-                work_ids=work_ids)
-            doc.save()
-
+            job = PaymentDocumentJob.enqueue(
+                application,
+                payment_document_code,
+                work_ids,
+                idempotency_key=request.headers.get('Idempotency-Key'))
+            db.session.commit()
         except Exception as e:
+            db.session.rollback()
             raise BadRequest(f'Failed to create the PRF: {e}')
 
-        return doc, 201
+        PaymentDocumentJobWorker.wake()
+        return job, 202
+
+
+class PaymentDocumentJobResource(Resource, UserMixin):
+    @api.doc(description='Get the progress of a queued PRF')
+    @api.marshal_with(PAYMENT_DOCUMENT_JOB, code=200)
+    @requires_role_admin
+    def get(self, application_guid, job_guid):
+        job = None
+        if is_guid(application_guid) and is_guid(job_guid):
+            job = PaymentDocumentJob.find_by_guid(application_guid, job_guid)
+        if not job:
+            raise NotFound('PRF job not found')
+
+        return job
 
 
 class PaymentDocumentResource(Resource, UserMixin):
@@ -82,3 +200,67 @@ class PaymentDocumentResource(Resource, UserMixin):
 
         payment_document.soft_delete()
         return None, 204
+
+
+class PaymentDocumentBatchListResource(Resource, UserMixin):
+    @api.doc(
+        description=
+        'Queue the interim or final PRFs of many applications, emailed to finance together once all of them are generated. The result of each item is reported in the order of the request.'
+    )
+    @api.marshal_with(PAYMENT_DOCUMENT_BATCH, code=202)
+    @requires_role_admin
+    def post(self):
+        payment_document_code = request.json['payment_document_code']
+        if payment_document_code not in ('INTERIM_PRF', 'FINAL_PRF'):
+            raise BadRequest('Only interim and final PRFs can be created in a batch.')
+
+        items = request.json.get('items') or []
+        if not isinstance(items, list) or not items:
+            raise BadRequest('No items were provided!')
+
+        valid_items, errors = validate_batch_items(items)
+        if not valid_items:
+            raise BadRequest(f'None of the items can be queued: {errors}')
+
+        batch, enqueue_errors = PaymentDocumentBatch.create(
+            payment_document_code, [item for index, item in valid_items])
+        for position, error in enqueue_errors.items():
+            errors[valid_items[position][0]] = error
+        db.session.commit()
+
+        PaymentDocumentJobWorker.wake()
+
+        jobs = {(str(job.application_guid), tuple(job.work_ids)): job for job in batch.jobs}
+        results = []
+        for index, item in enumerate(items):
+            job = None
+            if index not in errors:
+                job = jobs.get((str(uuid.UUID(item['application_guid'])), tuple(sorted(item['work_ids']))))
+            # Invalid items are echoed back as far as they can be marshalled
+            item = item if isinstance(item, dict) else {}
+            work_ids = item.get('work_ids')
+            results.append({
+                'application_guid': item.get('application_guid'),
+                'work_ids': work_ids if isinstance(work_ids, list) else None,
+                'job': job,
+                'error': errors.get(index)
+            })
+
+        return batch_result(batch, results), 202
+
+
+class PaymentDocumentBatchResource(Resource, UserMixin):
+    @api.doc(description='Get the progress of each PRF of a batch')
+    @api.marshal_with(PAYMENT_DOCUMENT_BATCH, code=200)
+    @requires_role_admin
+    def get(self, batch_guid):
+        batch = PaymentDocumentBatch.find_by_guid(batch_guid) if is_guid(batch_guid) else None
+        if not batch:
+            raise NotFound('PRF batch not found')
+
+        return batch_result(batch, [{
+            'application_guid': job.application_guid,
+            'work_ids': job.work_ids,
+            'job': job,
+            'error': job.last_error
+        } for job in batch.jobs])
@@ -58,6 +58,42 @@ PAYMENT_DOCUMENT = api.model(
         'create_user': fields.String
     })
 
+PAYMENT_DOCUMENT_JOB = api.model(
+    'PaymentDocumentJob', {
+        'job_guid': fields.String,
+        'application_guid': fields.String,
+        'payment_document_code': fields.String,
+        'work_ids': fields.List(fields.String),
+        'invoice_number': fields.String,
+        'status': fields.String,
+        'stage': fields.String,
+        'attempts': fields.Integer,
+        'last_error': fields.String,
+        'document_guid': fields.String,
+        'batch_guid': fields.String,
+        'create_user': fields.String,
+        'create_timestamp': fields.DateTime,
+        'update_timestamp': fields.DateTime
+    })
+
+PAYMENT_DOCUMENT_BATCH_ITEM = api.model(
+    'PaymentDocumentBatchItem', {
+        'application_guid': fields.String,
+        'work_ids': fields.List(fields.String),
+        'job': fields.Nested(PAYMENT_DOCUMENT_JOB, allow_null=True),
+        'error': fields.String
+    })
+
+PAYMENT_DOCUMENT_BATCH = api.model(
+    'PaymentDocumentBatch', {
+        'batch_guid': fields.String,
+        'payment_document_code': fields.String,
+        'status': fields.String,
+        'create_user': fields.String,
+        'create_timestamp': fields.DateTime,
+        'items': fields.List(fields.Nested(PAYMENT_DOCUMENT_BATCH_ITEM))
+    })
+
 APPLICATION_DOCUMENT_LIST = api.model(
     'ApplicationDocumentList', {'documents': fields.List(fields.Nested(APPLICATION_DOCUMENT))})
 
@@ -78,6 +114,14 @@ APPLICATION = api.model(
 APPLICATION_LIST = api.inherit('ApplicationList', PAGINATED_LIST,
                                {'records': fields.List(fields.Nested(APPLICATION))})
 
+APPLICATION_CURSOR_LIST = api.model(
+    'ApplicationCursorList', {
+        'records': fields.List(fields.Nested(APPLICATION)),
+        'next_cursor': fields.String,
+        'items_per_page': fields.Integer,
+        'approximate_total': fields.Integer
+    })
+
 APPLICATION_SUMMARY = api.model(
     'ApplicationSummary', {
         'id': fields.Integer,
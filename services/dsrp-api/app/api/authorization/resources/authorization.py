@@ -9,6 +9,7 @@ from app.extensions import cache, api
 from app.api.utils.resources_mixins import UserMixin
 from app.api.application.models.application import Application
 from app.api.services.email_service import EmailService
+from app.api.services.email_template_service import render_email_template
 from app.api.constants import TIMEOUT_4_HOURS
 from app.api.authorization.constants import *
 from app.api.utils.custom_reqparser import CustomReqparser
@@ -37,36 +38,10 @@ class AuthorizationResource(Resource, UserMixin):
         if application is None:
             raise NotFound('No application was found matching the provided reference number')
 
-        html_content = f"""
-        <table width="100%" style="font-size:12.0pt; color:#595959 " >
-            <tr>
-                <td>
-                    You have requested access to the Dormant Sites Reclamation Program site to view information about an application (see Reference Number above).
-                    <br/>
-                    <br/>
-                    Use the button below to access your application information and submit payment requests.
-                    <br/>
-                    This button can only be used once and access expires after four hours. If you need to access the application again, request another link on the website.
-                </td> 
-            </tr>   
-            <tr>
-                <td>
-                <br/>
-                    <table style="margin-left: auto; margin-right: auto;">
-                        <tr>
-                            <td style="border-radius: 2px;" bgcolor="#003366" >
-                                <a href="{ONE_TIME_LINK_FRONTEND_URL(otl_guid)}" target="_blank" style="padding: 8px 12px; border: 1px solid #003366;border-radius: 2px;font-size: 14px; color: #ffffff;text-decoration: none;font-weight:bold;display: inline-block;">
-                                    View Application             
-                                </a>
-                            </td>
-                        </tr>
-                    </table>
-                <br/>
-                </td>
-            </tr>
-		</table>"""
-
-        with EmailService() as es:
+        html_content = render_email_template(
+            'access_request.html', access_url=ONE_TIME_LINK_FRONTEND_URL(otl_guid))
+
+        with EmailService(commit=True) as es:
             es.send_email_to_applicant(application,
                                        f"Dormant Site Reclamation Program – Access Request",
                                        html_content)
@@ -2,6 +2,14 @@ def DOWNLOAD_TOKEN(token_guid):
     return f'dsrp:s3-download-token:{token_guid}'
 
 
+def DOCGEN_TEMPLATE_PUSHED(checksum):
+    return f'dsrp:docgen-template-pushed:{checksum}'
+
+
+def RENDERED_DOCUMENT(key):
+    return f'dsrp:rendered-document:{key}'
+
+
 # Deep Update Special Flag
 STATE_MODIFIED_DELETE_ON_PUT = "delete"
 
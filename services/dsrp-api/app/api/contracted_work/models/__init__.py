@@ -2,4 +2,6 @@ from .contracted_work_payment import *
 from .contracted_work_payment_status import *
 from .contracted_work_payment_status_change import *
 from .contracted_work_payment_type import *
-from .contracted_work_status import *
\ No newline at end of file
+from .contracted_work_status import *
+from .contracted_work_item import *
+
@@ -0,0 +1,28 @@
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.extensions import db
+from app.api.utils.models_mixins import Base
+
+
+class ContractedWorkItem(Base):
+    """
+    Read-only relational projection of the contracted work items in application.json merged with
+    their review data. Rows are maintained by the contracted_work_item_sync trigger on application.
+    """
+
+    __tablename__ = 'contracted_work_item'
+
+    work_id = db.Column(db.String, primary_key=True)
+    application_guid = db.Column(
+        UUID(as_uuid=True), db.ForeignKey('application.guid'), nullable=False)
+    application_id = db.Column(db.Integer, nullable=False)
+    contracted_work_type = db.Column(db.String, nullable=False)
+    well_authorization_number = db.Column(db.String)
+    contracted_work_status_code = db.Column(db.String)
+    contracted_work_total = db.Column(db.Numeric(14, 2), nullable=False)
+    estimated_shared_cost = db.Column(db.Numeric(14, 2), nullable=False)
+
+    application = db.relationship('Application', lazy='select', viewonly=True)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.work_id}>'
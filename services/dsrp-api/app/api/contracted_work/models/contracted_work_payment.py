@@ -1,14 +1,12 @@
-from datetime import datetime, timedelta
-
 from sqlalchemy.schema import FetchedValue
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import selectinload
 from sqlalchemy import desc, func, and_, select
 
 from app.extensions import db
 from app.api.utils.models_mixins import Base, AuditMixin
 from app.api.contracted_work.models.contracted_work_payment_status_change import ContractedWorkPaymentStatusChange
-from app.api.constants import REVIEW_DEADLINE_NOT_APPLICABLE, REVIEW_DEADLINE_PAID
 
 
 class ContractedWorkPayment(Base, AuditMixin):
@@ -75,13 +73,51 @@ class ContractedWorkPayment(Base, AuditMixin):
 
     status_changes = db.relationship(
         'ContractedWorkPaymentStatusChange',
-        lazy='selectin',
+        lazy='select',
+        foreign_keys='ContractedWorkPaymentStatusChange.contracted_work_payment_id',
         order_by='desc(ContractedWorkPaymentStatusChange.change_timestamp)')
 
     payment_documents = db.relationship(
-        'PaymentDocument',
+        'PaymentDocument', lazy='select', secondary='payment_document_contracted_work_payment_xref')
+
+    # Maintained by the database from the status changes and payment documents, in the same transaction
+    interim_payment_status_code = db.Column(
+        db.String,
+        db.ForeignKey('contracted_work_payment_status.contracted_work_payment_status_code'),
+        nullable=False,
+        server_default=FetchedValue())
+    final_payment_status_code = db.Column(
+        db.String,
+        db.ForeignKey('contracted_work_payment_status.contracted_work_payment_status_code'),
+        nullable=False,
+        server_default=FetchedValue())
+    interim_payment_status_change_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            'contracted_work_payment_status_change.contracted_work_payment_status_change_id'),
+        server_default=FetchedValue())
+    final_payment_status_change_id = db.Column(
+        db.Integer,
+        db.ForeignKey(
+            'contracted_work_payment_status_change.contracted_work_payment_status_change_id'),
+        server_default=FetchedValue())
+    interim_payment_submission_date = db.Column(db.DateTime, server_default=FetchedValue())
+    final_payment_submission_date = db.Column(db.DateTime, server_default=FetchedValue())
+    has_interim_prfs = db.Column(db.Boolean, nullable=False, server_default=FetchedValue())
+    has_final_prfs = db.Column(db.Boolean, nullable=False, server_default=FetchedValue())
+    interim_review_deadline = db.Column(db.DateTime, nullable=False, server_default=FetchedValue())
+    final_review_deadline = db.Column(db.DateTime, nullable=False, server_default=FetchedValue())
+
+    interim_payment_status = db.relationship(
+        'ContractedWorkPaymentStatusChange',
+        lazy='selectin',
+        foreign_keys=[interim_payment_status_change_id],
+        viewonly=True)
+    final_payment_status = db.relationship(
+        'ContractedWorkPaymentStatusChange',
         lazy='selectin',
-        secondary='payment_document_contracted_work_payment_xref')
+        foreign_keys=[final_payment_status_change_id],
+        viewonly=True)
 
     # Auditing
     audit_ind = db.Column(db.Boolean)
@@ -113,109 +149,29 @@ class ContractedWorkPayment(Base, AuditMixin):
     reclamation_reclaimed_to_meet_cor_p2_requirements = db.Column(db.Boolean)
     reclamation_surface_reclamation_criteria_met = db.Column(db.Boolean)
 
-    @hybrid_property
-    def has_interim_prfs(self):
-        if self.payment_documents:
-            return any(doc.active_ind and doc.payment_document_code == 'INTERIM_PRF'
-                       for doc in self.payment_documents)
-        return False
-
-    @hybrid_property
-    def has_final_prfs(self):
-        if self.payment_documents:
-            return any(doc.active_ind and doc.payment_document_code == 'FINAL_PRF'
-                       for doc in self.payment_documents)
-        return False
-
-    @hybrid_property
-    def interim_payment_status_code(self):
-        if self.interim_payment_status:
-            return self.interim_payment_status.contracted_work_payment_status_code
-        else:
-            return 'INFORMATION_REQUIRED'
-
-    @hybrid_property
-    def interim_payment_status(self):
-        if self.interim_payment_status_changes:
-            return self.interim_payment_status_changes[0]
-
-    @hybrid_property
-    def interim_payment_status_changes(self):
-        return [
-            status for status in self.status_changes
-            if status.contracted_work_payment_code == 'INTERIM'
-        ]
-
-    @hybrid_property
-    def interim_payment_submission_date(self):
-        if self.interim_payment_status_changes:
-            return self.interim_payment_status_changes[-1].change_timestamp
-
-    @hybrid_property
-    def final_payment_status_code(self):
-        if self.final_payment_status:
-            return self.final_payment_status.contracted_work_payment_status_code
-        else:
-            return 'INFORMATION_REQUIRED'
-
-    @hybrid_property
-    def final_payment_status(self):
-        if self.final_payment_status_changes:
-            return self.final_payment_status_changes[0]
-
-    @hybrid_property
-    def final_payment_status_changes(self):
-        return [
-            status for status in self.status_changes
-            if status.contracted_work_payment_code == 'FINAL'
-        ]
-
-    @hybrid_property
-    def final_payment_submission_date(self):
-        if self.final_payment_status_changes:
-            return self.final_payment_status_changes[-1].change_timestamp
-
-    @hybrid_property
+    @property
     def review_deadlines(self):
-        review_deadlines = {
-            'interim': REVIEW_DEADLINE_NOT_APPLICABLE,
-            'final': REVIEW_DEADLINE_NOT_APPLICABLE
-        }
-
-        interim_payment_submission_date = self.interim_payment_submission_date
-        final_payment_submission_date = self.final_payment_submission_date
+        return {'interim': self.interim_review_deadline, 'final': self.final_review_deadline}
 
-        # No payment information has been submitted
-        if interim_payment_submission_date is None and final_payment_submission_date is None:
-            return review_deadlines
-
-        # We don't need to review payments that have already had at least one PRF issued
-        if interim_payment_submission_date and self.has_interim_prfs:
-            interim_payment_submission_date = None
-            review_deadlines['interim'] = REVIEW_DEADLINE_PAID
-        if final_payment_submission_date and self.has_final_prfs:
-            final_payment_submission_date = None
-            review_deadlines['final'] = REVIEW_DEADLINE_PAID
-
-        # Both interim and final have been submitted and have completed the payment process
-        if interim_payment_submission_date is None and final_payment_submission_date is None:
-            return review_deadlines
-
-        days_to_review = timedelta(days=90)
-
-        if interim_payment_submission_date:
-            interim_deadline = interim_payment_submission_date + days_to_review
-            review_deadlines['interim'] = interim_deadline
-
-        if final_payment_submission_date:
-            final_deadline = final_payment_submission_date + days_to_review
-            review_deadlines['final'] = final_deadline
+    @hybrid_property
+    def review_deadlines_sort_key(self):
+        return tuple(sorted((self.interim_review_deadline, self.final_review_deadline)))
 
-        return review_deadlines
+    @review_deadlines_sort_key.expression
+    def review_deadlines_sort_key(cls):
+        return (func.least(cls.interim_review_deadline, cls.final_review_deadline),
+                func.greatest(cls.interim_review_deadline, cls.final_review_deadline))
 
     def __repr__(self):
         return f'<{self.__class__.__name__} {self.contracted_work_payment_id} {self.application_guid} {self.work_id}>'
 
+    @classmethod
+    def marshal_query(cls):
+        """Loads what CONTRACTED_WORK_PAYMENT uses, its current status changes and documents."""
+        return cls.query.options(
+            selectinload(cls.interim_payment_status).lazyload('*'),
+            selectinload(cls.final_payment_status).lazyload('*'))
+
     @classmethod
     def find_by_application_guid(cls, application_guid):
         return cls.query.filter_by(application_guid=application_guid).all()
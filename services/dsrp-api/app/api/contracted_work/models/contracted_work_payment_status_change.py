@@ -5,6 +5,7 @@ from sqlalchemy.schema import FetchedValue
 from app.extensions import db
 from app.api.utils.models_mixins import Base, AuditMixin
 from app.api.services.email_service import EmailService
+from app.api.services.email_template_service import render_email_template
 from app.api.services.document_generator_service import DocumentGeneratorService, get_template_file_path
 from app.api.contracted_work.models.contracted_work_payment_status import ContractedWorkPaymentStatus
 from app.api.contracted_work.models.contracted_work_payment_type import ContractedWorkPaymentType
@@ -44,21 +45,13 @@ class ContractedWorkPaymentStatusChange(Base, AuditMixin):
         contracted_work_payment_type = ContractedWorkPaymentType.find_by_code(
             self.contracted_work_payment_code)
 
-        html_content = f"""
-            <p>
-                The <b>{contracted_work_payment_type.description}</b> payment status of the contracted work item on your application with the work ID <b>{contracted_work_payment.work_id}</b> has been changed to <b>{contracted_work_payment_status.description}</b> with the following note:
-				<br />
-                <br />
-                <span style='margin-left: 10px'>{self.note}</span>
-				<br />
-                <br />
-                <a href='{Config.URL}/view-application-status/{application.guid}'>Click here to view the status of your application.</a>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-                <br/>
-            </p>"""
+        html_content = render_email_template(
+            'contracted_work_payment_status_change.html',
+            application=application,
+            payment_type_description=contracted_work_payment_type.description,
+            work_id=contracted_work_payment.work_id,
+            status_description=contracted_work_payment_status.description,
+            note=self.note)
 
         with EmailService() as es:
             es.send_email_to_applicant(application, 'Contracted Work Payment Status Change',
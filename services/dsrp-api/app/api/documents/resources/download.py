@@ -1,10 +1,12 @@
 from urllib.parse import quote
-from flask_restplus import Resource
-from flask import Response, request, stream_with_context, current_app
+from botocore.exceptions import BotoCoreError, ClientError
+from flask_restplus import Resource, marshal
+from flask import Response, request, stream_with_context, current_app, redirect
 from werkzeug.exceptions import BadRequest, NotFound
 
 from app.extensions import api, cache
 from app.api.constants import DOWNLOAD_TOKEN
+from app.api.documents.response_models import PRESIGNED_DOWNLOAD_URL_MODEL
 from app.api.utils.resources_mixins import UserMixin
 from app.api.application.models.application import Application
 from app.api.services.document_generator_service import DocumentGeneratorService
@@ -12,12 +14,50 @@ from app.api.application.models.application_document import ApplicationDocument
 from app.api.services.object_store_storage_service import ObjectStoreStorageService
 from app.api.application.models.payment_document import PaymentDocument
 
+DOWNLOAD_PARAMS = {
+    'token': 'The one-time download token.',
+    'as_attachment': 'Whether the file is downloaded as an attachment instead of opened.',
+    'mode': 'redirect to a presigned object store URL, url to return it or proxy to stream the file through the API. Defaults to DOCUMENT_DOWNLOAD_MODE.'
+}
+DOWNLOAD_MODES = ('redirect', 'url', 'proxy')
+
+
+def get_download_mode():
+    mode = request.args.get('mode', current_app.config['DOCUMENT_DOWNLOAD_MODE'])
+    if mode not in DOWNLOAD_MODES:
+        raise BadRequest(f'mode must be one of {", ".join(DOWNLOAD_MODES)}')
+    return mode
+
+
+def stored_file_response(path, document_name, as_attachment, mode):
+    """
+    Sends the browser to a short-lived presigned URL of the stored file so it is not streamed through an API
+    worker. The file is proxied when that is asked for or the URL cannot be created.
+    """
+    storage = ObjectStoreStorageService()
+    display_name = quote(document_name)
+    if mode != 'proxy':
+        expires_in = current_app.config['DOCUMENT_DOWNLOAD_URL_EXPIRY_SECONDS']
+        try:
+            url = storage.presigned_download_url(path, display_name, as_attachment, expires_in)
+        except (BotoCoreError, ClientError) as e:
+            current_app.logger.warning(f'Failed to presign {path}, proxying the download: {e}')
+        else:
+            if mode == 'url':
+                return marshal({'url': url, 'expires_in': expires_in}, PRESIGNED_DOWNLOAD_URL_MODEL)
+            return redirect(url, code=302)
+
+    return storage.download_file(
+        path=path, display_name=display_name, as_attachment=as_attachment)
+
 
 class DocumentDownloadResource(Resource, UserMixin):
-    @api.doc(description='Retrieve a file from document storage with token')
+    @api.doc(description='Retrieve a file from document storage with token', params=DOWNLOAD_PARAMS)
+    @api.response(200, 'Presigned URL of the file when mode is url', PRESIGNED_DOWNLOAD_URL_MODEL)
     def get(self):
         token_guid = request.args.get('token', '')
         attachment = request.args.get('as_attachment', None)
+        mode = get_download_mode()
         token_data = cache.get(DOWNLOAD_TOKEN(token_guid))
         cache.delete(DOWNLOAD_TOKEN(token_guid))
         current_app.logger.debug('redis_data' + str(token_data))
@@ -30,13 +70,16 @@ class DocumentDownloadResource(Resource, UserMixin):
         if token_data.get('generation', False):
             application = Application.find_by_guid(token_data['application_guid'])
             template_path = token_data['template_path']
-            docgen_resp = DocumentGeneratorService.generate_document_and_stream_response(
-                template_path, application.shared_cost_agreement_template_json, 'pdf')
-            headers = dict(docgen_resp.headers)
-            headers[
-                'Content-Disposition'] = f'attachment; filename=shared_cost_agreement_{application.company_name}.pdf'
+            document = DocumentGeneratorService.generate_document(
+                template_path, application.shared_cost_agreement_template_json, 'pdf', stream=True)
+            headers = {
+                'Content-Disposition':
+                f'attachment; filename=shared_cost_agreement_{application.company_name}.pdf'
+            }
             file_resp = Response(
-                stream_with_context(docgen_resp.iter_content(chunk_size=2048)), headers=headers)
+                stream_with_context(document.iter_content()),
+                mimetype=document.content_type,
+                headers=headers)
 
         # Download token
         else:
@@ -50,19 +93,19 @@ class DocumentDownloadResource(Resource, UserMixin):
             else:
                 attach_style = '.pdf' not in app_doc.document_name.lower()
 
-            file_resp = ObjectStoreStorageService().download_file(
-                path=app_doc.object_store_path,
-                display_name=quote(app_doc.document_name),
-                as_attachment=attach_style)
+            file_resp = stored_file_response(app_doc.object_store_path, app_doc.document_name,
+                                             attach_style, mode)
 
         return file_resp
 
 
 class PaymentDocumentDownloadResource(Resource, UserMixin):
-    @api.doc(description='Retrieve a file from document storage with token')
+    @api.doc(description='Retrieve a file from document storage with token', params=DOWNLOAD_PARAMS)
+    @api.response(200, 'Presigned URL of the file when mode is url', PRESIGNED_DOWNLOAD_URL_MODEL)
     def get(self):
         token_guid = request.args.get('token', '')
         attachment = request.args.get('as_attachment', None)
+        mode = get_download_mode()
         token_data = cache.get(DOWNLOAD_TOKEN(token_guid))
         cache.delete(DOWNLOAD_TOKEN(token_guid))
         current_app.logger.debug('redis_data' + str(token_data))
@@ -79,9 +122,7 @@ class PaymentDocumentDownloadResource(Resource, UserMixin):
         else:
             attach_style = '.pdf' not in payment_doc.document_name.lower()
 
-        file_resp = ObjectStoreStorageService().download_file(
-            path=payment_doc.object_store_path,
-            display_name=quote(payment_doc.document_name),
-            as_attachment=attach_style)
+        file_resp = stored_file_response(payment_doc.object_store_path, payment_doc.document_name,
+                                         attach_style, mode)
 
         return file_resp
\ No newline at end of file
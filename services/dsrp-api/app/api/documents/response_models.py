@@ -1,4 +1,9 @@
 from app.extensions import api
 from flask_restplus import fields
 
-DOWNLOAD_TOKEN_MODEL = api.model('DownloadToken', {'token_guid': fields.String})
\ No newline at end of file
+DOWNLOAD_TOKEN_MODEL = api.model('DownloadToken', {'token_guid': fields.String})
+
+PRESIGNED_DOWNLOAD_URL_MODEL = api.model('PresignedDownloadUrl', {
+    'url': fields.String,
+    'expires_in': fields.Integer
+})
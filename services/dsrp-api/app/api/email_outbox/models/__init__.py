@@ -0,0 +1 @@
+from .email_outbox import *
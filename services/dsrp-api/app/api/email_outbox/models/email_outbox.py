@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+from sqlalchemy.schema import FetchedValue
+
+from app.extensions import db
+from app.api.utils.models_mixins import Base, AuditMixin
+
+
+class EmailOutbox(Base, AuditMixin):
+    """Outbound email, queued in the transaction that triggers it and delivered by the EmailOutboxWorker."""
+
+    __tablename__ = 'email_outbox'
+
+    email_outbox_id = db.Column(db.Integer, primary_key=True, server_default=FetchedValue())
+    to_email = db.Column(db.String, nullable=False)
+    subject = db.Column(db.String, nullable=False)
+    message = db.Column(db.String, nullable=False)
+    status = db.Column(db.String, nullable=False, default='PENDING')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.String)
+    sent_timestamp = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.email_outbox_id} {self.status}>'
+
+    @classmethod
+    def claim_due(cls, limit):
+        """Locks the next due emails, skipping the ones other workers are sending."""
+        return cls.query.filter(cls.status == 'PENDING',
+                                cls.next_attempt_timestamp <= datetime.utcnow()).order_by(
+                                    cls.next_attempt_timestamp).with_for_update(
+                                        skip_locked=True).limit(limit).all()
+
+    def mark_sent(self):
+        self.status = 'SENT'
+        self.attempts += 1
+        self.sent_timestamp = datetime.utcnow()
+        self.last_error = None
+
+    def mark_failed(self, error, max_attempts, backoff_seconds):
+        """Schedules a retry with exponential backoff, or gives up after max_attempts."""
+        self.attempts += 1
+        self.last_error = str(error)[:1000]
+        if self.attempts >= max_attempts:
+            self.status = 'FAILED'
+        else:
+            self.next_attempt_timestamp = datetime.utcnow() + timedelta(
+                seconds=backoff_seconds * 2**(self.attempts - 1))
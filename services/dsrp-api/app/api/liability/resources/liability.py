@@ -10,12 +10,14 @@ import json
 
 class LiabilityListResource(Resource, UserMixin):
     @api.doc(description='Get all liabilities')
-    @api.marshal_with(LIABILITY, envelope='records', code=200)
+    @api.response(200, 'Success', LIABILITY)
+    @api.response(503, 'The OGC data is not available yet, retry after the Retry-After seconds')
     def get(self):
-        liabilities = OGCDataService.getLiabilityPerWellDataFrame()
+        liabilities = OGCDataService.getLiabilityPerWellDataset()
 
         application_guid = request.args.get('application_guid', None)
 
+        application_wells = None
         if application_guid is not None:
             application = Application.find_by_guid(application_guid)
             application_wells = [
@@ -23,7 +25,4 @@ class LiabilityListResource(Resource, UserMixin):
                 for x in application.json['well_sites']
             ]
 
-            liabilities = liabilities[liabilities['well_auth_number'].copy().isin(
-                application_wells)]
-
-        return liabilities.to_dict('records')
\ No newline at end of file
+        return liabilities.response(LIABILITY, well_auth_number=application_wells).make_response()
\ No newline at end of file
@@ -9,18 +9,19 @@ from app.api.services.ogc_data_service import OGCDataService
 class PermitHolderListResource(Resource, UserMixin):
     @api.doc(description='Get all permit holders')
     #@requires_role_view_all
-    @api.marshal_with(PERMIT_HOLDER, envelope='records', code=200)
+    @api.response(200, 'Success', PERMIT_HOLDER)
+    @api.response(503, 'The OGC data is not available yet, retry after the Retry-After seconds')
     def get(self):
-        permit_holders = OGCDataService.getPermitHoldersDataFrame()
-        return permit_holders.sort_values(
-            by=['organization_name']).to_dict('records')
+        permit_holders = OGCDataService.getPermitHoldersDataset()
+        return permit_holders.response(PERMIT_HOLDER, sort_by=['organization_name']).make_response()
 
 
 class PermitHolderResource(Resource, UserMixin):
     @api.doc(description='Get a permit holder by its operator ID')
     #@requires_role_view_all
-    @api.marshal_with(PERMIT_HOLDER, envelope='records', code=200)
+    @api.response(200, 'Success', PERMIT_HOLDER)
+    @api.response(503, 'The OGC data is not available yet, retry after the Retry-After seconds')
     def get(self, operator_id):
-        permit_holders = OGCDataService.getPermitHoldersDataFrame()
-        return permit_holders.loc[permit_holders['operator_id'] ==
-                                  operator_id].to_dict('records')
+        permit_holders = OGCDataService.getPermitHoldersDataset()
+        return permit_holders.response(
+            PERMIT_HOLDER, operator_id=[int(operator_id)]).make_response()
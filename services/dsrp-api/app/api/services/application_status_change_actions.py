@@ -1,11 +1,11 @@
 from werkzeug.exceptions import InternalServerError
 
-from app.api.application.models.payment_document import PaymentDocument
+from app.api.application.models.payment_document_job import PaymentDocumentJob
 
 
 def action_first_pay_approved(application):
+    # Queued with the status change, the PRF is generated once it is committed
     try:
-        doc = PaymentDocument(application=application, payment_document_code='FIRST_PRF')
-        doc.save()
+        PaymentDocumentJob.enqueue(application, 'FIRST_PRF')
     except Exception as e:
         raise InternalServerError(f'Failed to create the PRF: {e}')
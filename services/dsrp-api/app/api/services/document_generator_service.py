@@ -1,6 +1,9 @@
-import requests, hashlib, os, mimetypes, json, datetime
+import requests, hashlib, os, mimetypes, json, datetime, threading, io, cgi
 from flask import Response, current_app, stream_with_context
 from app.config import Config
+from app.extensions import cache
+from app.api.constants import DOCGEN_TEMPLATE_PUSHED, RENDERED_DOCUMENT, TIMEOUT_24_HOURS
+from app.api.services.object_store_storage_service import ObjectStoreStorageService
 
 DOCUMENT_TYPE_FILE_MAP = {
     'shared-cost-agreement': 'shared_cost_agreement.docx',
@@ -20,21 +23,147 @@ def sha256_checksum(filename, block_size=65536):
     return sha256.hexdigest()
 
 
+class DocumentTemplateRegistry():
+    """
+    Per-process checksums of the docgen templates, recomputed only when a file changes on disk, and the
+    templates known to be on docgen. Pushes are shared with the other processes through the cache.
+    """
+
+    _lock = threading.Lock()
+    _checksums = {}
+    _pushed = set()
+
+    @classmethod
+    def warm_up(cls, root_path):
+        for file_name in DOCUMENT_TYPE_FILE_MAP.values():
+            cls.checksum(os.path.join(root_path, 'templates', file_name))
+
+    @classmethod
+    def checksum(cls, template_file_path):
+        stat = os.stat(template_file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = cls._checksums.get(template_file_path)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        checksum = sha256_checksum(template_file_path)
+        with cls._lock:
+            cls._checksums[template_file_path] = (version, checksum)
+        return checksum
+
+    @classmethod
+    def is_pushed(cls, checksum):
+        if checksum in cls._pushed:
+            return True
+        if cache.get(DOCGEN_TEMPLATE_PUSHED(checksum)):
+            cls._pushed.add(checksum)
+            return True
+        return False
+
+    @classmethod
+    def mark_pushed(cls, checksum):
+        with cls._lock:
+            cls._pushed.add(checksum)
+        cache.set(DOCGEN_TEMPLATE_PUSHED(checksum), True, timeout=TIMEOUT_24_HOURS)
+
+    @classmethod
+    def mark_missing(cls, checksum):
+        with cls._lock:
+            cls._pushed.discard(checksum)
+        cache.delete(DOCGEN_TEMPLATE_PUSHED(checksum))
+
+
+class RenderedDocumentCache():
+    """
+    Rendered documents stored in the object store and indexed in the cache by a hash of the template checksum,
+    the canonical template data and the output format. Entries expire from the index after
+    RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS, prune_rendered_documents deletes the expired objects.
+    """
+
+    @staticmethod
+    def is_enabled():
+        return current_app.config['RENDERED_DOCUMENT_CACHE_ENABLED']
+
+    @staticmethod
+    def key(template_checksum, data, document_type):
+        canonical_data = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(
+            f'{template_checksum}:{document_type}:{canonical_data}'.encode()).hexdigest()
+
+    @classmethod
+    def get(cls, key):
+        if not cls.is_enabled():
+            return None
+        return cache.get(RENDERED_DOCUMENT(key))
+
+    @classmethod
+    def put(cls, key, content, file_name, content_type):
+        if not cls.is_enabled():
+            return
+        try:
+            object_store_path = ObjectStoreStorageService().upload_fileobj(
+                io.BytesIO(content),
+                f'{Config.RENDERED_DOCUMENT_CACHE_PREFIX}{key}{os.path.splitext(file_name)[1]}')
+            cache.set(
+                RENDERED_DOCUMENT(key), {
+                    'object_store_path': object_store_path,
+                    'file_name': file_name,
+                    'content_type': content_type
+                },
+                timeout=Config.RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS)
+        except Exception as e:
+            current_app.logger.warning(f'Failed to cache the rendered document {key}: {e}')
+
+    @classmethod
+    def load(cls, entry, stream=False):
+        """Returns the cached document, or None when it can no longer be read from the object store."""
+        try:
+            storage = ObjectStoreStorageService()
+            if stream:
+                return RenderedDocument(
+                    entry['file_name'],
+                    entry['content_type'],
+                    chunks=storage.stream_file(entry['object_store_path']))
+            return RenderedDocument(
+                entry['file_name'],
+                entry['content_type'],
+                content=storage.read_file(entry['object_store_path']))
+        except Exception as e:
+            current_app.logger.warning(
+                f'Failed to read the cached document {entry["object_store_path"]}: {e}')
+            return None
+
+    @classmethod
+    def prune(cls):
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            seconds=Config.RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS)
+        return ObjectStoreStorageService().delete_files_older_than(
+            Config.RENDERED_DOCUMENT_CACHE_PREFIX, cutoff)
+
+
+class RenderedDocument():
+    def __init__(self, file_name, content_type, content=None, chunks=None):
+        self.file_name = file_name
+        self.content_type = content_type
+        self.content = content
+        self.chunks = chunks
+
+    def iter_content(self):
+        return self.chunks if self.content is None else iter([self.content])
+
+
 class DocumentGeneratorService():
     document_generator_url = f'{Config.DOCUMENT_GENERATOR_URL}/template'
 
     @classmethod
     def generate_document_and_stream_response(cls, template_file_path, data, document_type):
 
-        # Ensure that the desired template exists
-        current_app.logger.debug(f'CHECKING TEMPLATE at {template_file_path}')
-        template_exists = cls._check_remote_template(template_file_path)
-        if not template_exists:
-            current_app.logger.debug(f'PUSHING TEMPLATE at {template_file_path}')
-            cls._push_template(template_file_path)
+        # Ensure that the desired template exists, only asking docgen the first time it is used
+        file_sha = DocumentTemplateRegistry.checksum(template_file_path)
+        if not DocumentTemplateRegistry.is_pushed(file_sha):
+            cls._ensure_template(template_file_path, file_sha)
 
         # Create the document generation request
-        file_sha = sha256_checksum(template_file_path)
         file_name = os.path.basename(template_file_path)
         file_name_no_ext = '.'.join(file_name.split('.')[:-1])
         # https://carbone.io/api-reference.html#native-api
@@ -48,21 +177,75 @@ class DocumentGeneratorService():
         }
 
         # Send the document generation request and return the response
-        resp = requests.post(
+        resp = cls._render(file_sha, body)
+
+        # Docgen lost the template, e.g., it was restarted, push it again and retry once
+        if resp.status_code == 404:
+            current_app.logger.warn(f'Docgen-api/render is missing the template {template_file_path}')
+            resp.close()
+            DocumentTemplateRegistry.mark_missing(file_sha)
+            cls._ensure_template(template_file_path, file_sha)
+            resp = cls._render(file_sha, body)
+
+        if resp.status_code != 200:
+            current_app.logger.warn(f'Docgen-api/generate replied with {str(resp.content)}')
+
+        return resp
+
+    @classmethod
+    def generate_document(cls, template_file_path, data, document_type, stream=False, cache=True):
+        """
+        Returns the RenderedDocument, from the rendered document cache when this data was rendered before.
+        With stream, a cached document is streamed from the object store instead of being read in memory.
+        Pass cache=False for documents whose data is never rendered twice, e.g., with a unique invoice number.
+        """
+
+        if cache:
+            key = RenderedDocumentCache.key(
+                DocumentTemplateRegistry.checksum(template_file_path), data, document_type)
+            entry = RenderedDocumentCache.get(key)
+            if entry:
+                document = RenderedDocumentCache.load(entry, stream)
+                if document:
+                    return document
+
+        resp = cls.generate_document_and_stream_response(template_file_path, data, document_type)
+        if resp.status_code != 200:
+            raise Exception(f'Failed to generate the document: {resp.status_code}')
+
+        _, params = cgi.parse_header(resp.headers.get('content-disposition', ''))
+        document = RenderedDocument(
+            params.get('filename', os.path.basename(template_file_path)),
+            resp.headers.get('content-type', mimetypes.guess_type(f'file.{document_type}')[0]),
+            content=resp.content)
+        if cache:
+            RenderedDocumentCache.put(key, document.content, document.file_name,
+                                      document.content_type)
+        return document
+
+    @classmethod
+    def _render(cls, file_sha, body):
+        return requests.post(
             url=f'{cls.document_generator_url}/{file_sha}/render',
             data=json.dumps(body),
             headers={'Content-Type': 'application/json'},
             stream=True)
-        if resp.status_code != 200:
-            current_app.logger.warn(f'Docgen-api/generate replied with {str(resp.content)}')
 
-        return resp
+    @classmethod
+    def _ensure_template(cls, template_file_path, file_sha):
+        current_app.logger.debug(f'CHECKING TEMPLATE at {template_file_path}')
+        template_exists = cls._check_remote_template(file_sha)
+        if not template_exists:
+            current_app.logger.debug(f'PUSHING TEMPLATE at {template_file_path}')
+            template_exists = cls._push_template(template_file_path)
+        if template_exists:
+            DocumentTemplateRegistry.mark_pushed(file_sha)
 
     @classmethod
     def _push_template(cls, template_file_path):
-        file = open(template_file_path, 'rb')
         file_name = os.path.basename(template_file_path)
-        files = {'template': (file_name, file.read(), mimetypes.guess_type(file_name))}
+        with open(template_file_path, 'rb') as file:
+            files = {'template': (file_name, file.read(), mimetypes.guess_type(file_name))}
         resp = requests.post(url=cls.document_generator_url, files=files)
         if resp.status_code != 200:
             current_app.logger.warn(f'Docgen-api/push-template replied with {str(resp.text)}')
@@ -70,8 +253,7 @@ class DocumentGeneratorService():
         return True
 
     @classmethod
-    def _check_remote_template(cls, template_file_path):
-        file_sha = sha256_checksum(template_file_path)
+    def _check_remote_template(cls, file_sha):
         resp = requests.get(url=f'{cls.document_generator_url}/{file_sha}')
         if resp.status_code != 200:
             current_app.logger.warn(f'Docgen-api/check-template replied with {str(resp.content)}')
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import threading
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from markupsafe import Markup
+
+from app.config import Config
+from app.api.application.constants import SITE_CONDITIONS, CONTRACTED_WORK, INDIGENOUS_APPLICANT_AFFILIATION, INDIGENOUS_SUBCONTRACTOR_AFFILIATION
+
+EMAIL_TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'templates',
+    'email')
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_email_template_environment():
+    """
+    Returns the process-wide template environment. Templates are compiled once per process (and
+    loaded from the bytecode cache by later processes) and never reloaded from disk.
+    """
+
+    global _environment
+    if _environment is None:
+        with _environment_lock:
+            if _environment is None:
+                bytecode_cache_dir = Config.EMAIL_TEMPLATE_BYTECODE_CACHE_DIR or os.path.join(
+                    tempfile.gettempdir(), 'dsrp-email-templates')
+                os.makedirs(bytecode_cache_dir, exist_ok=True)
+
+                environment = Environment(
+                    loader=FileSystemLoader(EMAIL_TEMPLATE_DIR),
+                    bytecode_cache=FileSystemBytecodeCache(bytecode_cache_dir),
+                    autoescape=select_autoescape(['html']),
+                    auto_reload=False,
+                    trim_blocks=True,
+                    lstrip_blocks=True)
+                environment.globals.update(
+                    Config=Config,
+                    SITE_CONDITIONS=SITE_CONDITIONS,
+                    CONTRACTED_WORK=CONTRACTED_WORK,
+                    INDIGENOUS_APPLICANT_AFFILIATION=INDIGENOUS_APPLICANT_AFFILIATION,
+                    INDIGENOUS_SUBCONTRACTOR_AFFILIATION=INDIGENOUS_SUBCONTRACTOR_AFFILIATION)
+                _environment = environment
+    return _environment
+
+
+def render_email_template(template_name, **context):
+    """Renders the email template, the result can be embedded in other templates without being escaped."""
+    template = get_email_template_environment().get_template(template_name)
+    return Markup(template.render(**context))
@@ -1,27 +1,74 @@
 import boto3
 import io
-import asyncio
+import os
+import threading
 
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from flask import Response
 from pathlib import Path
 
 from app.config import Config
 
+MEGABYTE = 1024 * 1024
+
 
 class ObjectStoreStorageService():
-    _client = None
+    """
+    Uses one S3 client per process. Clients are thread-safe and keep a pool of connections, a forked process
+    (e.g., a uWSGI worker) creates its own on first use.
+    """
+
+    _lock = threading.Lock()
+    _shared_client = None
+    _transfer_config = None
+    _pid = None
+    _stats = {'clients_created': 0, 'client_reuses': 0}
 
     def __init__(self):
-        session = boto3.session.Session()
-        self._client = session.client(
-            service_name='s3',
-            aws_access_key_id=Config.OBJECT_STORE_ACCESS_KEY_ID,
-            aws_secret_access_key=Config.OBJECT_STORE_ACCESS_KEY,
-            endpoint_url=f'https://{Config.OBJECT_STORE_HOST}')
+        self._client = self.get_client()
+
+    @classmethod
+    def get_client(cls):
+        with cls._lock:
+            if cls._shared_client is not None and cls._pid == os.getpid():
+                cls._stats['client_reuses'] += 1
+                return cls._shared_client
+
+            if cls._pid != os.getpid():
+                cls._stats = {'clients_created': 0, 'client_reuses': 0}
+            session = boto3.session.Session()
+            cls._shared_client = session.client(
+                service_name='s3',
+                aws_access_key_id=Config.OBJECT_STORE_ACCESS_KEY_ID,
+                aws_secret_access_key=Config.OBJECT_STORE_ACCESS_KEY,
+                endpoint_url=Config.OBJECT_STORE_ENDPOINT_URL,
+                config=BotoConfig(max_pool_connections=Config.OBJECT_STORE_MAX_POOL_CONNECTIONS))
+            cls._transfer_config = TransferConfig(
+                multipart_threshold=Config.OBJECT_STORE_MULTIPART_THRESHOLD_MB * MEGABYTE,
+                multipart_chunksize=Config.OBJECT_STORE_MULTIPART_CHUNKSIZE_MB * MEGABYTE,
+                max_concurrency=Config.OBJECT_STORE_MAX_TRANSFER_CONCURRENCY)
+            cls._pid = os.getpid()
+            cls._stats['clients_created'] += 1
+            return cls._shared_client
+
+    @classmethod
+    def reset_client(cls):
+        with cls._lock:
+            cls._shared_client = None
+            cls._pid = None
+
+    @classmethod
+    def get_stats(cls):
+        return {'pid': cls._pid, **cls._stats}
 
     def upload_fileobj(self, fileobj, filepath):
         key = f'{Config.S3_PREFIX}{filepath}'
-        self._client.upload_fileobj(Fileobj=fileobj, Bucket=Config.OBJECT_STORE_BUCKET, Key=key)
+        self._client.upload_fileobj(
+            Fileobj=fileobj,
+            Bucket=Config.OBJECT_STORE_BUCKET,
+            Key=key,
+            Config=self._transfer_config)
         return key
 
     def download_file(self, path, display_name, as_attachment):
@@ -32,9 +79,52 @@ class ObjectStoreStorageService():
         s3_response = self._client.get_object(Bucket=Config.OBJECT_STORE_BUCKET, Key=path)
         resp = Response(
             generate(s3_response),
-            mimetype='application/pdf' if '.pdf' in display_name.lower() else 'application/zip',
-            headers={
-                'Content-Disposition':
-                ('attachment; ' if as_attachment else '') + ('filename=' + display_name)
-            })
+            mimetype=self.content_type(display_name),
+            headers={'Content-Disposition': self.content_disposition(display_name, as_attachment)})
         return resp
+
+    def presigned_download_url(self, path, display_name, as_attachment, expires_in):
+        """Returns a URL the file can be downloaded from directly for expires_in seconds, with the same headers as download_file."""
+        return self._client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': Config.OBJECT_STORE_BUCKET,
+                'Key': path,
+                'ResponseContentType': self.content_type(display_name),
+                'ResponseContentDisposition': self.content_disposition(display_name, as_attachment)
+            },
+            ExpiresIn=expires_in)
+
+    @staticmethod
+    def content_type(display_name):
+        return 'application/pdf' if '.pdf' in display_name.lower() else 'application/zip'
+
+    @staticmethod
+    def content_disposition(display_name, as_attachment):
+        return ('attachment; ' if as_attachment else '') + ('filename=' + display_name)
+
+    def read_file(self, path):
+        # Large files are downloaded in parallel ranges
+        fileobj = io.BytesIO()
+        self._client.download_fileobj(
+            Bucket=Config.OBJECT_STORE_BUCKET, Key=path, Fileobj=fileobj, Config=self._transfer_config)
+        return fileobj.getvalue()
+
+    def stream_file(self, path, chunk_size=1048576):
+        s3_response = self._client.get_object(Bucket=Config.OBJECT_STORE_BUCKET, Key=path)
+        return iter(lambda: s3_response['Body'].read(chunk_size), b'')
+
+    def delete_files_older_than(self, prefix, cutoff):
+        """Deletes the objects under the prefix last modified before the cutoff, returns how many were deleted."""
+        deleted = 0
+        paginator = self._client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(
+                Bucket=Config.OBJECT_STORE_BUCKET, Prefix=f'{Config.S3_PREFIX}{prefix}'):
+            expired = [{
+                'Key': obj['Key']
+            } for obj in page.get('Contents', []) if obj['LastModified'] < cutoff]
+            if expired:
+                self._client.delete_objects(
+                    Bucket=Config.OBJECT_STORE_BUCKET, Delete={'Objects': expired})
+                deleted += len(expired)
+        return deleted
@@ -1,183 +1,684 @@
-from urllib.request import urlopen
-from http.cookiejar import CookieJar
-from io import StringIO
+from tempfile import SpooledTemporaryFile
 from app.extensions import cache
 from app.api.constants import PERMIT_HOLDER_CACHE, DORMANT_WELLS_CACHE, LIABILITY_PER_WELL_CACHE, TIMEOUT_15_MINUTES, TIMEOUT_60_MINUTES, TIMEOUT_12_HOURS, TIMEOUT_1_YEAR
-from flask import Flask, current_app
-from threading import Thread
+from flask import Flask, current_app, request, make_response
+from flask_restplus import marshal
+from threading import Thread, Event, Lock
+from collections import OrderedDict
 
+import os
+import gzip
+import json
+import hashlib
+import uuid
+import socket
 import requests
-import urllib
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import time
 
-from .ogc_data_constants import PERMIT_HOLDER_CSV_DATA, DORMANT_WELLS_CSV_DATA, LIABILITY_PER_WELL_CSV_DATA
+# Compressed copies of the raw OGC reports, only read when the live reports can't be fetched
+OGC_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'ogc_snapshots')
+OGC_SNAPSHOT_VERSION = 'v1'
 
-# TODO: Stick into environment variables
-PERMIT_HOLDER_CSV = 'http://reports.bcogc.ca/ogc/f?p=200:201:14073940726161:CSV::::'
-DORMANT_WELLS_CSV = 'https://reports.bcogc.ca/ogc/f?p=200:81:9680316354055:CSV::::'
-LIABILITY_PER_WELL_CSV = 'https://reports.bcogc.ca/ogc/f?p=200:10:10256707131131:CSV::::'
+# Downloads are streamed into memory up to this size and spill to a temporary file beyond it
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# Written before every serialized dataset, entries without it are from an older format and get rebuilt
+OGC_DATA_FORMAT_HEADER = b'DSRP:OGC:ARROW-IPC:1\n'
+
+# How long clients are asked to wait before retrying a dataset the refresher hasn't loaded yet
+COLD_CACHE_RETRY_AFTER_SECONDS = 30
+
+
+class OGCDataUnavailable(Exception):
+    """Raised when a dataset has not been loaded yet, answered with a 503 and Retry-After like /ready."""
+
+    code = 503
+
+    def __init__(self, cache_key, retry_after=COLD_CACHE_RETRY_AFTER_SECONDS):
+        super().__init__(f'The {cache_key} data is not available yet, please try again later')
+        self.cache_key = cache_key
+        self.retry_after = retry_after
 
 session = requests.session()
 
+# Per-process refresh metrics, keyed by cache key
+refresh_metrics = {}
 
-def refreshOGCdata(app, cache_key, csv_url, process):
-    with app.app_context():
-        serializer = pa.default_serialization_context()
+# Per-process decoded datasets, keyed by cache key
+local_datasets = {}
+
+
+# Column schemas of the OGC CSV reports. Columns are renamed by position, text columns are read
+# without type inference and low-cardinality columns are read straight into categoricals.
+PERMIT_HOLDER_SCHEMA = {
+    'columns': [
+        'operator_id', 'organization_name', 'phone_num', 'address_line_1', 'address_line_2',
+        'city', 'province', 'postal_code', 'country'
+    ],
+    'dtypes': {
+        'organization_name': str,
+        'phone_num': str,
+        'address_line_1': str,
+        'address_line_2': str,
+        'city': str,
+        'province': 'category',
+        'postal_code': str,
+        'country': 'category'
+    },
+    'date_columns': []
+}
+
+DORMANT_WELLS_SCHEMA = {
+    'columns': [
+        'operator_name', 'operator_id', 'well_auth_number', 'well_name', 'dormant_status',
+        'current_status', 'well_dormancy_date', 'site_dormancy_date', 'site_dormancy_type',
+        'site_dormant_status', 'surface_location', 'field', 'abandonment_date', 'last_spud_date',
+        'last_rig_rels_date', 'last_completion_date', 'last_active_production_year',
+        'last_active_inj_display_year', 'wellsite_dormancy_declaration_date', 'multi_well'
+    ],
+    'dtypes': {
+        'operator_name': str,
+        'well_name': str,
+        'dormant_status': 'category',
+        'current_status': 'category',
+        'site_dormancy_type': 'category',
+        'site_dormant_status': 'category',
+        'surface_location': str,
+        'field': 'category',
+        'multi_well': 'category'
+    },
+    'date_columns': [
+        'well_dormancy_date', 'site_dormancy_date', 'abandonment_date', 'last_spud_date',
+        'last_rig_rels_date', 'last_completion_date', 'last_active_production_year',
+        'last_active_inj_display_year', 'wellsite_dormancy_declaration_date'
+    ]
+}
+
+LIABILITY_PER_WELL_SCHEMA = {
+    'columns': [
+        'well_auth_number', 'well_name', 'operator_name', 'ad_number', 'mode_code', 'ops_type',
+        'deemed_asset', 'abandonment_liability', 'assessment_liability', 'remediation_liability',
+        'reclamation_liability', 'total_liability', 'override_flag'
+    ],
+    'dtypes': {
+        'well_name': str,
+        'operator_name': str,
+        'mode_code': 'category',
+        'ops_type': 'category',
+        'deemed_asset': 'category',
+        'override_flag': 'category'
+    },
+    'date_columns': []
+}
+
+
+def readOGCcsv(source, schema):
+    df = pd.read_csv(source, header=0, names=schema['columns'], dtype=schema['dtypes'])
+    return normalizeDataFrame(df, schema)
+
+
+def normalizeDataFrame(df, schema):
+    """Normalizes the date columns to ISO date strings (or None), all columns at once."""
+    for column in schema['date_columns']:
+        dates = pd.to_datetime(df[column], errors='coerce', infer_datetime_format=True)
+        formatted = dates.dt.strftime('%Y-%m-%d').astype(object)
+        formatted[dates.isnull()] = None
+        df[column] = formatted
+    return df
 
-        data = cache.get(cache_key)
-        expiry_token = cache.get(cache_key + '_EXPIRY_TOKEN')
 
-        if not expiry_token:
-            current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Cached data not found.')
-            # set 15 minute token to mitigate multiple threads requesting data at the same time
-            cache.set(cache_key + '_EXPIRY_TOKEN', True, timeout=TIMEOUT_15_MINUTES)
+# The OGC datasets kept in the cache, keyed by cache key
+OGC_DATASETS = {
+    PERMIT_HOLDER_CACHE: {
+        'csv_url_config': 'OGC_PERMIT_HOLDER_CSV_URL',
+        'schema': PERMIT_HOLDER_SCHEMA,
+        'snapshot': 'permit_holders',
+        'index_columns': ['operator_id']
+    },
+    DORMANT_WELLS_CACHE: {
+        'csv_url_config': 'OGC_DORMANT_WELLS_CSV_URL',
+        'schema': DORMANT_WELLS_SCHEMA,
+        'snapshot': 'dormant_wells',
+        'index_columns': ['operator_id', 'well_auth_number']
+    },
+    LIABILITY_PER_WELL_CACHE: {
+        'csv_url_config': 'OGC_LIABILITY_PER_WELL_CSV_URL',
+        'schema': LIABILITY_PER_WELL_SCHEMA,
+        'snapshot': 'liability_per_well',
+        'index_columns': ['well_auth_number']
+    }
+}
+
+
+class OGCResponse():
+    """A marshalled OGC response body, encoded and gzipped once so it can be served as-is."""
+    def __init__(self, data):
+        self.body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        self.gzipped_body = gzip.compress(self.body)
+        self.etag = hashlib.sha1(self.body).hexdigest()
+
+    def make_response(self):
+        if request.if_none_match.contains(self.etag):
+            response = make_response('', 304)
+        elif 'gzip' in request.accept_encodings:
+            response = make_response(self.gzipped_body)
+            response.headers['Content-Encoding'] = 'gzip'
         else:
+            response = make_response(self.body)
+
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.set_etag(self.etag)
+        return response
+
+
+class OGCDataset():
+    """
+    A decoded OGC dataset together with prebuilt lookup indexes. Each index maps a column value to the
+    positions of the rows holding it, so lookups by that column don't scan or copy the whole frame.
+    """
+    def __init__(self, version, df, index_columns):
+        self.version = version
+        self.df = df
+        self.indexes = {
+            column: df.groupby(column, sort=False).indices
+            for column in index_columns
+        }
+        # Responses built from this version of the dataset, least recently used first
+        self.responses = OrderedDict()
+        self.responses_lock = Lock()
+
+    def positions(self, column, values):
+        index = self.indexes[column]
+        matches = [index[value] for value in values if value in index]
+        if not matches:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(matches)
+
+    def filter(self, **filters):
+        """
+        Returns the rows matching every filter, in dataset order. Each filter is a column with a list of
+        accepted values, a filter set to None is ignored.
+        """
+        positions = None
+        for column, values in filters.items():
+            if values is None:
+                continue
+            column_positions = self.positions(column, values)
+            positions = column_positions if positions is None else np.intersect1d(
+                positions, column_positions)
+
+        if positions is None:
+            return self.df
+        return self.df.take(np.sort(positions))
+
+    def response(self, model, sort_by=None, **filters):
+        """
+        Returns the filtered rows marshalled with the model as a ready-to-send OGCResponse. Responses
+        are built once per dataset version and kept in a bounded LRU cache.
+        """
+        key = (model.name, tuple(sort_by) if sort_by else None) + tuple(
+            (column, tuple(values) if values is not None else None)
+            for column, values in sorted(filters.items()))
+
+        with self.responses_lock:
+            cached = self.responses.get(key)
+            if cached:
+                self.responses.move_to_end(key)
+                return cached
+
+        df = self.filter(**filters)
+        if sort_by:
+            df = df.sort_values(by=sort_by)
+        cached = OGCResponse(marshal(df.to_dict('records'), model, envelope='records'))
+
+        with self.responses_lock:
+            self.responses[key] = cached
+            while len(self.responses) > current_app.config['OGC_RESPONSE_CACHE_SIZE']:
+                self.responses.popitem(last=False)
+        return cached
+
+
+def serializeDataFrame(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    compression = current_app.config['OGC_DATA_COMPRESSION'] or None
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(
+            sink, table.schema, options=pa.ipc.IpcWriteOptions(compression=compression)) as writer:
+        writer.write_table(table)
+    return OGC_DATA_FORMAT_HEADER + sink.getvalue().to_pybytes()
+
+
+def deserializeDataFrame(data):
+    if not isCurrentFormat(data):
+        return None
+
+    # slice the header off without copying the payload
+    buffer = pa.py_buffer(data)[len(OGC_DATA_FORMAT_HEADER):]
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+
+def isCurrentFormat(data):
+    return bool(data) and data.startswith(OGC_DATA_FORMAT_HEADER)
+
+
+def getMetrics(cache_key):
+    return refresh_metrics.setdefault(
+        cache_key, {
+            'refresh_count': 0,
+            'failure_count': 0,
+            'last_refresh_at': None,
+            'last_refresh_duration_seconds': None,
+            'last_refresh_result': None,
+            'last_parse_duration_seconds': None
+        })
+
+
+def recordRefreshMetrics(cache_key, duration, result):
+    metrics = getMetrics(cache_key)
+    metrics['refresh_count'] += 1
+    if result == 'failed':
+        metrics['failure_count'] += 1
+    metrics['last_refresh_at'] = time.time()
+    metrics['last_refresh_duration_seconds'] = round(duration, 3)
+    metrics['last_refresh_result'] = result
+
+    current_app.logger.info(
+        f'OGC DATA SERVICE - {cache_key} - Refresh finished in {duration:.3f}s (result: {result}).')
+
+
+def refreshOGCdata(app, cache_key, force=False):
+    with app.app_context():
+        expiry_token = cache.get(cache_key + '_EXPIRY_TOKEN')
+        if expiry_token and not force:
             current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Cached data up to date.')
-            return
+            return False
+
+        # Only one worker in the cluster refreshes a dataset at a time
+        lock_owner = acquireRefreshLock(cache_key)
+        if not lock_owner:
+            current_app.logger.debug(
+                f'OGC DATA SERVICE - {cache_key} - Refresh already in progress elsewhere.')
+            return False
 
+        started = time.time()
+        result = 'failed'
         try:
-            cookieProcessor = urllib.request.HTTPCookieProcessor()
-            opener = urllib.request.build_opener(cookieProcessor)
-            response = session.get(csv_url)
+            result = _refreshOGCdata(cache_key)
+        finally:
+            releaseRefreshLock(cache_key, lock_owner)
+            recordRefreshMetrics(cache_key, time.time() - started, result)
 
-            df = pd.read_table(StringIO(response.text), sep=",")
-            df = process(df)
+        return result != 'failed'
 
-            updated_from_web = True
-            current_app.logger.debug(
-                f'OGC DATA SERVICE - {cache_key} - Successful get from OGC reporting.')
-            df = process(df)
-
-        except:
-            # on error, if we don't have data in the cache initialize it from static content
-            if not data:
-                current_app.logger.debug(
-                    f'OGC DATA SERVICE - {cache_key} - Falling back to static content.')
-                if cache_key is PERMIT_HOLDER_CACHE:
-                    df = pd.read_table(StringIO(PERMIT_HOLDER_CSV_DATA), sep=",")
-
-                if cache_key is DORMANT_WELLS_CACHE:
-                    df = pd.read_table(StringIO(DORMANT_WELLS_CSV_DATA), sep=",")
-
-                if cache_key is LIABILITY_PER_WELL_CACHE:
-                    df = pd.read_table(StringIO(LIABILITY_PER_WELL_CSV_DATA), sep=",")
-            df = process(df)
-
-        row_count = df.shape[0]
-
-        # only update cache if there is a good dataset
-        if row_count > 1:
-            current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Updating cached data.')
-            cache.set(
-                cache_key,
-                serializer.serialize(df).to_buffer().to_pybytes(),
-                timeout=TIMEOUT_1_YEAR)
-
-            if updated_from_web:
-                cache.set(cache_key + '_EXPIRY_TOKEN', True, timeout=TIMEOUT_60_MINUTES)
-        else:
+
+def seedOGCdataFromSnapshot(app, cache_key):
+    """Fills an empty dataset from its snapshot, leaving the live refresh to the refresher."""
+    with app.app_context():
+        lock_owner = acquireRefreshLock(cache_key)
+        if not lock_owner:
+            return False
+
+        try:
+            if isCurrentFormat(cache.get(cache_key)):
+                return True
+            current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Seeding from snapshot.')
+            storeOGCdataFrame(cache_key, loadOGCsnapshot(cache_key))
+            return True
+        except Exception as e:
+            current_app.logger.warning(
+                f'OGC DATA SERVICE - {cache_key} - Failed to seed from snapshot: {e}')
+            return False
+        finally:
+            releaseRefreshLock(cache_key, lock_owner)
+
+
+def acquireRefreshLock(cache_key):
+    lock_owner = f'{socket.gethostname()}:{os.getpid()}'
+    if cache.add(cache_key + '_REFRESH_LOCK', lock_owner, timeout=TIMEOUT_15_MINUTES):
+        return lock_owner
+    return None
+
+
+def releaseRefreshLock(cache_key, lock_owner):
+    if cache.get(cache_key + '_REFRESH_LOCK') == lock_owner:
+        cache.delete(cache_key + '_REFRESH_LOCK')
+
+
+def storeOGCdataFrame(cache_key, df):
+    cache.set(cache_key, serializeDataFrame(df), timeout=TIMEOUT_1_YEAR)
+    # the version is written after the data so readers never pair a new version with old data
+    cache.set(cache_key + '_VERSION', uuid.uuid4().hex, timeout=TIMEOUT_1_YEAR)
+
+
+def fetchOGCcsv(cache_key, csv_url):
+    """
+    Streams the CSV report into a spooled temporary file while hashing it. Returns None when the server
+    reports the content as not modified, otherwise (file, content hash, HTTP validators).
+    """
+    headers = {}
+    # the validators only describe the cached data if it is still there in the current format
+    validators = None
+    if cache.get(cache_key + '_VERSION'):
+        validators = cache.get(cache_key + '_HTTP_VALIDATORS')
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    with session.get(
+            csv_url,
+            headers=headers,
+            stream=True,
+            timeout=current_app.config['OGC_DATA_REQUEST_TIMEOUT_SECONDS']) as response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        sha256 = hashlib.sha256()
+        spool = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+            sha256.update(chunk)
+            spool.write(chunk)
+        spool.seek(0)
+
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+        return spool, sha256.hexdigest(), validators
+
+
+def hasOGCsource(cache_key):
+    return bool(current_app.config.get(OGC_DATASETS[cache_key]['csv_url_config'])) or os.path.exists(
+        getSnapshotPath(cache_key))
+
+
+def getSnapshotPath(cache_key):
+    return os.path.join(OGC_SNAPSHOT_DIR,
+                        f'{OGC_DATASETS[cache_key]["snapshot"]}.{OGC_SNAPSHOT_VERSION}.csv.gz')
+
+
+def loadOGCsnapshot(cache_key):
+    return readOGCcsv(getSnapshotPath(cache_key), OGC_DATASETS[cache_key]['schema'])
+
+
+def writeOGCsnapshot(cache_key):
+    """Downloads the live report and, if it parses into a good dataset, replaces its snapshot."""
+    dataset = OGC_DATASETS[cache_key]
+    response = session.get(
+        current_app.config[dataset['csv_url_config']],
+        stream=True,
+        timeout=current_app.config['OGC_DATA_REQUEST_TIMEOUT_SECONDS'])
+    response.raise_for_status()
+
+    path = getSnapshotPath(cache_key)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        # a fixed mtime keeps regenerated snapshots byte-identical when the report hasn't changed
+        with gzip.GzipFile(filename='', mode='wb', fileobj=f, mtime=0) as gz:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                gz.write(chunk)
+
+    row_count = readOGCcsv(temp_path, dataset['schema']).shape[0]
+    if row_count <= 1:
+        os.remove(temp_path)
+        raise Exception(f'{cache_key} - Live report has {row_count} rows, keeping the old snapshot.')
+
+    os.replace(temp_path, path)
+    return row_count
+
+
+def markOGCdataFresh(cache_key):
+    cache.set(cache_key + '_EXPIRY_TOKEN', True, timeout=TIMEOUT_60_MINUTES)
+    cache.set(cache_key + '_REFRESHED_AT', time.time(), timeout=TIMEOUT_1_YEAR)
+
+
+def _refreshOGCdata(cache_key):
+    dataset = OGC_DATASETS[cache_key]
+    df = None
+    content_hash = None
+    validators = None
+    result = 'web'
+
+    try:
+        fetched = fetchOGCcsv(cache_key, current_app.config[dataset['csv_url_config']])
+        if fetched is None:
+            current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Not modified upstream.')
+            markOGCdataFresh(cache_key)
+            return 'unchanged'
+
+        spool, content_hash, validators = fetched
+        with spool:
+            # byte-identical payloads are neither parsed nor serialized again
+            cached_hash = cache.get(cache_key + '_CONTENT_HASH')
+            if cached_hash == content_hash and cache.get(cache_key + '_VERSION'):
+                current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Content unchanged.')
+                cache.set(cache_key + '_HTTP_VALIDATORS', validators, timeout=TIMEOUT_1_YEAR)
+                markOGCdataFresh(cache_key)
+                return 'unchanged'
+
+            started = time.time()
+            df = readOGCcsv(spool, dataset['schema'])
+            parse_duration = time.time() - started
+        getMetrics(cache_key)['last_parse_duration_seconds'] = round(parse_duration, 3)
+        current_app.logger.debug(
+            f'OGC DATA SERVICE - {cache_key} - Parsed and normalized in {parse_duration:.3f}s.')
+        current_app.logger.debug(
+            f'OGC DATA SERVICE - {cache_key} - Successful get from OGC reporting.')
+    except:
+        # on error, if we don't have data in the cache initialize it from the snapshot
+        if isCurrentFormat(cache.get(cache_key)):
+            current_app.logger.warning(
+                f'OGC DATA SERVICE - {cache_key} - Failed to get from OGC reporting, keeping cached data.'
+            )
+            return 'failed'
+
+        current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Falling back to snapshot.')
+        try:
+            df = loadOGCsnapshot(cache_key)
+        except Exception as e:
             current_app.logger.warning(
-                f'OGC DATA SERVICE - {cache_key} - FAILED TO RETRIEVE UPDATED DATA')
+                f'OGC DATA SERVICE - {cache_key} - Failed to load snapshot: {e}')
+            return 'failed'
+        result = 'static'
+
+    row_count = df.shape[0]
+
+    # only update cache if there is a good dataset
+    if row_count <= 1:
+        current_app.logger.warning(
+            f'OGC DATA SERVICE - {cache_key} - FAILED TO RETRIEVE UPDATED DATA')
+        return 'failed'
+
+    current_app.logger.debug(f'OGC DATA SERVICE - {cache_key} - Updating cached data.')
+    storeOGCdataFrame(cache_key, df)
+
+    # snapshots are only a stopgap, keep trying the web on the next tick until it succeeds
+    if result == 'web':
+        cache.set(cache_key + '_CONTENT_HASH', content_hash, timeout=TIMEOUT_1_YEAR)
+        cache.set(cache_key + '_HTTP_VALIDATORS', validators, timeout=TIMEOUT_1_YEAR)
+        markOGCdataFresh(cache_key)
+    else:
+        cache.delete(cache_key + '_CONTENT_HASH')
+        cache.delete(cache_key + '_HTTP_VALIDATORS')
+
+    return result
+
+
+class OGCDataRefresher():
+    """Background scheduler that keeps the cached OGC datasets current for this process."""
+    _thread = None
+    _pid = None
+    _stop_event = None
+
+    @classmethod
+    def start(cls, app):
+        # uWSGI forks workers, so a thread started in another process does not count
+        if cls._thread and cls._thread.is_alive() and cls._pid == os.getpid():
+            return
+
+        cls._pid = os.getpid()
+        cls._stop_event = Event()
+        cls._thread = Thread(
+            target=cls._run,
+            args=(app, app.config['OGC_DATA_REFRESH_INTERVAL_SECONDS']),
+            name='ogc-data-refresher')
+        cls._thread.daemon = True
+        cls._thread.start()
+
+    @classmethod
+    def stop(cls):
+        if cls._stop_event:
+            cls._stop_event.set()
+
+    @classmethod
+    def _run(cls, app, interval):
+        # the first pass runs right away so workers that started without data become ready quickly
+        with app.app_context():
+            try:
+                OGCDataService.seedMissingData()
+            except Exception as e:
+                current_app.logger.error(f'OGC DATA SERVICE - Seeding from snapshots failed: {e}')
+
+        while True:
+            with app.app_context():
+                try:
+                    OGCDataService.refreshAllData()
+                except Exception as e:
+                    current_app.logger.error(f'OGC DATA SERVICE - Scheduled refresh failed: {e}')
+
+            if cls._stop_event.wait(interval):
+                return
 
 
 class OGCDataService():
     @classmethod
-    def refreshAllData(cls):
-        cls.getPermitHoldersDataFrame()
-        cls.getDormantWellsDataFrame()
-        cls.getLiabilityPerWellDataFrame()
+    def warmUp(cls):
+        """
+        Loads whatever is already in the shared cache into this worker without fetching or parsing
+        anything. Missing datasets are seeded by the background refresher, or right away when it is
+        disabled.
+        """
+        for cache_key in OGC_DATASETS:
+            cls.getOGCdataset(cache_key)
+
+        if not current_app.config['OGC_DATA_REFRESHER_ENABLED']:
+            cls.seedMissingData()
+
+    @classmethod
+    def seedMissingData(cls):
+        app = current_app._get_current_object()
+        for cache_key in OGC_DATASETS:
+            if not cls.getOGCdataset(cache_key):
+                seedOGCdataFromSnapshot(app, cache_key)
+                cls.getOGCdataset(cache_key)
 
     @classmethod
-    def getOGCdataframe(cls, cache_key, csv_url, process):
-        serializer = pa.default_serialization_context()
-        data = cache.get(cache_key)
+    def getReadiness(cls):
+        """
+        Returns whether every dataset that has a live report or a snapshot to load from is loaded,
+        the loaded state of each dataset and the datasets that are still missing.
+        """
+        datasets = {
+            cache_key: cls.getOGCdataset(cache_key) is not None
+            for cache_key in OGC_DATASETS
+        }
+        missing = [
+            cache_key for cache_key, loaded in datasets.items()
+            if not loaded and hasOGCsource(cache_key)
+        ]
+        return not missing, datasets, missing
 
+    @classmethod
+    def refreshAllData(cls, force=False):
         app = current_app._get_current_object()
+        for cache_key in OGC_DATASETS:
+            refreshOGCdata(app, cache_key, force)
 
-        #if empty dataset refresh data synchronously, otherwise refresh in the background and continue
-        if not data:
-            df = refreshOGCdata(app, cache_key, csv_url, process)
-        else:
-            thread = Thread(
-                target=refreshOGCdata, args=(
-                    app,
-                    cache_key,
-                    csv_url,
-                    process,
-                ))
-            thread.daemon = True
-            thread.start()
+    @classmethod
+    def regenerateSnapshots(cls):
+        for cache_key in OGC_DATASETS:
+            try:
+                row_count = writeOGCsnapshot(cache_key)
+                current_app.logger.info(
+                    f'OGC DATA SERVICE - {cache_key} - Snapshot regenerated with {row_count} rows.')
+            except Exception as e:
+                current_app.logger.error(
+                    f'OGC DATA SERVICE - {cache_key} - Failed to regenerate snapshot: {e}')
 
-        #update data and return
-        data = cache.get(cache_key)
-        if data:
-            df = serializer.deserialize(data)
+    @classmethod
+    def getRefreshMetrics(cls):
+        now = time.time()
+        metrics = {}
+        for cache_key in OGC_DATASETS:
+            refreshed_at = cache.get(cache_key + '_REFRESHED_AT')
+            metrics[cache_key] = dict(refresh_metrics.get(cache_key, {}))
+            metrics[cache_key]['refreshed_at'] = refreshed_at
+            metrics[cache_key]['staleness_seconds'] = round(now - refreshed_at,
+                                                            3) if refreshed_at else None
+        return metrics
+
+    @classmethod
+    def getOGCdataset(cls, cache_key):
+        """
+        Returns the dataset for the cache key, or None while it has not been loaded. Only the background
+        refresher loads datasets. The decoded dataset is kept in process memory and only re-downloaded
+        from the cache when the version stored beside it changes. The returned DataFrame is shared
+        between requests and must not be modified in place.
+        """
+        version = cache.get(cache_key + '_VERSION')
+        local_dataset = local_datasets.get(cache_key)
+        if version and local_dataset and local_dataset.version == version:
+            return local_dataset
+
+        df = deserializeDataFrame(cache.get(cache_key))
+        if df is None:
+            return None
 
-        return df
+        dataset = OGCDataset(version, df, OGC_DATASETS[cache_key]['index_columns'])
+        if version:
+            local_datasets[cache_key] = dataset
+        return dataset
 
     @classmethod
-    def getPermitHoldersDataFrame(cls):
-        def process(df):
-            df.columns = [
-                'operator_id', 'organization_name', 'phone_num', 'address_line_1', 'address_line_2',
-                'city', 'province', 'postal_code', 'country'
-            ]
-            return df
+    def getOGCdataframe(cls, cache_key):
+        dataset = cls.getOGCdataset(cache_key)
+        return dataset.df if dataset else None
+
+    @classmethod
+    def getRequiredOGCdataset(cls, cache_key):
+        """Returns the dataset for the cache key, raises OGCDataUnavailable while it has not been loaded."""
+        dataset = cls.getOGCdataset(cache_key)
+        if dataset is None:
+            raise OGCDataUnavailable(cache_key)
+        return dataset
 
-        return cls.getOGCdataframe(PERMIT_HOLDER_CACHE, PERMIT_HOLDER_CSV, process)
+    @classmethod
+    def getPermitHoldersDataset(cls):
+        return cls.getRequiredOGCdataset(PERMIT_HOLDER_CACHE)
+
+    @classmethod
+    def getDormantWellsDataset(cls):
+        return cls.getRequiredOGCdataset(DORMANT_WELLS_CACHE)
+
+    @classmethod
+    def getLiabilityPerWellDataset(cls):
+        return cls.getRequiredOGCdataset(LIABILITY_PER_WELL_CACHE)
+
+    @classmethod
+    def getPermitHoldersDataFrame(cls):
+        return cls.getOGCdataframe(PERMIT_HOLDER_CACHE)
 
     @classmethod
     def getDormantWellsDataFrame(cls):
-        def process(df):
-            df.columns = [
-                'operator_name', 'operator_id', 'well_auth_number', 'well_name', 'dormant_status',
-                'current_status', 'well_dormancy_date', 'site_dormancy_date', 'site_dormancy_type',
-                'site_dormant_status', 'surface_location', 'field', 'abandonment_date',
-                'last_spud_date', 'last_rig_rels_date', 'last_completion_date',
-                'last_active_production_year', 'last_active_inj_display_year',
-                'wellsite_dormancy_declaration_date', 'multi_well'
-            ]
-            df['well_dormancy_date'] = pd.to_datetime(
-                df['well_dormancy_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['site_dormancy_date'] = pd.to_datetime(
-                df['site_dormancy_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['abandonment_date'] = pd.to_datetime(
-                df['abandonment_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['last_spud_date'] = pd.to_datetime(
-                df['last_spud_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['last_rig_rels_date'] = pd.to_datetime(
-                df['last_rig_rels_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['last_completion_date'] = pd.to_datetime(
-                df['last_completion_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['last_active_production_year'] = pd.to_datetime(
-                df['last_active_production_year'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['last_active_inj_display_year'] = pd.to_datetime(
-                df['last_active_inj_display_year'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            df['wellsite_dormancy_declaration_date'] = pd.to_datetime(
-                df['wellsite_dormancy_declaration_date'],
-                errors='coerce').apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-            return df
-
-        return cls.getOGCdataframe(DORMANT_WELLS_CACHE, DORMANT_WELLS_CSV, process)
+        return cls.getOGCdataframe(DORMANT_WELLS_CACHE)
 
     @classmethod
     def getLiabilityPerWellDataFrame(cls):
-        def process(df):
-            df.columns = [
-                'well_auth_number', 'well_name', 'operator_name', 'ad_number', 'mode_code',
-                'ops_type', 'deemed_asset', 'abandonment_liability', 'assessment_liability',
-                'remediation_liability', 'reclamation_liability', 'total_liability', 'override_flag'
-            ]
-            return df
-
-        return cls.getOGCdataframe(LIABILITY_PER_WELL_CACHE, LIABILITY_PER_WELL_CSV, process)
\ No newline at end of file
+        return cls.getOGCdataframe(LIABILITY_PER_WELL_CACHE)
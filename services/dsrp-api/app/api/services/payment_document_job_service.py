@@ -0,0 +1,129 @@
+import os
+import threading
+
+from datetime import datetime
+from flask import current_app
+
+from app.extensions import db
+from app.config import Config
+from app.api.application.models.payment_document_job import PaymentDocumentJob
+from app.api.application.models.payment_document_batch import PaymentDocumentBatch
+from app.api.services.email_service import EmailOutboxWorker
+
+
+def run_stage(job):
+    """Runs the current stage of the job. Each stage keeps its result on the job, so a retry starts where it failed."""
+
+    if job.stage == 'RENDER':
+        job.rendered_document = job.build_payment_document().render()
+
+    elif job.stage == 'UPLOAD':
+        doc = job.build_payment_document()
+        doc.upload(job.rendered_document)
+        job.document_name = doc.document_name
+        job.object_store_path = doc.object_store_path
+
+    elif job.stage == 'RECORD':
+        # The document and its email are created in the same transaction that completes the job
+        PaymentDocumentJob.lock_invoice_numbering(job.application_guid)
+        doc = job.build_payment_document()
+        doc.upload_date = datetime.utcnow()
+        if not job.batch_guid:
+            doc.send_email(job.rendered_document, job.requested_by_email)
+        doc.save(commit=False)
+        db.session.flush()
+        job.document_guid = doc.document_guid
+
+    job.complete_stage()
+
+
+def complete_batch(job):
+    """Completes the batch of a finished job, the batch row lock makes sure only its last job sends the email."""
+    if not job.batch_guid or job.status == 'PENDING':
+        return
+
+    batch = PaymentDocumentBatch.query.filter_by(
+        batch_guid=job.batch_guid).with_for_update().one()
+    batch.complete()
+
+
+class PaymentDocumentJobWorker():
+    """Per-process pool of daemon threads running the stages of the queued PRF jobs."""
+
+    _lock = threading.Lock()
+    _threads = []
+    _pid = None
+    _wake = threading.Event()
+    _stop = threading.Event()
+
+    @classmethod
+    def start(cls, app):
+        with cls._lock:
+            # uWSGI forks workers after the app is created, each process needs its own threads
+            if cls._pid == os.getpid() and any(thread.is_alive() for thread in cls._threads):
+                return
+            cls._stop.clear()
+            cls._pid = os.getpid()
+            cls._threads = [
+                threading.Thread(
+                    target=cls._run, args=(app, ), name=f'prf-job-worker-{i}', daemon=True)
+                for i in range(app.config['PRF_JOB_WORKERS'])
+            ]
+            for thread in cls._threads:
+                thread.start()
+
+    @classmethod
+    def stop(cls):
+        cls._stop.set()
+        cls._wake.set()
+
+    @classmethod
+    def wake(cls):
+        cls._wake.set()
+
+    @classmethod
+    def _run(cls, app):
+        with app.app_context():
+            while not cls._stop.is_set():
+                try:
+                    while not cls._stop.is_set() and cls.run_next_stage():
+                        pass
+                except Exception as e:
+                    current_app.logger.error(f'PRF job worker failed: {e}')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+                cls._wake.wait(app.config['PRF_JOB_POLL_INTERVAL_SECONDS'])
+                cls._wake.clear()
+
+    @classmethod
+    def run_next_stage(cls):
+        """Runs one stage of the next due job and records the outcome. Returns False when no job is due."""
+
+        job = PaymentDocumentJob.claim_due()
+        if not job:
+            db.session.commit()
+            return False
+
+        job_guid = job.job_guid
+        stage = job.stage
+        try:
+            run_stage(job)
+            complete_batch(job)
+            db.session.commit()
+        except Exception as e:
+            current_app.logger.error(f'PRF job {job_guid} failed at the {stage} stage: {e}')
+            db.session.rollback()
+            job = PaymentDocumentJob.query.filter_by(job_guid=job_guid).with_for_update().one()
+            job.mark_failed(e, Config.PRF_JOB_MAX_ATTEMPTS, Config.PRF_JOB_RETRY_BACKOFF_SECONDS)
+            complete_batch(job)
+            db.session.commit()
+            return True
+
+        if job.status != 'PENDING':
+            EmailOutboxWorker.wake()
+        else:
+            # The next stage is due now, let an idle worker pick it up
+            cls.wake()
+        return True
@@ -1,6 +1,15 @@
 import math
+import json
+import base64
+import binascii
 
-from app.api.constants import PAGE_SIZE_OPTIONS
+from dateutil import parser
+from datetime import datetime
+from sqlalchemy import asc, desc, tuple_
+from werkzeug.exceptions import BadRequest
+
+from app.extensions import db, cache
+from app.api.constants import PAGE_SIZE_OPTIONS, TIMEOUT_5_MINUTES
 
 
 def apply_pagination_to_records(records, page_number, page_size):
@@ -21,3 +30,77 @@ def apply_pagination_to_records(records, page_number, page_size):
 def ensure_valid_page_size(page_size):
     return PAGE_SIZE_OPTIONS[min(
         range(len(PAGE_SIZE_OPTIONS)), key=lambda i: abs(PAGE_SIZE_OPTIONS[i] - page_size))]
+
+
+def escape_like(value, escape_char='\\'):
+    """Escapes the LIKE wildcards in a user provided search term."""
+    return value.replace(escape_char, escape_char * 2).replace('%', f'{escape_char}%').replace(
+        '_', f'{escape_char}_')
+
+
+def encode_cursor(sort_field, sort_dir, value, id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_field, sort_dir, value, id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, sort_field, sort_dir, column):
+    try:
+        cursor_sort_field, cursor_sort_dir, value, id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if value is not None and column.type.python_type is datetime:
+            value = parser.isoparse(value)
+    except (ValueError, TypeError, binascii.Error, NotImplementedError):
+        raise BadRequest('The provided cursor is invalid')
+
+    if (cursor_sort_field, cursor_sort_dir) != (sort_field, sort_dir):
+        raise BadRequest('The provided cursor does not match the requested sort')
+    return value, id
+
+
+def apply_keyset_pagination(query, model, sort_field, sort_dir, cursor, page_size):
+    """
+    Returns the page of rows after the cursor, ordered on (sort_field, id), and the cursor of the
+    next page (None on the last page). Unlike OFFSET pagination, every page costs the same index
+    range scan and no count is needed.
+    """
+
+    page_size = ensure_valid_page_size(page_size)
+    column = getattr(model, sort_field)
+    order = desc if sort_dir == 'desc' else asc
+
+    if cursor:
+        value, id = decode_cursor(cursor, sort_field, sort_dir, column)
+        keyset = tuple_(column, model.id)
+        query = query.filter(keyset < tuple_(value, id) if sort_dir ==
+                             'desc' else keyset > tuple_(value, id))
+
+    rows = query.order_by(order(column), order(model.id)).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(sort_field, sort_dir, getattr(rows[-1], sort_field),
+                                    rows[-1].id)
+    return rows, next_cursor
+
+
+def estimate_table_count(table_name):
+    """Returns the planner's estimate of the number of rows in the table, None if never analyzed."""
+
+    estimate = db.session.execute(
+        'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)', {
+            'table_name': table_name
+        }).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def approximate_query_count(query, cache_key, timeout=TIMEOUT_5_MINUTES):
+    """Returns the number of rows matched by the query, counted at most once per timeout."""
+
+    count = cache.get(cache_key)
+    if count is None:
+        count = query.order_by(None).count()
+        cache.set(cache_key, count, timeout=timeout)
+    return count
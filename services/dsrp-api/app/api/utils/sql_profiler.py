@@ -0,0 +1,131 @@
+import re
+import json
+import time
+import threading
+
+from collections import Counter
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per endpoint totals since the process started, keyed by endpoint name
+endpoint_metrics = {}
+# Requests that match no route share one entry, so arbitrary paths can't grow the metrics
+UNMATCHED_ENDPOINT = '<unmatched>'
+endpoint_metrics_lock = threading.Lock()
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|\$\d+")
+_IN_LIST_PATTERN = re.compile(r'IN \((?:\?(?:, )?)+\)')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+class NPlusOneQueryError(Exception):
+    """Raised in strict mode when a request repeats the same statement too many times."""
+    pass
+
+
+def fingerprint(statement):
+    """Returns the statement with its literals and bind parameters replaced, so repeats of a query match."""
+
+    statement = _WHITESPACE_PATTERN.sub(' ', statement).strip()
+    statement = _LITERAL_PATTERN.sub('?', statement)
+    return _IN_LIST_PATTERN.sub('IN (?)', statement)
+
+
+def get_endpoint_metrics():
+    with endpoint_metrics_lock:
+        return {endpoint: dict(metrics) for endpoint, metrics in endpoint_metrics.items()}
+
+
+def _get_request_profile():
+    if not has_request_context():
+        return None
+    return g.get('sql_profile')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _get_request_profile() is not None:
+        conn.info.setdefault('sql_profiler_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _get_request_profile()
+    started = conn.info.get('sql_profiler_started')
+    if profile is None or not started:
+        return
+
+    profile['statements'] += 1
+    profile['duration'] += time.perf_counter() - started.pop()
+    profile['fingerprints'][fingerprint(statement)] += 1
+
+
+def init_app(app):
+    """Records the statements of every request and reports them in a Server-Timing header and the logs."""
+
+    app.config.setdefault('SQL_PROFILER_ENABLED', True)
+    app.config.setdefault('SQL_PROFILER_STRICT', False)
+    app.config.setdefault('SQL_PROFILER_N_PLUS_ONE_THRESHOLD', 5)
+
+    if not app.config['SQL_PROFILER_ENABLED']:
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = {'statements': 0, 'duration': 0.0, 'fingerprints': Counter()}
+
+    @app.after_request
+    def report_sql_profile(response):
+        profile = g.get('sql_profile')
+        if profile is None:
+            return response
+
+        endpoint = request.endpoint or UNMATCHED_ENDPOINT
+        duration_ms = round(profile['duration'] * 1000, 2)
+        threshold = app.config['SQL_PROFILER_N_PLUS_ONE_THRESHOLD']
+        repeated = {
+            statement: count
+            for statement, count in profile['fingerprints'].items() if count >= threshold
+        }
+
+        response.headers.add(
+            'Server-Timing', f'db;dur={duration_ms};desc="{profile["statements"]} statements"')
+
+        with endpoint_metrics_lock:
+            metrics = endpoint_metrics.setdefault(endpoint, {
+                'requests': 0,
+                'statements': 0,
+                'duration_ms': 0.0,
+                'max_statements': 0,
+                'n_plus_one_requests': 0
+            })
+            metrics['requests'] += 1
+            metrics['statements'] += profile['statements']
+            metrics['duration_ms'] = round(metrics['duration_ms'] + duration_ms, 2)
+            metrics['max_statements'] = max(metrics['max_statements'], profile['statements'])
+            metrics['n_plus_one_requests'] += 1 if repeated else 0
+
+        log = app.logger.warning if repeated else app.logger.debug
+        log('sql_profile ' + json.dumps({
+            'endpoint': endpoint,
+            'method': request.method,
+            'status': response.status_code,
+            'statements': profile['statements'],
+            'duration_ms': duration_ms,
+            'repeated_statements': repeated
+        }))
+
+        if repeated and app.config['SQL_PROFILER_STRICT']:
+            statement, count = max(repeated.items(), key=lambda item: item[1])
+            raise NPlusOneQueryError(
+                f'{request.method} {request.path} executed the same statement {count} times: {statement}'
+            )
+
+        return response
+
+    @app.teardown_request
+    def clear_sql_profile(exception=None):
+        g.pop('sql_profile', None)
@@ -12,19 +12,18 @@ import json
 class WellListResource(Resource, UserMixin):
     @api.doc(description='Get all wells')
     #@requires_role_view_all
-    @api.marshal_with(WELL, envelope='records', code=200)
+    @api.response(200, 'Success', WELL)
+    @api.response(503, 'The OGC data is not available yet, retry after the Retry-After seconds')
     def get(self):
         operator_id = request.args.get('operator_id', None)
         well_auth_number = request.args.get('well_auth_number', None)
         application_guid = request.args.get('application_guid', None)
 
-        wells = OGCDataService.getDormantWellsDataFrame()
-
-        if operator_id:
-            wells = wells[wells['operator_id'] == int(operator_id)]
+        wells = OGCDataService.getDormantWellsDataset()
 
+        well_auth_numbers = None
         if well_auth_number:
-            wells = wells[wells['well_auth_number'] == int(well_auth_number)]
+            well_auth_numbers = [int(well_auth_number)]
 
         if application_guid:
             application = Application.find_by_guid(application_guid)
@@ -32,7 +31,11 @@ class WellListResource(Resource, UserMixin):
                 int(x['details']['well_authorization_number'])
                 for x in application.json['well_sites']
             ]
+            well_auth_numbers = application_wells if well_auth_numbers is None else [
+                x for x in well_auth_numbers if x in application_wells
+            ]
 
-            wells = wells[wells['well_auth_number'].copy().isin(application_wells)]
-
-        return wells.to_dict('records')
\ No newline at end of file
+        return wells.response(
+            WELL,
+            operator_id=[int(operator_id)] if operator_id else None,
+            well_auth_number=well_auth_numbers).make_response()
\ No newline at end of file
@@ -1,12 +1,294 @@
+import os
+import sys
+import json
+import time
 import click
 import psycopg2
+import subprocess
 
 from sqlalchemy.exc import DBAPIError
 from multiprocessing.dummy import Pool as ThreadPool
 from flask import current_app
 
 from app.api.utils.include.user_info import User
+from app.config import Config
 from app.extensions import db
 
+# Run by benchmark-startup in a new interpreter, prints the timings of one cold start as JSON
+STARTUP_BENCHMARK_SCRIPT = """
+import json
+import time
+from app import create_app
+from app.config import Config
+
+started = time.time()
+app = create_app()
+created = time.time()
+client = app.test_client()
+
+ready = client.get(f'{Config.BASE_PATH}/ready')
+while ready.status_code != 200 and time.time() - started < 120:
+    time.sleep(0.1)
+    ready = client.get(f'{Config.BASE_PATH}/ready')
+became_ready = time.time()
+
+client.get(f'{Config.BASE_PATH}/permit_holder')
+first_request = time.time()
+
+print(json.dumps({
+    'created': created - started,
+    'ready': became_ready - started,
+    'ready_status': ready.status_code,
+    'first_request': first_request - started
+}))
+"""
+
 def register_commands(app):
-    return
\ No newline at end of file
+    @app.cli.command('regenerate-ogc-snapshots')
+    def regenerate_ogc_snapshots():
+        """Regenerates the OGC data fallback snapshots from the live OGC reports."""
+        from app.api.services.ogc_data_service import OGCDataService
+        OGCDataService.regenerateSnapshots()
+
+    @app.cli.command('send-queued-emails')
+    def send_queued_emails():
+        """Sends all due emails in the outbox over one SMTP connection."""
+        from app.api.services.email_service import EmailOutboxWorker, SMTPConnection
+        connection = SMTPConnection()
+        try:
+            total = 0
+            sent = EmailOutboxWorker.send_due_emails(connection)
+            while sent:
+                total += sent
+                sent = EmailOutboxWorker.send_due_emails(connection)
+            click.echo(f'Handled {total} queued emails')
+        finally:
+            connection.close()
+
+    @app.cli.command('run-prf-jobs')
+    def run_prf_jobs():
+        """Runs the stages of all due PRF jobs in this process."""
+        from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
+        total = 0
+        while PaymentDocumentJobWorker.run_next_stage():
+            total += 1
+        click.echo(f'Ran {total} PRF job stages')
+
+    @app.cli.command('prune-rendered-documents')
+    def prune_rendered_documents():
+        """Deletes the cached rendered documents older than RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS."""
+        from app.api.services.document_generator_service import RenderedDocumentCache
+        click.echo(f'Deleted {RenderedDocumentCache.prune()} cached rendered documents')
+
+    @app.cli.command('benchmark-startup')
+    @click.option('--runs', default=3, help='Number of application starts to measure.')
+    def benchmark_startup(runs):
+        """Measures the time from create_app() to the first ready and first data responses, each run in a new process."""
+        # the OGC refresher and the decoded datasets live for the whole process, so every run starts
+        # its own interpreter to measure a cold worker
+        for run in range(1, runs + 1):
+            result = subprocess.run([sys.executable, '-c', STARTUP_BENCHMARK_SCRIPT],
+                                    cwd=os.path.dirname(current_app.root_path),
+                                    stdout=subprocess.PIPE,
+                                    universal_newlines=True,
+                                    check=True)
+            timings = json.loads(result.stdout.strip().splitlines()[-1])
+            click.echo(f'Run {run}: create_app {timings["created"]:.3f}s, '
+                       f'ready {timings["ready"]:.3f}s (status {timings["ready_status"]}), '
+                       f'first request {timings["first_request"]:.3f}s')
+
+    @app.cli.command('benchmark-well-sites-review-data')
+    @click.option('--limit', default=50, help='Number of approved applications to use.')
+    def benchmark_well_sites_review_data(limit):
+        """Compares merges and latency of the payment/approved work accessors with and without memoization."""
+        import app.api.application.models.application as application_module
+        from app.api.application.models.application import Application
+
+        applications = Application.query.filter(
+            Application.application_status_code == 'FIRST_PAY_APPROVED').limit(limit).all()
+
+        merge = application_module.merge_well_sites_with_review_data
+        merges = {'count': 0}
+
+        def counting_merge(*args):
+            merges['count'] += 1
+            return merge(*args)
+
+        def run():
+            # the same accessors the approved work and payment document endpoints use
+            merges['count'] = 0
+            started = time.time()
+            for application in applications:
+                application.invalidate_well_sites_with_review_data()
+                approved_work = application.contracted_work('APPROVED', False)
+                application.calc_first_prf_amount()
+                for cw in approved_work:
+                    application.find_contracted_work_by_id(cw['work_id'])
+                    application.find_contracted_work_type_by_work_id(cw['work_id'])
+            return merges['count'], time.time() - started
+
+        memoized_accessor = Application.__dict__['well_sites_with_review_data']
+        application_module.merge_well_sites_with_review_data = counting_merge
+        try:
+            # merging on every access is how the accessor behaved before it was memoized
+            Application.well_sites_with_review_data = property(
+                lambda self: counting_merge(self.json, self.review_json))
+            count, elapsed = run()
+            click.echo(f'Unmemoized: {len(applications)} applications, {count} merges, '
+                       f'{elapsed * 1000:.1f}ms')
+
+            Application.well_sites_with_review_data = memoized_accessor
+            count, elapsed = run()
+            click.echo(f'Memoized: {len(applications)} applications, {count} merges, '
+                       f'{elapsed * 1000:.1f}ms')
+        finally:
+            Application.well_sites_with_review_data = memoized_accessor
+            application_module.merge_well_sites_with_review_data = merge
+
+    @app.cli.command('benchmark-confirmation-email')
+    @click.option('--well-sites', default=50, help='Number of well sites on the application.')
+    @click.option('--runs', default=20, help='Number of renders to measure.')
+    def benchmark_confirmation_email(well_sites, runs):
+        """Measures rendering the application confirmation email for an application with many well sites."""
+        import uuid
+        from app.api.application.models.application import Application
+        from app.api.application.constants import CONTRACTED_WORK
+        from app.api.services.email_service import EmailService
+        from app.api.services.email_template_service import render_email_template
+
+        contracted_work = {
+            section['section_name']: {
+                'planned_start_date': '2026-01-01',
+                'planned_end_date': '2026-12-31',
+                **{
+                    amount_field['name']: 1000.0
+                    for sub_section in section['sub_sections']
+                    for amount_field in sub_section['amount_fields']
+                }
+            }
+            for section in CONTRACTED_WORK
+        }
+        application = Application(
+            guid=uuid.uuid4(),
+            application_phase_code='NOMINATION',
+            json={
+                'company_details': {
+                    'company_name': {
+                        'label': 'BENCHMARK COMPANY'
+                    },
+                    'city': 'Victoria',
+                    'province': 'BC',
+                    'address_line_1': '1 Benchmark Road',
+                    'postal_code': 'V8V 1V1',
+                    'business_number': '123456789',
+                    'indigenous_affiliation': 'NONE'
+                },
+                'company_contact': {
+                    'first_name': 'Bench',
+                    'last_name': 'Mark',
+                    'email': 'benchmark@example.com',
+                    'phone_number_1': '2505550100'
+                },
+                'contract_details': {
+                    'operator_id': 1
+                },
+                'well_sites': [{
+                    'details': {
+                        'well_authorization_number': str(10000 + i)
+                    },
+                    'site_conditions': {},
+                    'contracted_work': contracted_work
+                } for i in range(well_sites)]
+            })
+
+        def render():
+            html_content = render_email_template(
+                'application_confirmation.html',
+                application=application,
+                permit_holder_name='BENCHMARK PERMIT HOLDER')
+            return EmailService().create_applicant_email_body(application, html_content)
+
+        started = time.time()
+        size = len(render())
+        first = time.time() - started
+
+        started = time.time()
+        for run in range(runs):
+            render()
+        elapsed = (time.time() - started) / runs
+
+        click.echo(f'{well_sites} well sites, {size} characters: first render {first * 1000:.1f}ms '
+                   f'(includes compiling the templates), then {elapsed * 1000:.1f}ms per render')
+
+    @app.cli.command('benchmark-application-pagination')
+    @click.option('--rows', default=100000, help='Number of synthetic applications to add.')
+    @click.option('--per-page', default=25, help='Page size.')
+    def benchmark_application_pagination(rows, per_page):
+        """Compares OFFSET and cursor pagination of the application list at the same depths on synthetic applications, rolled back afterwards."""
+        from app.extensions import cache
+        from app.api.application.models.application import Application
+        from app.api.application.resources.application import ApplicationListResource
+        from app.api.utils.helpers import encode_cursor
+
+        resource = ApplicationListResource()
+        filter_sets = ({}, {'application_status_code': ['WAIT_FOR_DOCS']})
+        try:
+            started = time.time()
+            db.session.execute(
+                """
+                INSERT INTO application (id, submission_date, json, application_phase_code, application_status_code, create_user, update_user)
+                SELECT
+                    (SELECT COALESCE(MAX(id), 0) FROM application) + i,
+                    now() - (i || ' minutes')::interval,
+                    jsonb_build_object('company_details', jsonb_build_object('company_name', jsonb_build_object('label', 'BENCHMARK COMPANY ' || (i % 1000)))),
+                    (SELECT application_phase_code FROM application_phase_type LIMIT 1),
+                    (ARRAY['NOT_STARTED', 'WAIT_FOR_DOCS', 'FIRST_PAY_APPROVED'])[1 + i % 3],
+                    'benchmark',
+                    'benchmark'
+                FROM generate_series(1, :rows) AS i
+                """, {'rows': rows})
+            db.session.execute('ANALYZE application')
+            click.echo(f'Added {rows} applications in {time.time() - started:.1f}s')
+
+            for filters in filter_sets:
+                last_page = max(1, rows // per_page // (3 if filters else 1))
+                for page_number in (1, last_page // 2, last_page):
+                    started = time.time()
+                    records, pagination_details = resource._apply_filters_and_pagination(
+                        page_number=page_number,
+                        page_size=per_page,
+                        sort_field='submission_date',
+                        sort_dir='asc',
+                        **filters)
+                    records.all()
+                    offset_elapsed = time.time() - started
+
+                    # seek the cursor to the row before the same page, outside the timing
+                    cursor = ''
+                    if page_number > 1:
+                        boundary = resource._apply_filters(**filters).order_by(
+                            Application.submission_date, Application.id).offset(
+                                (page_number - 1) * per_page - 1).first()
+                        cursor = encode_cursor('submission_date', 'asc', boundary.submission_date,
+                                               boundary.id)
+
+                    started = time.time()
+                    result = resource._apply_filters_and_keyset_pagination(
+                        cursor=cursor,
+                        page_size=per_page,
+                        sort_field='submission_date',
+                        sort_dir='asc',
+                        include_count=page_number == 1,
+                        **filters)
+                    cursor_elapsed = time.time() - started
+
+                    approximate_total = f' (approximate total {result["approximate_total"]})' \
+                        if page_number == 1 else ''
+                    click.echo(f'{filters or "unfiltered"} page {page_number}: '
+                               f'OFFSET {offset_elapsed * 1000:.1f}ms, '
+                               f'cursor {cursor_elapsed * 1000:.1f}ms{approximate_total}')
+        finally:
+            db.session.rollback()
+            # the counts cached for the synthetic rows would outlive them
+            cache.delete_many(
+                *[resource._approximate_count_cache_key(filters) for filters in filter_sets])
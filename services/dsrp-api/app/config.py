@@ -77,6 +77,30 @@ class Config(object):
     # OrgBook
     ORGBOOK_API_URL = os.environ.get('ORGBOOK_API_URL', 'https://orgbook.gov.bc.ca/api/v2/')
 
+    # OGC data
+    OGC_PERMIT_HOLDER_CSV_URL = os.environ.get(
+        'OGC_PERMIT_HOLDER_CSV_URL',
+        'http://reports.bcogc.ca/ogc/f?p=200:201:14073940726161:CSV::::')
+    OGC_DORMANT_WELLS_CSV_URL = os.environ.get(
+        'OGC_DORMANT_WELLS_CSV_URL', 'https://reports.bcogc.ca/ogc/f?p=200:81:9680316354055:CSV::::')
+    OGC_LIABILITY_PER_WELL_CSV_URL = os.environ.get(
+        'OGC_LIABILITY_PER_WELL_CSV_URL',
+        'https://reports.bcogc.ca/ogc/f?p=200:10:10256707131131:CSV::::')
+    OGC_DATA_REQUEST_TIMEOUT_SECONDS = int(os.environ.get('OGC_DATA_REQUEST_TIMEOUT_SECONDS', 60))
+    OGC_DATA_REFRESHER_ENABLED = os.environ.get('OGC_DATA_REFRESHER_ENABLED', 'true') == 'true'
+    OGC_DATA_REFRESH_INTERVAL_SECONDS = int(
+        os.environ.get('OGC_DATA_REFRESH_INTERVAL_SECONDS', 300))
+    # Arrow IPC buffer compression for the cached datasets: lz4, zstd or empty for none
+    OGC_DATA_COMPRESSION = os.environ.get('OGC_DATA_COMPRESSION', 'lz4')
+    # Number of encoded responses kept per dataset version
+    OGC_RESPONSE_CACHE_SIZE = int(os.environ.get('OGC_RESPONSE_CACHE_SIZE', 256))
+
+    # SQL profiling, reported per request in the Server-Timing header and logs
+    SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', 'true') == 'true'
+    # Fail requests that repeat a statement this many times (N+1 queries)
+    SQL_PROFILER_STRICT = os.environ.get('SQL_PROFILER_STRICT', 'false') == 'true'
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_PROFILER_N_PLUS_ONE_THRESHOLD', 5))
+
     # Document generation
     DOCUMENT_GENERATOR_URL = os.environ.get('DOCUMENT_GENERATOR_URL', 'http://docgen-api:3030')
 
@@ -87,6 +111,25 @@ class Config(object):
     OBJECT_STORE_ACCESS_KEY = os.environ.get('OBJECT_STORE_ACCESS_KEY', '')
     OBJECT_STORE_BUCKET = os.environ.get('OBJECT_STORE_BUCKET', '')
     S3_PREFIX = os.environ.get('S3_PREFIX', 'dsrp-applications/')
+    # Defaults to HTTPS on OBJECT_STORE_HOST, e.g., http://localhost:9000 for a local MinIO
+    OBJECT_STORE_ENDPOINT_URL = os.environ.get('OBJECT_STORE_ENDPOINT_URL',
+                                               f'https://{OBJECT_STORE_HOST}')
+    OBJECT_STORE_MAX_POOL_CONNECTIONS = int(os.environ.get('OBJECT_STORE_MAX_POOL_CONNECTIONS', 20))
+    # Files larger than the threshold are transferred in parts of the chunk size, with this many threads
+    OBJECT_STORE_MULTIPART_THRESHOLD_MB = int(os.environ.get('OBJECT_STORE_MULTIPART_THRESHOLD_MB', 8))
+    OBJECT_STORE_MULTIPART_CHUNKSIZE_MB = int(os.environ.get('OBJECT_STORE_MULTIPART_CHUNKSIZE_MB', 8))
+    OBJECT_STORE_MAX_TRANSFER_CONCURRENCY = int(
+        os.environ.get('OBJECT_STORE_MAX_TRANSFER_CONCURRENCY', 4))
+    # 'redirect' sends document downloads to a presigned object store URL, 'proxy' streams them through the API
+    DOCUMENT_DOWNLOAD_MODE = os.environ.get('DOCUMENT_DOWNLOAD_MODE', 'redirect')
+    DOCUMENT_DOWNLOAD_URL_EXPIRY_SECONDS = int(
+        os.environ.get('DOCUMENT_DOWNLOAD_URL_EXPIRY_SECONDS', 60))
+    # Rendered documents are cached in the object store, their index in the cache and the objects expire after this
+    RENDERED_DOCUMENT_CACHE_ENABLED = os.environ.get('RENDERED_DOCUMENT_CACHE_ENABLED',
+                                                     'true') == 'true'
+    RENDERED_DOCUMENT_CACHE_PREFIX = 'rendered-documents/'
+    RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS = int(
+        os.environ.get('RENDERED_DOCUMENT_CACHE_TIMEOUT_SECONDS', 7 * 24 * 60 * 60))
 
     # SMTP
     SMTP_CRED_HOST = os.environ.get('SMTP_CRED_HOST', None)
@@ -98,6 +141,26 @@ class Config(object):
     SMTP_IS_TEST_MODE = os.environ.get('SMTP_IS_TEST_MODE', False)
     EMAIL_TO = os.environ.get('EMAIL_TO', None)
     EMAIL_FROM = os.environ.get('EMAIL_FROM', None)
+    # Compiled email templates are cached here, defaults to a directory in the system temp directory
+    EMAIL_TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('EMAIL_TEMPLATE_BYTECODE_CACHE_DIR', None)
+    # Idle SMTP connections of the email outbox worker are closed after this many seconds
+    SMTP_IDLE_TIMEOUT_SECONDS = int(os.environ.get('SMTP_IDLE_TIMEOUT_SECONDS', 60))
+    EMAIL_OUTBOX_WORKER_ENABLED = os.environ.get('EMAIL_OUTBOX_WORKER_ENABLED', 'true') == 'true'
+    EMAIL_OUTBOX_POLL_INTERVAL_SECONDS = int(
+        os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL_SECONDS', 30))
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 20))
+    # Failed sends are retried after 30s, 60s, 120s, ... until the maximum attempts are reached
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS = int(
+        os.environ.get('EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS', 30))
+
+    # PRF jobs
+    PRF_JOB_WORKER_ENABLED = os.environ.get('PRF_JOB_WORKER_ENABLED', 'true') == 'true'
+    PRF_JOB_WORKERS = int(os.environ.get('PRF_JOB_WORKERS', 2))
+    PRF_JOB_POLL_INTERVAL_SECONDS = int(os.environ.get('PRF_JOB_POLL_INTERVAL_SECONDS', 10))
+    # Each stage of a job is retried after 10s, 20s, 40s, ... until the maximum attempts are reached
+    PRF_JOB_MAX_ATTEMPTS = int(os.environ.get('PRF_JOB_MAX_ATTEMPTS', 5))
+    PRF_JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get('PRF_JOB_RETRY_BACKOFF_SECONDS', 10))
 
     # Email
     PROGRAM_EMAIL = 'DormantSite.BC.Government@gov.bc.ca'
@@ -111,6 +174,12 @@ class TestConfig(Config):
     # The following configs are for testing purposes and all variables and keys are generated using dummy data.
     TESTING = os.environ.get('TESTING', True)
     CACHE_TYPE = "simple"
+    OGC_DATA_REFRESHER_ENABLED = False
+    EMAIL_OUTBOX_WORKER_ENABLED = False
+    PRF_JOB_WORKER_ENABLED = False
+    RENDERED_DOCUMENT_CACHE_ENABLED = False
+    DOCUMENT_DOWNLOAD_MODE = 'proxy'
+    SQL_PROFILER_STRICT = True
     DB_NAME_TEST = os.environ.get('DB_NAME_TEST', 'db_name_test')
     DB_URL = "postgresql://{0}:{1}@{2}:{3}/{4}".format(Config.DB_USER, Config.DB_PASS,
                                                        Config.DB_HOST, Config.DB_PORT, DB_NAME_TEST)
@@ -0,0 +1,74 @@
+import json
+
+from app.extensions import db
+
+APPLICATION_JSON = {
+    'company_details': {
+        'company_name': {
+            'label': 'QUERY COUNT COMPANY'
+        }
+    },
+    'company_contact': {
+        'first_name': 'Query',
+        'last_name': 'Count'
+    },
+    'well_sites': []
+}
+
+
+def _count_statements(test_client, url, headers):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = test_client.get(url, headers=headers)
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements), json.loads(response.data.decode())
+
+
+def test_application_list_statement_count_is_constant(test_client, db_session, auth_headers):
+    """The application list issues the same number of statements for a 5 and a 250 row page"""
+    db_session.execute(
+        """
+        INSERT INTO application (submission_date, json, application_phase_code, create_user, update_user)
+        SELECT now(), :json, (SELECT application_phase_code FROM application_phase_type LIMIT 1), 'test', 'test'
+        FROM generate_series(1, 250)
+        """, {'json': json.dumps(APPLICATION_JSON)})
+
+    small_count, small_page = _count_statements(
+        test_client, '/application?per_page=5&company_name=query count',
+        auth_headers['full_auth_header'])
+    large_count, large_page = _count_statements(
+        test_client, '/application?per_page=250&company_name=query count',
+        auth_headers['full_auth_header'])
+
+    assert len(small_page['records']) == 5
+    assert len(large_page['records']) == 250
+    assert large_count == small_count
+
+
+def test_cursor_page_size_is_limited_to_the_page_size_options(test_client, db_session,
+                                                              auth_headers):
+    """Cursor pagination rounds per_page to the nearest page size option, like page numbers do"""
+    db_session.execute(
+        """
+        INSERT INTO application (submission_date, json, application_phase_code, create_user, update_user)
+        SELECT now(), :json, (SELECT application_phase_code FROM application_phase_type LIMIT 1), 'test', 'test'
+        FROM generate_series(1, 300)
+        """, {'json': json.dumps(APPLICATION_JSON)})
+
+    for per_page, page_size in ((0, 5), (-10, 5), (100000, 250)):
+        response = test_client.get(
+            f'/application?cursor=&per_page={per_page}&company_name=query count',
+            headers=auth_headers['full_auth_header'])
+
+        assert response.status_code == 200
+        page = json.loads(response.data.decode())
+        assert len(page['records']) == page['items_per_page'] == page_size
+        assert page['next_cursor']
@@ -0,0 +1,41 @@
+import json
+
+from tests.services.conftest import create_approved_application
+
+
+def _abandonment_total(application):
+    return application.well_sites_with_review_data[0]['contracted_work']['abandonment'][
+        'contracted_work_total']
+
+
+def _review_mob_demob_site(db_session, application, amount):
+    db_session.execute(
+        'UPDATE application SET review_json = :review_json WHERE id = :id', {
+            'id': application.id,
+            'review_json': json.dumps({
+                'well_sites': [{
+                    '12345': {
+                        'contracted_work': {
+                            'abandonment': {
+                                'mob_demob_site': amount
+                            }
+                        }
+                    }
+                }]
+            })
+        })
+
+
+def test_well_sites_with_review_data_follow_reloaded_documents(test_client, db_session):
+    application = create_approved_application(db_session, ('abandonment', ))
+    well_sites = application.well_sites_with_review_data
+    assert application.well_sites_with_review_data is well_sites
+    assert _abandonment_total(application) == 1000.0
+
+    _review_mob_demob_site(db_session, application, 2000.0)
+    db_session.refresh(application)
+    assert _abandonment_total(application) == 2000.0
+
+    _review_mob_demob_site(db_session, application, 3000.0)
+    db_session.expire(application)
+    assert _abandonment_total(application) == 3000.0
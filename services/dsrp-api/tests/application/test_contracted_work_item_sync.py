@@ -0,0 +1,57 @@
+import re
+import json
+
+from app.api.constants import WELL_SITE_CONTRACTED_WORK
+from app.api.contracted_work.models.contracted_work_item import ContractedWorkItem
+
+SQL_FIELD_LIST_PATTERN = re.compile(r"WHEN '(\w+)' THEN ARRAY\[([^\]]*)\]")
+
+
+def test_sync_trigger_totals_the_same_fields_as_the_api(test_client, db_session):
+    """The sync_contracted_work_items function keeps its own copy of WELL_SITE_CONTRACTED_WORK"""
+    definition = db_session.execute(
+        "SELECT pg_get_functiondef('sync_contracted_work_items'::regproc)").scalar()
+
+    sql_fields = {
+        work_type: re.findall(r"'(\w+)'", fields)
+        for work_type, fields in SQL_FIELD_LIST_PATTERN.findall(definition)
+    }
+
+    assert sql_fields == WELL_SITE_CONTRACTED_WORK
+
+
+def test_sync_trigger_totals_every_contracted_work_field(test_client, db_session):
+    application_id = db_session.execute(
+        'SELECT COALESCE(MAX(id), 0) + 1 FROM application').scalar()
+    contracted_work = {
+        work_type: dict({field: 1.5
+                         for field in fields},
+                        work_id=f'{application_id}.{i + 1}',
+                        not_a_cost=1000)
+        for i, (work_type, fields) in enumerate(WELL_SITE_CONTRACTED_WORK.items())
+    }
+    db_session.execute(
+        """
+        INSERT INTO application (id, submission_date, json, application_phase_code, application_status_code, create_user, update_user)
+        VALUES (:id, now(), :json, (SELECT application_phase_code FROM application_phase_type LIMIT 1), 'NOT_STARTED', 'test', 'test')
+        """, {
+            'id': application_id,
+            'json': json.dumps({
+                'company_details': {
+                    'company_name': {
+                        'label': 'Contracted Work Sync Ltd.'
+                    }
+                },
+                'well_sites': [{
+                    'contracted_work': contracted_work
+                }]
+            })
+        })
+
+    items = ContractedWorkItem.query.filter_by(application_id=application_id).all()
+
+    assert {item.contracted_work_type: float(item.contracted_work_total)
+            for item in items} == {
+                work_type: 1.5 * len(fields)
+                for work_type, fields in WELL_SITE_CONTRACTED_WORK.items()
+            }
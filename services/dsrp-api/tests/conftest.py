@@ -97,6 +97,15 @@ def db_session(test_client):
     sess = db.create_scoped_session(options=options)
     db.session = sess
 
+    # Code under test can commit and roll back, each only ends a savepoint of the test's transaction
+    sess.begin_nested()
+
+    @db.event.listens_for(sess(), 'after_transaction_end')
+    def restart_savepoint(session, transaction):
+        if transaction.nested and not transaction._parent.nested:
+            session.expire_all()
+            session.begin_nested()
+
     for factory in FACTORY_LIST:
         factory._meta.sqlalchemy_session = sess
 
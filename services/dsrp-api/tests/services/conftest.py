@@ -0,0 +1,131 @@
+import json
+import boto3
+import pytest
+
+from moto import mock_s3
+
+from app.config import Config
+from app.api.application.models.application import Application
+from app.api.company_payment_info.models import CompanyPaymentInfo
+from app.api.contracted_work.models.contracted_work_payment import ContractedWorkPayment
+from app.api.services.document_generator_service import DocumentGeneratorService, RenderedDocument
+from app.api.services.object_store_storage_service import ObjectStoreStorageService
+from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
+
+TEST_BUCKET = 'dsrp-test'
+COMPANY_NAME = 'PRF TEST COMPANY'
+FINANCE_EMAIL = 'finance@example.com'
+
+
+@pytest.fixture(scope='function')
+def object_store(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setattr(Config, 'OBJECT_STORE_ENDPOINT_URL', None)
+    monkeypatch.setattr(Config, 'OBJECT_STORE_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setattr(Config, 'OBJECT_STORE_ACCESS_KEY', 'testing')
+    monkeypatch.setattr(Config, 'OBJECT_STORE_BUCKET', TEST_BUCKET)
+    monkeypatch.setattr(Config, 'OBJECT_STORE_MULTIPART_THRESHOLD_MB', 5)
+    monkeypatch.setattr(Config, 'OBJECT_STORE_MULTIPART_CHUNKSIZE_MB', 5)
+    with mock_s3():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=TEST_BUCKET)
+        ObjectStoreStorageService.reset_client()
+        yield boto3.client('s3', region_name='us-east-1')
+        ObjectStoreStorageService.reset_client()
+
+
+@pytest.fixture(scope='function')
+def prf_config(monkeypatch):
+    monkeypatch.setattr(Config, 'SMTP_ENABLED', True)
+    monkeypatch.setattr(Config, 'PRF_FROM_EMAIL', 'prf@example.com')
+    monkeypatch.setattr(Config, 'PRF_TO_EMAIL', FINANCE_EMAIL)
+    monkeypatch.setattr(Config, 'PRF_JOB_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(Config, 'PRF_JOB_RETRY_BACKOFF_SECONDS', 60)
+
+
+@pytest.fixture(scope='function')
+def docgen(monkeypatch):
+    renders = {'count': 0, 'error': None, 'failing_invoice_numbers': set()}
+
+    def generate_document(template_file_path, data, document_type, stream=False, cache=True):
+        renders['count'] += 1
+        if renders['error'] or data['invoice_number'] in renders['failing_invoice_numbers']:
+            raise Exception(renders['error'] or 'Failed to render the PRF')
+        return RenderedDocument(
+            'payment-request-form.xlsx',
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            content=f'PRF {data["invoice_number"]}'.encode())
+
+    monkeypatch.setattr(DocumentGeneratorService, 'generate_document', generate_document)
+    return renders
+
+
+def create_approved_application(session, work_types=('abandonment', 'reclamation')):
+    """Adds an approved application whose contracted work has approved interim payments."""
+
+    application_id = session.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM application').scalar()
+    contracted_work = {
+        work_type: {
+            'work_id': f'{application_id}.{i + 1}',
+            'contracted_work_status_code': 'APPROVED',
+            'mob_demob_site': 1000.0
+        }
+        for i, work_type in enumerate(work_types)
+    }
+    session.execute(
+        """
+        INSERT INTO application (id, submission_date, json, application_phase_code, application_status_code, create_user, update_user)
+        VALUES (:id, now(), :json, (SELECT application_phase_code FROM application_phase_type LIMIT 1), 'FIRST_PAY_APPROVED', 'test', 'test')
+        """, {
+            'id': application_id,
+            'json': json.dumps({
+                'company_details': {
+                    'company_name': {
+                        'label': COMPANY_NAME
+                    }
+                },
+                'well_sites': [{
+                    'contracted_work': contracted_work
+                }]
+            })
+        })
+    application = Application.query.filter_by(id=application_id).one()
+
+    if not CompanyPaymentInfo.find_by_company_name(COMPANY_NAME):
+        session.add(
+            CompanyPaymentInfo(
+                company_name=COMPANY_NAME,
+                company_address='1 Test Road',
+                po_number='PO-1',
+                qualified_receiver_name='Receiver',
+                expense_authority_name='Authority'))
+    for work in contracted_work.values():
+        session.add(
+            ContractedWorkPayment(
+                application,
+                'APPROVED',
+                'INTERIM',
+                application_guid=application.guid,
+                work_id=work['work_id'],
+                interim_paid_amount=500))
+    session.flush()
+    session.expire_all()
+    return application
+
+
+@pytest.fixture(scope='function')
+def approved_application(db_session):
+    return create_approved_application(db_session)
+
+
+def work_ids_of(application):
+    return sorted(
+        cw['work_id'] for ws in application.well_sites_with_review_data
+        for cw in ws['contracted_work'].values())
+
+
+def run_all_job_stages():
+    """Runs the stages of the due PRF jobs until none is due, returns how many stages ran."""
+    stages = 0
+    while PaymentDocumentJobWorker.run_next_stage():
+        stages += 1
+    return stages
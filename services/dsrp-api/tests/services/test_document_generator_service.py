@@ -0,0 +1,127 @@
+import pytest
+
+from app.extensions import cache
+from app.api.services import document_generator_service
+from app.api.services.document_generator_service import DocumentGeneratorService, DocumentTemplateRegistry
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.content = b'document'
+        self.text = ''
+        self.headers = {
+            'content-disposition': 'attachment; filename="template-18102026.pdf"',
+            'content-type': 'application/pdf'
+        }
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope='function')
+def docgen(monkeypatch):
+    calls = {'check': 0, 'push': 0, 'render': 0, 'render_status': [200]}
+
+    def get(url):
+        calls['check'] += 1
+        return FakeResponse(404)
+
+    def post(url, data=None, headers=None, stream=False, files=None):
+        if files:
+            calls['push'] += 1
+            return FakeResponse(200)
+        calls['render'] += 1
+        return FakeResponse(calls['render_status'].pop(0))
+
+    monkeypatch.setattr(document_generator_service.requests, 'get', get)
+    monkeypatch.setattr(document_generator_service.requests, 'post', post)
+    monkeypatch.setattr(DocumentTemplateRegistry, '_pushed', set())
+    cache.clear()
+    return calls
+
+
+class FakeObjectStore:
+    objects = {}
+
+    def upload_fileobj(self, fileobj, filepath):
+        self.objects[filepath] = fileobj.read()
+        return filepath
+
+    def read_file(self, path):
+        return self.objects[path]
+
+    def stream_file(self, path):
+        return iter([self.objects[path]])
+
+
+@pytest.fixture(scope='function')
+def template_file(tmp_path):
+    template = tmp_path / 'template.xlsx'
+    template.write_bytes(b'template')
+    return template
+
+
+def test_template_checksum_is_memoized_until_the_file_changes(test_client, template_file,
+                                                              monkeypatch):
+    reads = []
+    checksum = document_generator_service.sha256_checksum
+    monkeypatch.setattr(document_generator_service, 'sha256_checksum',
+                        lambda path: reads.append(path) or checksum(path))
+
+    first = DocumentTemplateRegistry.checksum(str(template_file))
+    assert DocumentTemplateRegistry.checksum(str(template_file)) == first
+    assert len(reads) == 1
+
+    template_file.write_bytes(b'changed template')
+    assert DocumentTemplateRegistry.checksum(str(template_file)) != first
+    assert len(reads) == 2
+
+
+def test_template_is_pushed_once(test_client, docgen, template_file):
+    DocumentGeneratorService.generate_document_and_stream_response(str(template_file), {}, 'xlsx')
+    docgen['render_status'].append(200)
+    DocumentGeneratorService.generate_document_and_stream_response(str(template_file), {}, 'xlsx')
+
+    assert docgen['check'] == 1
+    assert docgen['push'] == 1
+    assert docgen['render'] == 2
+
+
+def test_template_is_pushed_again_when_docgen_lost_it(test_client, docgen, template_file):
+    DocumentGeneratorService.generate_document_and_stream_response(str(template_file), {}, 'xlsx')
+    docgen['render_status'].extend([404, 200])
+    resp = DocumentGeneratorService.generate_document_and_stream_response(
+        str(template_file), {}, 'xlsx')
+
+    assert resp.status_code == 200
+    assert docgen['push'] == 2
+    assert docgen['render'] == 3
+
+
+def test_rendered_document_is_served_from_the_cache(test_client, docgen, template_file,
+                                                    monkeypatch):
+    monkeypatch.setitem(test_client.application.config, 'RENDERED_DOCUMENT_CACHE_ENABLED', True)
+    monkeypatch.setattr(document_generator_service, 'ObjectStoreStorageService', FakeObjectStore)
+
+    first = DocumentGeneratorService.generate_document(str(template_file), {'a': 1, 'b': 2}, 'pdf')
+    second = DocumentGeneratorService.generate_document(
+        str(template_file), {'b': 2, 'a': 1}, 'pdf', stream=True)
+
+    assert docgen['render'] == 1
+    assert first.file_name == second.file_name == 'template-18102026.pdf'
+    assert b''.join(second.iter_content()) == first.content
+
+
+def test_uncached_document_is_not_stored(test_client, docgen, template_file, monkeypatch):
+    monkeypatch.setitem(test_client.application.config, 'RENDERED_DOCUMENT_CACHE_ENABLED', True)
+    monkeypatch.setattr(document_generator_service, 'ObjectStoreStorageService', FakeObjectStore)
+    monkeypatch.setattr(FakeObjectStore, 'objects', {})
+
+    docgen['render_status'].append(200)
+    for i in range(2):
+        DocumentGeneratorService.generate_document(
+            str(template_file), {'invoice_number': 'A-1'}, 'xlsx', cache=False)
+
+    assert docgen['render'] == 2
+    assert FakeObjectStore.objects == {}
@@ -0,0 +1,167 @@
+import pytest
+
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from aiosmtpd.controller import Controller
+
+from app.config import Config
+from app.api.email_outbox.models.email_outbox import EmailOutbox
+from app.api.services.email_service import SMTPConnection, EmailService, EmailOutboxWorker
+
+
+class EphemeralPortController(Controller):
+    """Listens on a free port, aiosmtpd otherwise checks the server on the port it was given (0)"""
+    def _trigger_server(self):
+        self.port = self.server.sockets[0].getsockname()[1]
+        super()._trigger_server()
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.response = '250 Message accepted for delivery'
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.response.startswith('250'):
+            self.messages.append((session.peer, envelope.rcpt_tos, envelope.content))
+        return self.response
+
+
+@pytest.fixture(scope='function')
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = EphemeralPortController(handler, hostname='127.0.0.1', port=0)
+    controller.start()
+    monkeypatch.setattr(Config, 'SMTP_IS_TEST_MODE', False)
+    monkeypatch.setattr(Config, 'SMTP_CRED', {'host': '127.0.0.1', 'port': controller.port})
+    yield controller, handler
+    controller.stop()
+
+
+def _message(to_email):
+    msg = MIMEText('<p>Test</p>', 'html')
+    msg['From'] = 'from@example.com'
+    msg['To'] = to_email
+    msg['Subject'] = 'Test'
+    return msg
+
+
+def test_smtp_connection_is_reused(test_client, smtp_server):
+    """Sends several emails over a single SMTP connection"""
+    controller, handler = smtp_server
+    connection = SMTPConnection()
+    try:
+        for i in range(3):
+            connection.send_message(_message(f'applicant{i}@example.com'))
+    finally:
+        connection.close()
+
+    assert [rcpt_tos for peer, rcpt_tos, content in handler.messages] == [
+        ['applicant0@example.com'], ['applicant1@example.com'], ['applicant2@example.com']
+    ]
+    assert len({peer for peer, rcpt_tos, content in handler.messages}) == 1
+
+
+def test_smtp_connection_reconnects_when_idle(test_client, smtp_server):
+    """Opens a new SMTP connection once the previous one has been idle for too long"""
+    controller, handler = smtp_server
+    connection = SMTPConnection(idle_timeout_seconds=0)
+    try:
+        connection.send_message(_message('applicant0@example.com'))
+        connection.last_used -= 1
+        connection.send_message(_message('applicant1@example.com'))
+    finally:
+        connection.close()
+
+    assert len(handler.messages) == 2
+    assert len({peer for peer, rcpt_tos, content in handler.messages}) == 2
+
+
+@pytest.fixture(scope='function')
+def outbox(monkeypatch):
+    monkeypatch.setattr(Config, 'SMTP_ENABLED', True)
+    monkeypatch.setattr(Config, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(Config, 'EMAIL_OUTBOX_RETRY_BACKOFF_SECONDS', 60)
+    connection = SMTPConnection()
+    yield connection
+    connection.close()
+
+
+def _queue_email(to_email):
+    EmailService().send_email(to_email, 'from@example.com', 'Outbox test', '<p>Test</p>')
+    return EmailOutbox.query.filter_by(to_email=to_email).one()
+
+
+def test_outbox_delivers_emails_after_the_transaction_commits(test_client, db_session, smtp_server,
+                                                               outbox):
+    """Queues the email in the caller's transaction and sends it from the outbox once committed"""
+    controller, handler = smtp_server
+    email = _queue_email('applicant@example.com')
+    assert email.status == 'PENDING'
+    assert handler.messages == []
+
+    db_session.commit()
+    assert EmailOutboxWorker.send_due_emails(outbox) == 1
+
+    assert [rcpt_tos for peer, rcpt_tos, content in handler.messages] == [['applicant@example.com']]
+    assert b'Outbox test' in handler.messages[0][2]
+    assert (email.status, email.attempts) == ('SENT', 1)
+    assert email.sent_timestamp is not None
+    assert EmailOutboxWorker.send_due_emails(outbox) == 0
+    assert len(handler.messages) == 1
+
+
+def test_outbox_does_not_send_emails_of_rolled_back_transactions(test_client, db_session,
+                                                                 smtp_server, outbox):
+    """Drops the queued email when the transaction that queued it is rolled back"""
+    controller, handler = smtp_server
+    _queue_email('applicant@example.com')
+    db_session.rollback()
+
+    assert EmailOutboxWorker.send_due_emails(outbox) == 0
+    assert EmailOutbox.query.filter_by(to_email='applicant@example.com').count() == 0
+    assert handler.messages == []
+
+
+def test_outbox_retries_with_backoff_until_max_attempts(test_client, db_session, smtp_server,
+                                                        outbox):
+    """Retries a rejected email after an exponential backoff and gives up after the max attempts"""
+    controller, handler = smtp_server
+    handler.response = '554 Transaction failed'
+    email = _queue_email('applicant@example.com')
+    db_session.commit()
+
+    started = datetime.utcnow()
+    assert EmailOutboxWorker.send_due_emails(outbox) == 1
+    assert (email.status, email.attempts) == ('PENDING', 1)
+    assert '554' in email.last_error
+    assert email.next_attempt_timestamp >= started + timedelta(seconds=60)
+
+    # Not due again until the backoff has passed
+    assert EmailOutboxWorker.send_due_emails(outbox) == 0
+
+    email.next_attempt_timestamp = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert EmailOutboxWorker.send_due_emails(outbox) == 1
+    assert (email.status, email.attempts) == ('FAILED', 2)
+    assert EmailOutboxWorker.send_due_emails(outbox) == 0
+    assert handler.messages == []
+
+
+def test_outbox_sends_the_retry_once_the_server_recovers(test_client, db_session, smtp_server,
+                                                         outbox):
+    """Sends a previously failed email on its next attempt"""
+    controller, handler = smtp_server
+    handler.response = '451 Try again later'
+    email = _queue_email('applicant@example.com')
+    db_session.commit()
+    assert EmailOutboxWorker.send_due_emails(outbox) == 1
+
+    handler.response = '250 Message accepted for delivery'
+    email.next_attempt_timestamp = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert EmailOutboxWorker.send_due_emails(outbox) == 1
+
+    assert (email.status, email.attempts) == ('SENT', 2)
+    assert email.last_error is None
+    assert len(handler.messages) == 1
@@ -0,0 +1,35 @@
+import io
+
+from urllib.parse import urlparse, parse_qs
+
+from app.config import Config
+from app.api.services.object_store_storage_service import ObjectStoreStorageService
+
+
+def test_client_is_shared_by_the_process(test_client, object_store):
+    first = ObjectStoreStorageService()
+    second = ObjectStoreStorageService()
+
+    assert first._client is second._client
+    stats = ObjectStoreStorageService.get_stats()
+    assert stats['clients_created'] == 1
+    assert stats['client_reuses'] == 1
+
+
+def test_multipart_upload_and_download(test_client, object_store):
+    content = b'0123456789' * 1100000
+    key = ObjectStoreStorageService().upload_fileobj(io.BytesIO(content), 'large/file.pdf')
+
+    assert key == f'{Config.S3_PREFIX}large/file.pdf'
+    assert ObjectStoreStorageService().read_file(key) == content
+    assert b''.join(ObjectStoreStorageService().stream_file(key)) == content
+
+
+def test_presigned_download_url_sets_the_response_headers(test_client, object_store):
+    key = ObjectStoreStorageService().upload_fileobj(io.BytesIO(b'document'), 'file.pdf')
+    url = ObjectStoreStorageService().presigned_download_url(key, 'file.pdf', True, 60)
+
+    params = parse_qs(urlparse(url).query)
+    assert urlparse(url).path.endswith(key)
+    assert params['response-content-disposition'] == ['attachment; filename=file.pdf']
+    assert params['response-content-type'] == ['application/pdf']
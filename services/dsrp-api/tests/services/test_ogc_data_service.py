@@ -0,0 +1,149 @@
+import gzip
+import json
+import threading
+import pytest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from app.extensions import cache
+from app.api.constants import PERMIT_HOLDER_CACHE, LIABILITY_PER_WELL_CACHE
+from app.api.services import ogc_data_service
+from app.api.services.ogc_data_service import (OGCDataService, COLD_CACHE_RETRY_AFTER_SECONDS,
+                                               getSnapshotPath, refreshOGCdata)
+
+PERMIT_HOLDER_CACHE_KEYS = [
+    PERMIT_HOLDER_CACHE + suffix for suffix in ('', '_VERSION', '_EXPIRY_TOKEN', '_REFRESHED_AT',
+                                                '_CONTENT_HASH', '_HTTP_VALIDATORS', '_REFRESH_LOCK')
+]
+
+
+@pytest.mark.parametrize('url', ['/liability', '/permit_holder', '/well'])
+def test_unavailable_dataset_is_a_503_with_retry_after(test_client, auth_headers, monkeypatch, url):
+    """Answers with a 503 and Retry-After while a dataset has not been loaded"""
+    monkeypatch.setattr(OGCDataService, 'getOGCdataset', classmethod(lambda cls, cache_key: None))
+
+    response = test_client.get(url, headers=auth_headers['full_auth_header'])
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(COLD_CACHE_RETRY_AFTER_SECONDS)
+    assert json.loads(response.data.decode())['status'] == 503
+
+
+def test_ready_only_once_every_dataset_is_loaded(test_client, monkeypatch):
+    loaded = {PERMIT_HOLDER_CACHE: True, LIABILITY_PER_WELL_CACHE: False}
+    monkeypatch.setattr(
+        OGCDataService, 'getOGCdataset',
+        classmethod(lambda cls, cache_key: object() if loaded.get(cache_key, True) else None))
+
+    response = test_client.get('/ready')
+
+    assert response.status_code == 503
+    assert json.loads(response.data.decode())['missing'] == [LIABILITY_PER_WELL_CACHE]
+
+    loaded[LIABILITY_PER_WELL_CACHE] = True
+    response = test_client.get('/ready')
+
+    assert response.status_code == 200
+    assert json.loads(response.data.decode())['status'] == 'pass'
+
+
+class OGCReportHandler(BaseHTTPRequestHandler):
+    """Serves the report in server.report, answering conditional requests for its ETag with a 304"""
+    def do_GET(self):
+        report = self.server.report
+        report['requests'].append(dict(self.headers))
+        if self.headers.get('If-None-Match') == report['etag']:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(report['body'])))
+        self.send_header('ETag', report['etag'])
+        self.send_header('Last-Modified', report['last_modified'])
+        self.end_headers()
+        self.wfile.write(report['body'])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ogc_report(test_client, monkeypatch):
+    """Serves the permit holder snapshot as the live report and counts how often it is parsed and serialized"""
+    with gzip.open(getSnapshotPath(PERMIT_HOLDER_CACHE)) as f:
+        body = f.read()
+
+    server = HTTPServer(('127.0.0.1', 0), OGCReportHandler)
+    server.report = {
+        'body': body,
+        'etag': '"report-1"',
+        'last_modified': 'Mon, 05 Oct 2026 08:00:00 GMT',
+        'requests': [],
+        'parsed': 0,
+        'serialized': 0
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def counted(name, function):
+        def wrapper(*args, **kwargs):
+            server.report[name] += 1
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(ogc_data_service, 'readOGCcsv',
+                        counted('parsed', ogc_data_service.readOGCcsv))
+    monkeypatch.setattr(ogc_data_service, 'serializeDataFrame',
+                        counted('serialized', ogc_data_service.serializeDataFrame))
+    monkeypatch.setitem(test_client.application.config, 'OGC_PERMIT_HOLDER_CSV_URL',
+                        f'http://127.0.0.1:{server.server_port}/permit_holders.csv')
+    cache.delete_many(*PERMIT_HOLDER_CACHE_KEYS)
+
+    yield server.report
+
+    cache.delete_many(*PERMIT_HOLDER_CACHE_KEYS)
+    server.shutdown()
+    server.server_close()
+
+
+def test_not_modified_report_is_not_parsed_again(test_client, ogc_report):
+    app = test_client.application
+    assert refreshOGCdata(app, PERMIT_HOLDER_CACHE, force=True)
+    assert 'If-None-Match' not in ogc_report['requests'][0]
+    assert (ogc_report['parsed'], ogc_report['serialized']) == (1, 1)
+    version = cache.get(PERMIT_HOLDER_CACHE + '_VERSION')
+
+    assert refreshOGCdata(app, PERMIT_HOLDER_CACHE, force=True)
+
+    assert ogc_report['requests'][1]['If-None-Match'] == ogc_report['etag']
+    assert ogc_report['requests'][1]['If-Modified-Since'] == ogc_report['last_modified']
+    assert (ogc_report['parsed'], ogc_report['serialized']) == (1, 1)
+    assert cache.get(PERMIT_HOLDER_CACHE + '_VERSION') == version
+    assert ogc_data_service.getMetrics(PERMIT_HOLDER_CACHE)['last_refresh_result'] == 'unchanged'
+
+
+def test_identical_report_is_not_parsed_again(test_client, ogc_report):
+    app = test_client.application
+    assert refreshOGCdata(app, PERMIT_HOLDER_CACHE, force=True)
+    version = cache.get(PERMIT_HOLDER_CACHE + '_VERSION')
+
+    # a new ETag for the same bytes is answered in full, but the content hash matches
+    ogc_report['etag'] = '"report-2"'
+    assert refreshOGCdata(app, PERMIT_HOLDER_CACHE, force=True)
+
+    assert (ogc_report['parsed'], ogc_report['serialized']) == (1, 1)
+    assert cache.get(PERMIT_HOLDER_CACHE + '_VERSION') == version
+    assert cache.get(PERMIT_HOLDER_CACHE + '_HTTP_VALIDATORS')['etag'] == '"report-2"'
+
+    # a changed report is parsed and stored as a new version
+    ogc_report['etag'] = '"report-3"'
+    ogc_report['body'] = ogc_report['body'].rstrip(b'\n').rsplit(b'\n', 1)[0] + b'\n'
+    assert refreshOGCdata(app, PERMIT_HOLDER_CACHE, force=True)
+
+    assert ogc_report['requests'][2]['If-None-Match'] == '"report-2"'
+    assert (ogc_report['parsed'], ogc_report['serialized']) == (2, 2)
+    assert cache.get(PERMIT_HOLDER_CACHE + '_VERSION') != version
+    assert OGCDataService.getPermitHoldersDataFrame().shape[0] == ogc_report['body'].count(b'\n') - 1
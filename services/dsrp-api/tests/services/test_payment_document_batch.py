@@ -0,0 +1,153 @@
+import io
+import json
+import uuid
+import zipfile
+
+from datetime import datetime, timedelta
+from email import message_from_string
+
+from app.api.application.models.payment_document_batch import PaymentDocumentBatch
+from app.api.application.models.payment_document_job import PaymentDocumentJob
+from app.api.contracted_work.models.contracted_work_payment import ContractedWorkPayment
+from app.api.email_outbox.models.email_outbox import EmailOutbox
+
+from tests.services.conftest import (FINANCE_EMAIL, create_approved_application, work_ids_of,
+                                     run_all_job_stages)
+
+
+def _batch_item(application, work_ids):
+    payments = ContractedWorkPayment.query.filter(ContractedWorkPayment.work_id.in_(work_ids)).all()
+    return application, work_ids, payments
+
+
+def test_batch_reports_the_error_of_each_item(test_client, db_session, auth_headers,
+                                             approved_application, docgen, prf_config):
+    first_work_id, second_work_id = work_ids_of(approved_application)
+    application_guid = str(approved_application.guid)
+    items = [
+        {
+            'application_guid': application_guid,
+            'work_ids': [first_work_id]
+        },
+        'not an item',
+        ['not', 'an', 'item'],
+        {
+            'application_guid': 'not a guid',
+            'work_ids': [second_work_id]
+        },
+        {
+            'application_guid': application_guid,
+            'work_ids': second_work_id
+        },
+        {
+            'application_guid': application_guid,
+            'work_ids': [second_work_id, second_work_id]
+        },
+        {
+            'application_guid': application_guid,
+            'work_ids': [second_work_id, first_work_id]
+        },
+        {
+            'application_guid': str(uuid.uuid4()),
+            'work_ids': [second_work_id]
+        },
+    ]
+
+    resp = test_client.post(
+        '/application/payment-doc-batch',
+        json={
+            'payment_document_code': 'INTERIM_PRF',
+            'items': items
+        },
+        headers=auth_headers['admin_only_auth_header'])
+
+    assert resp.status_code == 202
+    results = json.loads(resp.data.decode())['items']
+    assert results[0]['error'] is None
+    assert results[0]['job']['invoice_number'] == f'{approved_application.agreement_number}-2-1'
+    assert [result['error'] for result in results[1:]] == [
+        'Each item must be an object with an application_guid and work_ids',
+        'Each item must be an object with an application_guid and work_ids',
+        'Invalid application GUID',
+        'Work IDs must be a list of strings',
+        'Work IDs must not be repeated',
+        f'Work ID {first_work_id} is in more than one item of this batch',
+        'No application was found matching the provided reference number',
+    ]
+    assert all(result['job'] is None for result in results[1:])
+    assert PaymentDocumentJob.query.filter_by(application_guid=approved_application.guid).count() == 1
+
+
+def test_failing_item_is_rolled_back_alone(test_client, db_session, docgen, prf_config):
+    application = create_approved_application(db_session)
+    unpaid_application = create_approved_application(db_session)
+    first_work_id, second_work_id = work_ids_of(application)
+    unpaid_work_id = work_ids_of(unpaid_application)[0]
+    ContractedWorkPayment.find_by_work_id(unpaid_work_id).interim_paid_amount = None
+    db_session.flush()
+
+    batch, errors = PaymentDocumentBatch.create('INTERIM_PRF', [
+        _batch_item(application, [first_work_id]),
+        _batch_item(unpaid_application, [unpaid_work_id]),
+        _batch_item(application, [second_work_id]),
+    ])
+    db_session.commit()
+
+    assert errors == {1: f'Work ID {unpaid_work_id} interim payment amount has not been set!'}
+    jobs = sorted(batch.jobs, key=lambda job: job.invoice_number)
+    assert [job.work_ids for job in jobs] == [[first_work_id], [second_work_id]]
+    assert [job.invoice_number for job in jobs] == [
+        f'{application.agreement_number}-2-1', f'{application.agreement_number}-2-2'
+    ]
+    assert PaymentDocumentJob.query.filter_by(
+        application_guid=unpaid_application.guid).count() == 0
+
+
+def test_last_job_emails_the_prfs_of_the_batch_in_one_zip(test_client, db_session, docgen,
+                                                          object_store, prf_config):
+    applications = [
+        create_approved_application(db_session, ('abandonment', )) for i in range(3)
+    ]
+    batch, errors = PaymentDocumentBatch.create(
+        'INTERIM_PRF',
+        [_batch_item(application, work_ids_of(application)) for application in applications])
+    db_session.commit()
+    assert errors == {}
+
+    failing_job = next(job for job in batch.jobs if job.application_guid == applications[-1].guid)
+    docgen['failing_invoice_numbers'].add(failing_job.invoice_number)
+
+    # The batch waits for the job that is being retried
+    assert run_all_job_stages() == 7
+    assert batch.status == 'PENDING'
+    assert EmailOutbox.query.filter_by(to_email=FINANCE_EMAIL).count() == 0
+
+    failing_job.next_attempt_timestamp = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert run_all_job_stages() == 1
+    assert failing_job.status == 'FAILED'
+    assert batch.status == 'COMPLETED'
+
+    emails = EmailOutbox.query.filter_by(to_email=FINANCE_EMAIL).all()
+    assert len(emails) == 1
+    assert emails[0].subject.startswith('2 Payment Request Forms')
+
+    attachments = [
+        part.get_payload(decode=True) for part in message_from_string(emails[0].message).walk()
+        if part.get_filename()
+    ]
+    assert len(attachments) == 1
+    succeeded = [job for job in batch.jobs if job.status == 'SUCCEEDED']
+    with zipfile.ZipFile(io.BytesIO(attachments[0])) as zf:
+        assert sorted(zf.namelist()) == sorted(job.document_name for job in succeeded)
+        for job in succeeded:
+            assert zf.read(job.document_name) == f'PRF {job.invoice_number}'.encode()
+    assert all(job.rendered_document is None for job in succeeded)
+
+
+def test_batch_with_an_invalid_guid_is_not_found(test_client, db_session, auth_headers):
+    resp = test_client.get(
+        '/application/payment-doc-batch/not-a-guid',
+        headers=auth_headers['admin_only_auth_header'])
+
+    assert resp.status_code == 404
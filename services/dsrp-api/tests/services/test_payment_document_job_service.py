@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+
+from app.config import Config
+from app.extensions import db
+from app.api.application.models.payment_document import PaymentDocument
+from app.api.application.models.payment_document_job import PaymentDocumentJob
+from app.api.email_outbox.models.email_outbox import EmailOutbox
+from app.api.services.payment_document_job_service import PaymentDocumentJobWorker
+
+from tests.services.conftest import (TEST_BUCKET, FINANCE_EMAIL, create_approved_application,
+                                     work_ids_of, run_all_job_stages)
+
+
+def test_job_renders_uploads_and_records_the_prf(test_client, db_session, approved_application,
+                                                 docgen, object_store, prf_config):
+    job = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF',
+                                     work_ids_of(approved_application))
+    db_session.commit()
+    assert job.invoice_number == f'{approved_application.agreement_number}-2-1'
+
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert (job.status, job.stage) == ('PENDING', 'UPLOAD')
+    assert job.rendered_document == f'PRF {job.invoice_number}'.encode()
+
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert (job.status, job.stage) == ('PENDING', 'RECORD')
+    assert object_store.get_object(
+        Bucket=TEST_BUCKET, Key=job.object_store_path)['Body'].read() == job.rendered_document
+
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert job.status == 'SUCCEEDED'
+    assert job.rendered_document is None
+    doc = PaymentDocument.find_by_guid(approved_application.guid, job.document_guid)
+    assert doc.invoice_number == job.invoice_number
+    assert doc.object_store_path == job.object_store_path
+    assert {payment.work_id for payment in doc.contracted_work_payments} == set(job.work_ids)
+    assert EmailOutbox.query.filter(EmailOutbox.to_email == FINANCE_EMAIL,
+                                    EmailOutbox.subject.contains(job.invoice_number)).count() == 1
+
+    assert not PaymentDocumentJobWorker.run_next_stage()
+    assert docgen['count'] == 1
+
+
+def test_failed_stage_is_retried_with_backoff_until_max_attempts(
+        test_client, db_session, approved_application, docgen, object_store, prf_config):
+    job = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF',
+                                     work_ids_of(approved_application))
+    db_session.commit()
+    docgen['error'] = 'docgen is down'
+
+    started = datetime.utcnow()
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert (job.status, job.stage, job.attempts) == ('PENDING', 'RENDER', 1)
+    assert 'docgen is down' in job.last_error
+    assert job.next_attempt_timestamp >= started + timedelta(seconds=60)
+
+    # Not due again until the backoff has passed
+    assert not PaymentDocumentJobWorker.run_next_stage()
+
+    job.next_attempt_timestamp = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert (job.status, job.attempts) == ('FAILED', 2)
+    assert not PaymentDocumentJobWorker.run_next_stage()
+    assert PaymentDocument.query.filter_by(application_guid=approved_application.guid).count() == 0
+
+
+def test_retry_resumes_at_the_failed_stage(test_client, db_session, approved_application, docgen,
+                                           object_store, prf_config, monkeypatch):
+    job = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF',
+                                     work_ids_of(approved_application))
+    db_session.commit()
+    assert PaymentDocumentJobWorker.run_next_stage()
+
+    monkeypatch.setattr(Config, 'OBJECT_STORE_BUCKET', 'missing-bucket')
+    assert PaymentDocumentJobWorker.run_next_stage()
+    assert (job.status, job.stage, job.attempts) == ('PENDING', 'UPLOAD', 1)
+
+    monkeypatch.setattr(Config, 'OBJECT_STORE_BUCKET', TEST_BUCKET)
+    job.next_attempt_timestamp = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert run_all_job_stages() == 2
+    assert job.status == 'SUCCEEDED'
+    assert docgen['count'] == 1
+
+
+def test_enqueue_is_idempotent(test_client, db_session, approved_application, docgen, prf_config):
+    work_ids = work_ids_of(approved_application)
+    job = PaymentDocumentJob.enqueue(
+        approved_application, 'INTERIM_PRF', work_ids, idempotency_key='month-end')
+    db_session.commit()
+
+    assert PaymentDocumentJob.enqueue(
+        approved_application, 'INTERIM_PRF', work_ids, idempotency_key='month-end') is job
+    # The same PRF is not queued twice, whatever the order of its work IDs
+    assert PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF',
+                                      list(reversed(work_ids))) is job
+
+    # Idempotency keys are scoped to the application
+    other_application = create_approved_application(db_session)
+    other_job = PaymentDocumentJob.enqueue(
+        other_application,
+        'INTERIM_PRF',
+        work_ids_of(other_application),
+        idempotency_key='month-end')
+    db_session.commit()
+    assert other_job is not job
+    assert other_job.application_guid == other_application.guid
+
+
+def test_invoice_numbers_are_not_reissued_after_a_failed_job(
+        test_client, db_session, approved_application, docgen, object_store, prf_config):
+    first_work_id, second_work_id = work_ids_of(approved_application)
+    failed = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF', [first_work_id])
+    recorded = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF', [second_work_id])
+    db_session.commit()
+    assert failed.invoice_number.endswith('-2-1')
+    assert recorded.invoice_number.endswith('-2-2')
+
+    failed.status = 'FAILED'
+    db_session.commit()
+    assert run_all_job_stages() == 3
+    assert recorded.status == 'SUCCEEDED'
+    recorded_prf = object_store.get_object(
+        Bucket=TEST_BUCKET, Key=recorded.object_store_path)['Body'].read()
+
+    requeued = PaymentDocumentJob.enqueue(approved_application, 'INTERIM_PRF', [first_work_id])
+    db_session.commit()
+    assert requeued.invoice_number.endswith('-2-3')
+
+    assert run_all_job_stages() == 3
+    assert requeued.object_store_path != recorded.object_store_path
+    assert object_store.get_object(
+        Bucket=TEST_BUCKET, Key=recorded.object_store_path)['Body'].read() == recorded_prf
+
+
+def test_claim_skips_jobs_locked_by_other_workers(test_client, db_session):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        PaymentDocumentJob.claim_due()
+    finally:
+        db.event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert any('FROM payment_document_job' in statement and 'FOR UPDATE SKIP LOCKED' in statement
+               for statement in statements)
+
+
+def test_job_with_an_invalid_guid_is_not_found(test_client, db_session, auth_headers,
+                                               approved_application):
+    resp = test_client.get(
+        f'/application/{approved_application.guid}/payment-doc-job/not-a-guid',
+        headers=auth_headers['admin_only_auth_header'])
+
+    assert resp.status_code == 404
@@ -0,0 +1,103 @@
+import re
+import pytest
+
+from flask import Flask
+from sqlalchemy import text
+
+from app.extensions import db
+from app.api.utils import sql_profiler
+from app.api.utils.sql_profiler import (NPlusOneQueryError, UNMATCHED_ENDPOINT, fingerprint,
+                                       get_endpoint_metrics)
+
+SERVER_TIMING_PATTERN = re.compile(r'^db;dur=\d+(\.\d+)?;desc="(\d+) statements"$')
+
+
+@pytest.fixture
+def profiled_app(test_client, monkeypatch):
+    """A bare app with the profiler installed, running its statements against the test database"""
+    monkeypatch.setattr(sql_profiler, 'endpoint_metrics', {})
+    engine = db.engine
+
+    app = Flask(__name__)
+    app.config.update(SQL_PROFILER_STRICT=False, SQL_PROFILER_N_PLUS_ONE_THRESHOLD=3)
+    sql_profiler.init_app(app)
+
+    @app.route('/repeated/<int:count>')
+    def repeated(count):
+        with engine.connect() as conn:
+            for value in range(count):
+                conn.execute(text('SELECT :value'), value=value)
+        return 'ok'
+
+    @app.route('/distinct/<int:count>')
+    def distinct(count):
+        with engine.connect() as conn:
+            for value in range(count):
+                conn.execute(text(f'SELECT :value AS column_{value}'), value=value)
+        return 'ok'
+
+    return app
+
+
+def test_fingerprint_groups_parameterised_repeats():
+    assert fingerprint('SELECT * FROM well WHERE id = 1') == fingerprint(
+        'SELECT *\n  FROM well WHERE id = 22')
+    assert fingerprint("SELECT * FROM well WHERE name = 'a'") == fingerprint(
+        "SELECT * FROM well WHERE name = 'it''s'")
+    assert fingerprint('SELECT * FROM well WHERE id = %(id_1)s') == 'SELECT * FROM well WHERE id = ?'
+    assert fingerprint('SELECT * FROM well WHERE id IN (%(id_1)s, %(id_2)s, %(id_3)s)') == fingerprint(
+        'SELECT * FROM well WHERE id IN (%(id_1)s)')
+    assert fingerprint('SELECT * FROM well WHERE id = 1') != fingerprint(
+        'SELECT * FROM application WHERE id = 1')
+
+
+def test_request_statements_are_counted_in_the_server_timing_header(profiled_app):
+    client = profiled_app.test_client()
+
+    response = client.get('/distinct/2')
+
+    assert response.status_code == 200
+    match = SERVER_TIMING_PATTERN.match(response.headers['Server-Timing'])
+    assert match and match.group(2) == '2'
+
+    client.get('/distinct/1')
+    metrics = get_endpoint_metrics()['distinct']
+    assert (metrics['requests'], metrics['statements'], metrics['max_statements']) == (2, 3, 2)
+    assert metrics['n_plus_one_requests'] == 0
+
+
+def test_unmatched_paths_share_one_entry(profiled_app):
+    client = profiled_app.test_client()
+
+    assert client.get('/missing/1').status_code == 404
+    assert client.get('/missing/2').status_code == 404
+
+    assert list(get_endpoint_metrics()) == [UNMATCHED_ENDPOINT]
+    assert get_endpoint_metrics()[UNMATCHED_ENDPOINT]['requests'] == 2
+
+
+def test_statements_outside_a_request_are_not_counted(profiled_app):
+    db.session.execute('SELECT 1')
+
+    assert get_endpoint_metrics() == {}
+
+
+def test_repeated_statements_are_reported_without_strict_mode(profiled_app):
+    client = profiled_app.test_client()
+
+    assert client.get('/repeated/3').status_code == 200
+    assert client.get('/distinct/3').status_code == 200
+
+    assert get_endpoint_metrics()['repeated']['n_plus_one_requests'] == 1
+    assert get_endpoint_metrics()['distinct']['n_plus_one_requests'] == 0
+
+
+def test_strict_mode_raises_only_once_the_threshold_is_reached(profiled_app):
+    profiled_app.config.update(SQL_PROFILER_STRICT=True, TESTING=True)
+    client = profiled_app.test_client()
+
+    assert client.get('/repeated/2').status_code == 200
+    assert client.get('/distinct/5').status_code == 200
+
+    with pytest.raises(NPlusOneQueryError, match='executed the same statement 3 times'):
+        client.get('/repeated/3')
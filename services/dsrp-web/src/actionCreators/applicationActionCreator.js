@@ -121,6 +121,30 @@ export const createApplicationStatus = (guid, payload) => (dispatch) => {
     });
 };
 
+const PAYMENT_DOCUMENT_JOB_POLL_INTERVAL_MS = 2000;
+
+// PRFs are generated by a background job, resolves once the job has finished.
+const waitForPaymentDocumentJob = (guid, jobGuid) =>
+  new Promise((resolve, reject) => {
+    const poll = () =>
+      CustomAxios()
+        .get(
+          ENVIRONMENT.apiUrl + API.APPLICATION_PAYMENT_DOCUMENT_JOB(guid, jobGuid),
+          createRequestHeader()
+        )
+        .then((response) => {
+          if (response.data.status === "SUCCEEDED") {
+            resolve(response);
+          } else if (response.data.status === "FAILED") {
+            reject(new Error(response.data.last_error));
+          } else {
+            setTimeout(poll, PAYMENT_DOCUMENT_JOB_POLL_INTERVAL_MS);
+          }
+        })
+        .catch(reject);
+    poll();
+  });
+
 export const createApplicationPaymentDocument = (guid, payload) => (dispatch) => {
   dispatch(request(reducerTypes.CREATE_APPLICATION_PAYMENT_DOCUMENT));
   return CustomAxios()
@@ -129,6 +153,7 @@ export const createApplicationPaymentDocument = (guid, payload) => (dispatch) =>
       payload,
       createRequestHeader()
     )
+    .then((response) => waitForPaymentDocumentJob(guid, response.data.job_guid))
     .then((response) => {
       notification.success({
         message: "PRF created successfully",
@@ -15,6 +15,8 @@ export const APPLICATION_DOCUMENT = (guid) => `${APPLICATION_BY_ID(guid)}/docume
 export const APPLICATION_PAYMENT_DOCUMENT = (guid) => `/application/${guid}/payment-doc`;
 export const APPLICATION_PAYMENT_DOCUMENT_BY_GUID = (guid, documentGuid) =>
   `${APPLICATION_PAYMENT_DOCUMENT(guid)}/${documentGuid}`;
+export const APPLICATION_PAYMENT_DOCUMENT_JOB = (guid, jobGuid) =>
+  `/application/${guid}/payment-doc-job/${jobGuid}`;
 export const APPLICATION_APPROVED_CONTRACTED_WORK = (params) =>
   params
     ? `/application/approved-contracted-work?${queryString.stringify(params)}`